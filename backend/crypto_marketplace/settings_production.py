@@ -0,0 +1,44 @@
+"""
+Production profile: ``DJANGO_SETTINGS_MODULE=crypto_marketplace.settings_production``.
+
+Everything is inherited from ``settings``; this turns off debug, expects
+``DATABASE_URL`` to point at PgBouncer in transaction pooling mode (see
+docker-compose.prod.yml), requires a cache with atomic ``add()``/``incr()``
+and lets Caddy send purchased files.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES, DATABASES, LISTING_CACHE_ALIAS, PRIVY_JWKS_CACHE_ALIAS
+
+DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
+
+# PgBouncer keeps the server connections; Django opens a local one per request.
+# Server-side cursors are only used inside transactions (exports), which
+# transaction pooling keeps on one server connection
+DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# The JWKS refresh and listing page single-flight locks (cache.add) and the listing
+# version counter (cache.incr) only hold across processes on these backends;
+# FileBasedCache and LocMemCache would let every worker fetch and recompute
+ATOMIC_CACHE_BACKENDS = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+)
+for alias in {LISTING_CACHE_ALIAS, PRIVY_JWKS_CACHE_ALIAS}:
+    if CACHES[alias]['BACKEND'] not in ATOMIC_CACHE_BACKENDS:
+        raise ImproperlyConfigured(
+            f"The {alias!r} cache uses {CACHES[alias]['BACKEND']}, whose add() and incr() are not atomic "
+            "across processes; set REDIS_URL"
+        )
+
+# TLS terminates at Caddy, which forwards the original scheme
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+SESSION_COOKIE_SECURE = True
+CSRF_COOKIE_SECURE = True
+
+# Caddy serves purchased files from the blob volume (handle_response in the Caddyfile)
+DOWNLOAD_ACCEL_REDIRECT = os.getenv('DOWNLOAD_ACCEL_REDIRECT', 'X-Accel-Redirect')
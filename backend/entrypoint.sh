@@ -19,8 +19,9 @@ if not User.objects.filter(username='admin').exists():
     print('Superuser created: admin/admin123')
 "
 
-# Start server
-exec python manage.py runserver 0.0.0.0:8000
+# Start the ASGI server (async views need an event loop; runserver is WSGI).
+# Worker processes and timeouts come from the environment, see gunicorn.conf.py
+exec gunicorn crypto_marketplace.asgi:application -c gunicorn.conf.py
 
 
 
@@ -0,0 +1,22 @@
+"""
+Gunicorn settings for ``gunicorn crypto_marketplace.asgi:application -c gunicorn.conf.py``.
+
+Each worker is a separate process running its own event loop. Sync ORM code
+runs on asgiref's thread pool, sized by ``ASGI_THREADS``; database
+connections are pooled by PgBouncer (docker-compose.prod.yml).
+"""
+import multiprocessing
+import os
+
+
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', str(min(multiprocessing.cpu_count() * 2 + 1, 8))))
+# Set GUNICORN_WORKER_CLASS=gthread (with crypto_marketplace.wsgi:application) to serve over WSGI
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+# Recycle workers now and then so slow leaks cannot accumulate; jitter avoids restarting them all at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '5000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '500'))
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
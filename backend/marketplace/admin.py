@@ -1,17 +1,22 @@
 from django.contrib import admin
-from .models import UserProfile, Listing, Order, Dispute
+from .models import UserProfile, Listing, Order, Dispute, EscrowEvent, Job
+from .reputation import record_dispute_result_change, record_order_status_change
 
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'telegram_id', 'wallet_address', 'rating', 'dispute_rate']
+    list_select_related = ['user']
     list_filter = ['created_at']
     search_fields = ['user__username', 'telegram_id', 'wallet_address']
+    # Maintained with F() updates; saving a stale form must not overwrite them
+    readonly_fields = ['total_orders', 'dispute_count', 'dispute_rate']
 
 
 @admin.register(Listing)
 class ListingAdmin(admin.ModelAdmin):
     list_display = ['title', 'seller', 'price', 'currency', 'status', 'created_at']
+    list_select_related = ['seller']
     list_filter = ['status', 'created_at']
     search_fields = ['title', 'seller__username', 'description']
 
@@ -19,12 +24,40 @@ class ListingAdmin(admin.ModelAdmin):
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['order_id', 'listing', 'buyer', 'seller', 'amount', 'status', 'created_at']
+    list_select_related = ['listing', 'buyer', 'seller']
     list_filter = ['status', 'created_at']
     search_fields = ['order_id', 'buyer__username', 'seller__username']
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'status' in form.changed_data:
+            record_order_status_change(obj, form.initial.get('status'))
+
 
 @admin.register(Dispute)
 class DisputeAdmin(admin.ModelAdmin):
     list_display = ['order', 'initiator', 'status', 'result', 'created_at']
+    list_select_related = ['order__listing', 'initiator']
     list_filter = ['status', 'result', 'created_at']
-    search_fields = ['order__order_id', 'initiator__username']
\ No newline at end of file
+    search_fields = ['order__order_id', 'initiator__username']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'result' in form.changed_data:
+            record_dispute_result_change(obj, form.initial.get('result'))
+
+
+@admin.register(EscrowEvent)
+class EscrowEventAdmin(admin.ModelAdmin):
+    list_display = ['name', 'order_id', 'block_number', 'log_index', 'tx_hash']
+    list_filter = ['name']
+    search_fields = ['order_id', 'tx_hash']
+    # Written by the indexer from chain data
+    readonly_fields = [field.name for field in EscrowEvent._meta.fields]
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['task', 'queue', 'status', 'attempts', 'run_at', 'finished_at']
+    list_filter = ['queue', 'status', 'task']
+    readonly_fields = ['locked_at', 'locked_by', 'last_error', 'created_at', 'finished_at']
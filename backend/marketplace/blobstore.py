@@ -0,0 +1,112 @@
+import hashlib
+import os
+import re
+import tempfile
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.urls import reverse
+
+
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+VARIANT_NAME_RE = re.compile(r'^[a-z0-9][a-z0-9_-]*\.[a-z0-9]+$')
+
+
+class BlobStore:
+    """
+    Disk-backed, SHA-256 content-addressed blob store.
+
+    Blobs live at ``<root>/<aa>/<bb>/<digest>``. Content is streamed into a
+    temporary file while it is hashed and then atomically renamed into place,
+    so identical uploads are stored once and readers never see partial files.
+    """
+
+    def __init__(self, root=None):
+        self._root = root
+
+    @property
+    def root(self):
+        return Path(self._root or settings.BLOB_STORE_ROOT)
+
+    def path(self, digest):
+        if not DIGEST_RE.match(digest):
+            raise ValueError(f'Invalid blob digest: {digest}')
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def exists(self, digest):
+        return self.path(digest).exists()
+
+    def open(self, digest):
+        return open(self.path(digest), 'rb')
+
+    def put_chunks(self, chunks):
+        """Store an iterable of byte chunks, returning ``(digest, size)``."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            self.adopt(tmp_path, digest)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return digest, size
+
+    def adopt(self, path, digest):
+        """Move a complete file whose SHA-256 is ``digest`` into place (or drop it when already stored)."""
+        target = self.path(digest)
+        if target.exists():
+            os.unlink(path)
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(path, target)
+        return target
+
+    def put_bytes(self, data):
+        return self.put_chunks([data])
+
+    def partial_path(self, upload_id):
+        """Where a resumable upload collects its bytes until it is finalized."""
+        return self.root / 'partial' / f'{uuid.UUID(str(upload_id))}.part'
+
+    def variant_path(self, digest, name):
+        if not DIGEST_RE.match(digest) or not VARIANT_NAME_RE.match(name):
+            raise ValueError(f'Invalid blob variant: {digest}/{name}')
+        return self.root / 'variants' / digest[:2] / digest[2:4] / digest / name
+
+    def put_variant(self, digest, name, data):
+        """Store (or replace) a file derived from blob ``digest``, atomically."""
+        target = self.variant_path(digest, name)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=target.parent, prefix='.variant-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return target
+
+
+def blob_url(digest, request=None, base_url=None):
+    """Public URL for a blob; absolute via ``BLOB_BASE_URL`` or the request host."""
+    path = reverse('blob', args=[digest])
+    base_url = base_url or settings.BLOB_BASE_URL
+    if base_url:
+        return base_url.rstrip('/') + path
+    if request is not None:
+        return request.build_absolute_uri(path)
+    return path
+
+
+blob_store = BlobStore()
@@ -0,0 +1,113 @@
+"""
+Bulk catalog operations: import, update and soft-delete many of a seller's listings at once.
+
+Every item is validated in Python first; the database then sees a fixed
+number of statements per batch (one ``INSERT`` per ``BULK_CREATE_BATCH_SIZE``
+rows, a single ``UPDATE ... RETURNING`` for updates and deletes) instead of
+one round trip per listing. Invalid items are reported by index and do not
+stop the valid ones. These paths bypass ``Listing.save`` and its signals, so
+they set ``expires_at`` themselves and bump the feed cache version on commit.
+"""
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Now
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import Listing, update_returning
+from .resultcache import bump_listing_version
+from .serializers import BulkListingItemSerializer, BulkListingUpdateItemSerializer
+
+
+BULK_CREATE_BATCH_SIZE = 500
+
+
+def validate_items(serializer, items):
+    """Run ``serializer`` over each item; returns ``[(index, data)]`` and ``[{'index', 'errors'}]``."""
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, serializer.run_validation(item)))
+        except serializers.ValidationError as e:
+            errors.append({'index': index, 'errors': e.detail})
+    return valid, errors
+
+
+def owned_listings(seller_id):
+    return Listing.objects.filter(seller_id=seller_id, is_deleted=False)
+
+
+def create_listings(seller_id, items):
+    """Insert the valid items for ``seller_id``; returns the new ids (in item order) and per-item errors."""
+    valid, errors = validate_items(BulkListingItemSerializer(), items)
+    if not valid:
+        return [], errors
+
+    now = timezone.now()
+    listings = []
+    for _, data in valid:
+        listing = Listing(seller_id=seller_id, **data)
+        listing.expires_at = Listing.compute_expires_at(now, listing.listing_duration_days)
+        listing.goods_sha256 = Listing.goods_digest(listing.file_path)
+        listings.append(listing)
+
+    with transaction.atomic():
+        Listing.objects.bulk_create(listings, batch_size=BULK_CREATE_BATCH_SIZE)
+        transaction.on_commit(bump_listing_version)
+    return [listing.id for listing in listings], errors
+
+
+def update_listings(seller_id, items):
+    """Apply per-item status/price changes in one UPDATE; returns the updated ids and per-item errors."""
+    valid, errors = validate_items(BulkListingUpdateItemSerializer(), items)
+
+    changes, indexes = {}, {}
+    for index, data in valid:
+        if data['id'] in changes:
+            errors.append({'index': index, 'errors': {'id': ['Listing appears more than once in this batch.']}})
+            continue
+        changes[data['id']] = data
+        indexes[data['id']] = index
+    if not changes:
+        return [], sorted(errors, key=lambda error: error['index'])
+
+    values = {'updated_at': Now()}
+    for name in ('status', 'price'):
+        whens = [When(id=listing_id, then=Value(data[name])) for listing_id, data in changes.items() if name in data]
+        if whens:
+            values[name] = Case(*whens, default=F(name), output_field=Listing._meta.get_field(name))
+
+    rows = update_returning(owned_listings(seller_id).filter(id__in=changes), values)
+    if rows:
+        transaction.on_commit(bump_listing_version)
+
+    updated = {row['id'] for row in rows}
+    errors += not_found(indexes, updated)
+    return sorted(updated), sorted(errors, key=lambda error: error['index'])
+
+
+def delete_listings(seller_id, ids):
+    """Soft-delete the seller's listings among ``ids`` in one UPDATE; returns the deleted ids and per-item errors."""
+    valid, errors = validate_items(serializers.IntegerField(), ids)
+    errors = [{'index': error['index'], 'errors': {'id': error['errors']}} for error in errors]
+    indexes = {}
+    for index, listing_id in valid:
+        indexes.setdefault(listing_id, index)
+    if not indexes:
+        return [], errors
+
+    rows = update_returning(owned_listings(seller_id).filter(id__in=indexes), {'is_deleted': True, 'updated_at': Now()})
+    if rows:
+        transaction.on_commit(bump_listing_version)
+
+    deleted = {row['id'] for row in rows}
+    errors += not_found(indexes, deleted)
+    return sorted(deleted), sorted(errors, key=lambda error: error['index'])
+
+
+def not_found(indexes, matched):
+    """Errors for the requested ids (``{id: item index}``) that the UPDATE did not touch."""
+    return [
+        {'index': index, 'errors': {'id': ['Listing not found or not yours.']}}
+        for listing_id, index in indexes.items() if listing_id not in matched
+    ]
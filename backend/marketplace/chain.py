@@ -0,0 +1,151 @@
+"""
+Minimal Ethereum JSON-RPC and ABI helpers for the escrow contract.
+
+Only what the escrow backend and indexer need: batched RPC calls, keccak
+selectors/topics, and encoding of the static types plus ``string`` used by
+the contract's functions and events.
+"""
+import itertools
+
+import requests
+from Crypto.Hash import keccak
+from django.conf import settings
+
+
+class RPCError(Exception):
+    """The node returned a JSON-RPC error or an unusable response."""
+
+
+def keccak256(data):
+    return keccak.new(data=data, digest_bits=256).digest()
+
+
+def event_topic(signature):
+    """``'Deposited(bytes32,address,uint256)'`` -> topic0 as 0x-hex."""
+    return '0x' + keccak256(signature.encode()).hex()
+
+
+def selector(signature):
+    return keccak256(signature.encode())[:4]
+
+
+def to_hex(number):
+    return hex(number)
+
+
+def from_hex(value):
+    return int(value, 16)
+
+
+def signature_types(signature):
+    """``'f(bytes32,string)'`` -> ``['bytes32', 'string']``"""
+    inner = signature[signature.index('(') + 1:-1]
+    return [name for name in inner.split(',') if name]
+
+
+def _word(value, abi_type):
+    if abi_type == 'bytes32':
+        raw = bytes.fromhex(value[2:] if value.startswith('0x') else value)
+        return raw.rjust(32, b'\0')
+    if abi_type == 'address':
+        return bytes.fromhex(value[2:]).rjust(32, b'\0')
+    if abi_type in ('uint256', 'uint64', 'uint8'):
+        return int(value).to_bytes(32, 'big')
+    if abi_type == 'bool':
+        return int(bool(value)).to_bytes(32, 'big')
+    raise ValueError(f"Unsupported ABI type {abi_type}")
+
+
+def encode_args(types, values):
+    head, tail = b'', b''
+    for abi_type, value in zip(types, values):
+        if abi_type == 'string':
+            raw = value.encode()
+            head += (32 * len(types) + len(tail)).to_bytes(32, 'big')
+            tail += len(raw).to_bytes(32, 'big') + raw.ljust((len(raw) + 31) // 32 * 32, b'\0')
+        else:
+            head += _word(value, abi_type)
+    return head + tail
+
+
+def encode_call(signature, *args):
+    """Calldata for ``signature`` (``'deposit(bytes32,uint256)'``) as 0x-hex."""
+    return '0x' + (selector(signature) + encode_args(signature_types(signature), args)).hex()
+
+
+def decode_args(types, data):
+    raw = bytes.fromhex(data[2:] if data.startswith('0x') else data)
+    values = []
+    for position, abi_type in enumerate(types):
+        word = raw[32 * position:32 * position + 32]
+        if abi_type == 'string':
+            offset = int.from_bytes(word, 'big')
+            length = int.from_bytes(raw[offset:offset + 32], 'big')
+            values.append(raw[offset + 32:offset + 32 + length].decode(errors='replace'))
+        elif abi_type == 'bytes32':
+            values.append('0x' + word.hex())
+        elif abi_type == 'address':
+            values.append('0x' + word[12:].hex())
+        elif abi_type == 'bool':
+            values.append(bool(int.from_bytes(word, 'big')))
+        else:
+            values.append(int.from_bytes(word, 'big'))
+    return values
+
+
+class JsonRpcClient:
+    """Blocking JSON-RPC client over one keep-alive session."""
+
+    def __init__(self, url=None, timeout=None):
+        self.url = url or settings.ESCROW_RPC_URL
+        self.timeout = timeout or settings.ESCROW_RPC_TIMEOUT
+        self.session = requests.Session()
+        self._ids = itertools.count(1)
+
+    def call(self, method, *params):
+        return self.batch([(method, params)])[0]
+
+    def batch(self, calls):
+        """Send ``[(method, params), ...]`` in one HTTP request; results come back in call order."""
+        if not calls:
+            return []
+        payload = [
+            {'jsonrpc': '2.0', 'id': next(self._ids), 'method': method, 'params': list(params)}
+            for method, params in calls
+        ]
+        try:
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            replies = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise RPCError(f"RPC request to {self.url} failed: {e}") from e
+        if not isinstance(replies, list):
+            raise RPCError(f"Unexpected RPC reply: {replies!r}")
+
+        by_id = {reply.get('id'): reply for reply in replies}
+        results = []
+        for request in payload:
+            reply = by_id.get(request['id'])
+            if reply is None:
+                raise RPCError(f"No reply for {request['method']}")
+            if 'error' in reply:
+                raise RPCError(f"{request['method']} failed: {reply['error']}")
+            results.append(reply.get('result'))
+        return results
+
+    def block_number(self):
+        return from_hex(self.call('eth_blockNumber'))
+
+    def block_hashes(self, numbers):
+        """``{number: hash}`` for ``numbers``, fetched in one batch; None for blocks the node lacks."""
+        numbers = list(numbers)
+        blocks = self.batch([('eth_getBlockByNumber', (to_hex(number), False)) for number in numbers])
+        return {number: block['hash'] if block else None for number, block in zip(numbers, blocks)}
+
+    def get_logs(self, address, topics, from_block, to_block):
+        return self.call('eth_getLogs', {
+            'address': address,
+            'topics': topics,
+            'fromBlock': to_hex(from_block),
+            'toBlock': to_hex(to_block),
+        })
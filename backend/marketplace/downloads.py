@@ -0,0 +1,112 @@
+"""
+Authorized downloads of purchased digital goods.
+
+A buyer asks ``/api/orders/<order_id>/download/`` for a link; that view checks
+the order (one query) and signs a URL valid for ``DOWNLOAD_URL_MAX_AGE``
+seconds. ``/api/downloads/<token>/`` verifies only the signature, so repeat
+and resumed (``Range``) requests within that window never reach the
+database. The blob digest and filename in the token are encrypted
+(AES-GCM, key derived from ``SECRET_KEY``): the digest is the only name of
+goods, which the public blob views refuse, and a link must not reveal it.
+With ``DOWNLOAD_ACCEL_REDIRECT`` set, the response carries only that
+header naming the blob and Caddy sends the file itself, with ``Range`` and
+``If-Range`` (see the Caddyfile). Otherwise Django streams the requested
+range from an async iterator, so the worker holds one block at a time.
+"""
+import base64
+import binascii
+import json
+import os
+import re
+
+from asgiref.sync import sync_to_async
+from Crypto.Cipher import AES
+from django.conf import settings
+from django.core import signing
+from django.utils.crypto import salted_hmac
+
+from .blobstore import blob_store
+
+
+# After payment and until completion; a disputed or cancelled order has no access
+DOWNLOADABLE_STATUSES = ('paid', 'delivered', 'confirmed', 'completed')
+
+SIGNING_SALT = 'marketplace.download'
+NONCE_SIZE = 12
+TAG_SIZE = 16
+READ_BLOCK_SIZE = 256 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(?P<start>\d*)-(?P<end>\d*)$')
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def cipher_key():
+    return salted_hmac(SIGNING_SALT, 'token encryption key', algorithm='sha256').digest()
+
+
+def sign_download(digest, filename):
+    nonce = os.urandom(NONCE_SIZE)
+    cipher = AES.new(cipher_key(), AES.MODE_GCM, nonce=nonce, mac_len=TAG_SIZE)
+    ciphertext, tag = cipher.encrypt_and_digest(json.dumps([digest, filename]).encode())
+    reference = base64.urlsafe_b64encode(nonce + tag + ciphertext).rstrip(b'=').decode()
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(reference)
+
+
+def unsign_download(token):
+    """``(digest, filename)`` from a download token; raises ``signing.SignatureExpired``/``BadSignature``."""
+    reference = signing.TimestampSigner(salt=SIGNING_SALT).unsign(token, max_age=settings.DOWNLOAD_URL_MAX_AGE)
+    try:
+        raw = base64.urlsafe_b64decode(reference + '=' * (-len(reference) % 4))
+        nonce, tag, ciphertext = raw[:NONCE_SIZE], raw[NONCE_SIZE:NONCE_SIZE + TAG_SIZE], raw[NONCE_SIZE + TAG_SIZE:]
+        cipher = AES.new(cipher_key(), AES.MODE_GCM, nonce=nonce, mac_len=TAG_SIZE)
+        digest, filename = json.loads(cipher.decrypt_and_verify(ciphertext, tag))
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise signing.BadSignature(f'Undecryptable download token: {e}')
+    return digest, filename
+
+
+def accel_path(digest):
+    """Path of the blob for the proxy, below ``DOWNLOAD_ACCEL_PREFIX`` (the blob store root on its side)."""
+    relative = blob_store.path(digest).relative_to(blob_store.root)
+    return settings.DOWNLOAD_ACCEL_PREFIX.rstrip('/') + '/' + relative.as_posix()
+
+
+def parse_range(header, size):
+    """
+    ``(start, end)`` (inclusive) for a single-range ``Range`` header, or None
+    to send the whole file (no header, or a form this server ignores such as
+    multiple ranges). Raises ``RangeNotSatisfiable`` for ranges past the end.
+    """
+    match = RANGE_RE.match((header or '').strip())
+    if match is None or not (match['start'] or match['end']):
+        return None
+    if match['start']:
+        start = int(match['start'])
+        end = min(int(match['end']), size - 1) if match['end'] else size - 1
+        if start > end or start >= size:
+            raise RangeNotSatisfiable(header)
+    else:
+        # Suffix range: the last N bytes
+        suffix = int(match['end'])
+        if suffix == 0 or size == 0:
+            raise RangeNotSatisfiable(header)
+        start, end = max(0, size - suffix), size - 1
+    return start, end
+
+
+async def aread_range(path, start, length):
+    """Yield ``length`` bytes of ``path`` from ``start``, reading each block off the event loop."""
+    source = await sync_to_async(open, thread_sensitive=False)(path, 'rb')
+    try:
+        await sync_to_async(source.seek, thread_sensitive=False)(start)
+        while length > 0:
+            block = await sync_to_async(source.read, thread_sensitive=False)(min(READ_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+    finally:
+        source.close()
@@ -0,0 +1,138 @@
+"""
+Pluggable escrow backends, selected with ``settings.ESCROW_BACKEND``.
+
+``MockEscrowBackend`` (the default) accepts every call, and the order views
+move the order's status themselves. ``JsonRpcEscrowBackend`` talks to the
+deployed escrow contract: the buyer's wallet signs deposits and
+confirmations, the backend sends only operator transactions, and order
+status follows the contract events applied by ``manage.py index_escrow_events``
+(which queues ``releaseFunds`` when it applies DeliveryConfirmed).
+"""
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .chain import JsonRpcClient, encode_call
+
+
+# Escrow contract events: signature -> order status it moves the order to.
+# orderId is the first parameter of each and the only indexed one.
+ESCROW_EVENTS = {
+    'Deposited(bytes32,address,uint256)': 'paid',
+    'DeliveryConfirmed(bytes32,address)': 'confirmed',
+    'DisputeOpened(bytes32,string)': 'disputed',
+    'FundsReleased(bytes32)': 'completed',
+    'Refunded(bytes32)': 'cancelled',
+}
+
+CREATE_ESCROW = 'createEscrow(bytes32,address,address,uint256,uint256)'
+RELEASE_FUNDS = 'releaseFunds(bytes32)'
+RESOLVE_DISPUTE = 'resolveDispute(bytes32,address,uint256)'
+
+
+class BaseEscrowBackend:
+    # True when order status comes from indexed contract events rather than the API call
+    indexed = False
+
+    def create_escrow(self, order_id, seller_address, token_address, amount, deadline):
+        raise NotImplementedError
+
+    def deposit(self, order_id, buyer_address, amount):
+        raise NotImplementedError
+
+    def confirm_delivery(self, order_id, buyer_address):
+        raise NotImplementedError
+
+    def release_funds(self, order_id):
+        raise NotImplementedError
+
+    def open_dispute(self, order_id, evidence_uri):
+        raise NotImplementedError
+
+    def resolve_dispute(self, order_id, winner_address, seller_share):
+        raise NotImplementedError
+
+
+class MockEscrowBackend(BaseEscrowBackend):
+    """Accepts everything; for development before the contract is deployed."""
+
+    def create_escrow(self, order_id, seller_address, token_address, amount, deadline):
+        return True
+
+    def deposit(self, order_id, buyer_address, amount):
+        return True
+
+    def confirm_delivery(self, order_id, buyer_address):
+        return True
+
+    def release_funds(self, order_id):
+        return True
+
+    def open_dispute(self, order_id, evidence_uri):
+        return True
+
+    def resolve_dispute(self, order_id, winner_address, seller_share):
+        return True
+
+
+class JsonRpcEscrowBackend(BaseEscrowBackend):
+    """
+    Escrow contract at ``ESCROW_CONTRACT_ADDRESS`` via the node at ``ESCROW_RPC_URL``.
+
+    Operator transactions go through ``eth_sendTransaction`` from
+    ``ESCROW_OPERATOR_ADDRESS``, so the node must hold that account's key
+    (Anvil/Hardhat dev accounts, or a signing proxy in front of the node).
+    Raises ``chain.RPCError`` when the node rejects a call.
+    """
+    indexed = True
+
+    def __init__(self):
+        self.client = JsonRpcClient()
+        self.contract = settings.ESCROW_CONTRACT_ADDRESS
+        self.operator = settings.ESCROW_OPERATOR_ADDRESS
+
+    def transact(self, signature, *args):
+        return self.client.call('eth_sendTransaction', {
+            'from': self.operator,
+            'to': self.contract,
+            'data': encode_call(signature, *args),
+        })
+
+    def create_escrow(self, order_id, seller_address, token_address, amount, deadline):
+        if not seller_address:
+            return False
+        self.transact(CREATE_ESCROW, order_id, seller_address, token_address,
+                      token_units(amount), int(deadline.timestamp()))
+        return True
+
+    def deposit(self, order_id, buyer_address, amount):
+        # Signed by the buyer's wallet; the indexer applies the Deposited event
+        return True
+
+    def confirm_delivery(self, order_id, buyer_address):
+        # Signed by the buyer's wallet; the indexer applies DeliveryConfirmed
+        return True
+
+    def release_funds(self, order_id):
+        self.transact(RELEASE_FUNDS, order_id)
+        return True
+
+    def open_dispute(self, order_id, evidence_uri):
+        # Signed by the disputing party; the indexer applies DisputeOpened
+        return True
+
+    def resolve_dispute(self, order_id, winner_address, seller_share):
+        self.transact(RESOLVE_DISPUTE, order_id, winner_address, token_units(seller_share))
+        return True
+
+
+def token_units(amount):
+    """Decimal token amount -> integer base units (``ESCROW_TOKEN_DECIMALS``)."""
+    return int(Decimal(amount).scaleb(settings.ESCROW_TOKEN_DECIMALS))
+
+
+@lru_cache(maxsize=None)
+def escrow_backend():
+    return import_string(settings.ESCROW_BACKEND)()
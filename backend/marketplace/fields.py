@@ -0,0 +1,109 @@
+import re
+
+from django.core import checks, exceptions
+from django.db import models
+from django.db.models import Lookup
+
+
+HEX_RE = re.compile(r'[0-9a-f]*')
+
+
+def normalize_hex(value, num_bytes):
+    """``'0xAB…'``, ``'ab…'`` or raw bytes -> lowercase ``'0x…'`` of exactly ``num_bytes``; raises ValueError."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = bytes(value).hex()
+    elif isinstance(value, str):
+        value = value.strip().lower()
+        if value.startswith('0x'):
+            value = value[2:]
+    else:
+        raise ValueError(f"Expected a hex string, got {type(value).__name__}")
+    if len(value) != num_bytes * 2 or not HEX_RE.fullmatch(value):
+        raise ValueError(f"Expected {num_bytes} bytes as hex")
+    return '0x' + value
+
+
+class HexField(models.Field):
+    """
+    Fixed-length binary value (hash, address) stored as ``bytea``.
+
+    Python and the API see a lowercase ``0x`` hex string; input may be any
+    case, with or without the prefix. Postgres stores the raw bytes, half
+    the width of the hex text, with a CHECK on the length.
+    """
+    description = "Hex string stored as %(num_bytes)s raw bytes"
+    empty_strings_allowed = False
+    default_error_messages = {
+        'invalid': "“%(value)s” is not a %(num_bytes)s-byte hex value.",
+    }
+
+    def __init__(self, *args, num_bytes=32, **kwargs):
+        self.num_bytes = num_bytes
+        super().__init__(*args, **kwargs)
+
+    def check(self, **kwargs):
+        errors = super().check(**kwargs)
+        if not isinstance(self.num_bytes, int) or self.num_bytes <= 0:
+            errors.append(checks.Error("'num_bytes' must be a positive integer.", obj=self, id='marketplace.E001'))
+        return errors
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['num_bytes'] = self.num_bytes
+        return name, path, args, kwargs
+
+    def db_type(self, connection):
+        return 'bytea'
+
+    def db_check(self, connection):
+        return f"octet_length({connection.ops.quote_name(self.column)}) = {self.num_bytes}"
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return '0x' + bytes(value).hex()
+
+    def to_python(self, value):
+        if value is None:
+            return value
+        try:
+            return normalize_hex(value, self.num_bytes)
+        except ValueError:
+            raise exceptions.ValidationError(
+                self.error_messages['invalid'], code='invalid',
+                params={'value': value, 'num_bytes': self.num_bytes},
+            )
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None:
+            return value
+        try:
+            return bytes.fromhex(normalize_hex(value, self.num_bytes)[2:])
+        except ValueError as e:
+            raise e.__class__(f"Field '{self.name}' expected {self.num_bytes} bytes as hex but got {value!r}.") from e
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
+
+    def formfield(self, **kwargs):
+        defaults = {'max_length': 2 + self.num_bytes * 2}
+        if self.null:
+            defaults['empty_value'] = None
+        return super().formfield(**{**defaults, **kwargs})
+
+
+@HexField.register_lookup
+class HexContains(Lookup):
+    """``icontains`` over the hex text, so admin search keeps matching partial hashes."""
+    lookup_name = 'icontains'
+    prepare_rhs = False
+
+    def get_db_prep_lookup(self, value, connection):
+        value = str(value).strip().lower().removeprefix('0x')
+        return '%s', [f'%{connection.ops.prep_for_like_query(value)}%']
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"encode({lhs}, 'hex') LIKE {rhs}", lhs_params + rhs_params
@@ -1,5 +1,14 @@
+import re
+
 import django_filters
-from .models import Listing, CurrencyChoices
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F, Q
+from rest_framework import filters
+from .models import Listing, Order, CurrencyChoices
+
+
+SEARCH_CONFIG = 'simple'
+SEARCH_TERM_RE = re.compile(r'\w+')
 
 
 class ListingFilter(django_filters.FilterSet):
@@ -22,3 +31,63 @@ class ListingFilter(django_filters.FilterSet):
     class Meta:
         model = Listing
         fields = ['currency', 'status']
+
+
+class OrderHistoryFilter(django_filters.FilterSet):
+    # One status at a time keeps every page on the (party, status, created_at, id) index
+    status = django_filters.ChoiceFilter(choices=Order.STATUS_CHOICES)
+
+    class Meta:
+        model = Order
+        fields = ['status']
+
+
+class ListingExportFilter(ListingFilter):
+    # Inclusive, so a pull from the last exported ``updated_at`` cannot miss ties
+    since = django_filters.IsoDateTimeFilter(field_name='updated_at', lookup_expr='gte')
+
+
+class OrderExportFilter(OrderHistoryFilter):
+    since = django_filters.IsoDateTimeFilter(field_name='updated_at', lookup_expr='gte')
+    buyer = django_filters.NumberFilter(field_name='buyer_id')
+    seller = django_filters.NumberFilter(field_name='seller_id')
+
+
+class ListingSearchFilter(filters.SearchFilter):
+    """
+    ``?search=`` backed by the trigger-maintained ``Listing.search_vector``.
+
+    Every term is matched as a prefix (``wirel`` finds ``wireless``) against
+    the GIN-indexed tsvector, with title weighted above description. Titles
+    within trigram word-similarity of the raw input are also matched so typos
+    still find something. Results are annotated with ``search_rank``.
+    """
+    rank_annotation = 'search_rank'
+
+    def filter_queryset(self, request, queryset, view):
+        terms = [
+            word for term in self.get_search_terms(request)
+            for word in SEARCH_TERM_RE.findall(term)
+        ]
+        if not terms:
+            return queryset
+
+        raw_query = ' & '.join(f"{term}:*" for term in terms)
+        query = SearchQuery(raw_query, search_type='raw', config=SEARCH_CONFIG)
+        text = ' '.join(terms)
+        return queryset.filter(
+            Q(search_vector=query) | Q(title__trigram_word_similar=text)
+        ).annotate(**{
+            self.rank_annotation: SearchRank(F('search_vector'), query) + TrigramWordSimilarity(text, 'title'),
+        })
+
+
+class ListingOrderingFilter(filters.OrderingFilter):
+    """Default to relevance order when a search rank is present."""
+
+    def get_ordering(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param):
+            rank = ListingSearchFilter.rank_annotation
+            if rank in queryset.query.annotations:
+                return [f"-{rank}", *(self.get_default_ordering(view) or [])]
+        return super().get_ordering(request, queryset, view)
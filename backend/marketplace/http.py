@@ -0,0 +1,31 @@
+"""Pooled async HTTP client for outbound calls made from async views."""
+import asyncio
+import weakref
+
+import httpx
+from django.conf import settings
+
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def async_client():
+    """
+    The ``httpx.AsyncClient`` for the running event loop.
+
+    Connections are pooled and kept alive across requests, so repeated
+    calls to the same host skip the TCP and TLS handshakes. A client is
+    bound to the loop it was created on; one is kept per loop (normally
+    exactly one per ASGI worker).
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _clients[loop] = httpx.AsyncClient(
+            timeout=settings.OUTBOUND_HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.OUTBOUND_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OUTBOUND_HTTP_MAX_KEEPALIVE,
+            ),
+        )
+    return client
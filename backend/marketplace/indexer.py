@@ -0,0 +1,217 @@
+"""
+Escrow event indexer: tails the escrow contract's logs and applies them to orders.
+
+Blocks are read in ranges of ``ESCROW_LOG_BLOCK_RANGE`` with one
+``eth_getLogs`` each. Per range, the database sees a constant number of
+statements: one bulk insert of the events, one locking SELECT of the orders
+they touch, batched ``bulk_update``s of the orders that changed, one counter
+update per seller whose completed sales moved, one insert of the
+``escrow.release_funds`` jobs for orders that reached ``confirmed``, and the
+checkpoint. Catch-up speed is bounded by the node, not by per-event writes.
+
+The release job commits with the order's ``confirmed`` status, so every
+DeliveryConfirmed leads to the operator's ``releaseFunds`` call, and the
+FundsReleased event then completes the order.
+
+The checkpoint keeps the hashes of the last ``ESCROW_REORG_DEPTH`` indexed
+blocks. Before each pass the tip is compared with the node; on a mismatch
+the indexer walks back to the newest block both still agree on, deletes the
+events above it and replays the affected orders from their remaining events.
+A reorg deeper than the window stops the indexer with ``ReorgTooDeep``.
+"""
+import logging
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .chain import JsonRpcClient, decode_args, event_topic, from_hex, signature_types
+from .escrow import ESCROW_EVENTS
+from .jobs import enqueue_many
+from .models import EscrowEvent, IndexerCheckpoint, Order
+from .reputation import adjust_seller_stats
+
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = 'escrow'
+
+# topic0 -> (event name, non-indexed argument types, target order status)
+EVENTS_BY_TOPIC = {
+    event_topic(signature): (signature.split('(')[0], signature_types(signature)[1:], target)
+    for signature, target in ESCROW_EVENTS.items()
+}
+EVENT_STATUSES = {name: target for name, _, target in EVENTS_BY_TOPIC.values()}
+
+
+class ReorgTooDeep(Exception):
+    """The chain diverged below every block hash the checkpoint still remembers."""
+
+
+class EscrowIndexer:
+    def __init__(self, client=None, contract=None, start_block=None, reorg_depth=None, block_range=None,
+                 update_batch_size=500):
+        self.client = client or JsonRpcClient()
+        self.contract = contract or settings.ESCROW_CONTRACT_ADDRESS
+        self.start_block = settings.ESCROW_START_BLOCK if start_block is None else start_block
+        self.reorg_depth = reorg_depth or settings.ESCROW_REORG_DEPTH
+        self.block_range = block_range or settings.ESCROW_LOG_BLOCK_RANGE
+        self.update_batch_size = update_batch_size
+
+    def checkpoint(self):
+        checkpoint, _ = IndexerCheckpoint.objects.get_or_create(
+            name=CHECKPOINT_NAME, defaults={'block_number': self.start_block - 1}
+        )
+        return checkpoint
+
+    def run_once(self):
+        """Index everything up to the node's current head; returns ``(blocks, events)`` applied."""
+        head = self.client.block_number()
+        checkpoint = self.checkpoint()
+        self.handle_reorg(checkpoint)
+
+        blocks = events = 0
+        from_block = checkpoint.block_number + 1
+        while from_block <= head:
+            to_block = min(from_block + self.block_range - 1, head)
+            applied = self.index_range(checkpoint, from_block, to_block, head)
+            if applied is None:
+                # The chain moved under this range; start over from the reorg check
+                break
+            blocks += to_block - from_block + 1
+            events += applied
+            from_block = to_block + 1
+        return blocks, events
+
+    def index_range(self, checkpoint, from_block, to_block, head):
+        """Apply one block range; returns the number of events, or None if a reorg raced the reads."""
+        # Only blocks that can still be reorged need their hash remembered
+        recent = sorted({*range(max(from_block, head - self.reorg_depth + 1), to_block + 1), to_block})
+        hashes = self.client.block_hashes(recent)
+        logs = self.client.get_logs(self.contract, [list(EVENTS_BY_TOPIC)], from_block, to_block)
+        if to_block > head - self.reorg_depth and self.client.block_hashes(recent) != hashes:
+            return None
+
+        events = [self.parse_log(log) for log in logs if not log.get('removed')]
+        events = [event for event in events if event is not None]
+        if any(hashes.get(event.block_number, event.block_hash) != event.block_hash for event in events):
+            return None
+
+        with transaction.atomic():
+            EscrowEvent.objects.bulk_create(events, batch_size=1000, ignore_conflicts=True)
+            self.apply(events)
+
+            remembered = {int(number): block_hash for number, block_hash in checkpoint.recent_hashes.items()}
+            remembered.update({number: block_hash for number, block_hash in hashes.items() if block_hash})
+            floor = to_block - self.reorg_depth
+            checkpoint.recent_hashes = {str(n): h for n, h in sorted(remembered.items()) if n > floor}
+            checkpoint.block_number = to_block
+            checkpoint.block_hash = hashes[to_block]
+            checkpoint.save()
+
+        if events:
+            logger.info("Indexed blocks %s-%s: %s escrow events", from_block, to_block, len(events))
+        return len(events)
+
+    def parse_log(self, log):
+        spec = EVENTS_BY_TOPIC.get(log['topics'][0]) if log.get('topics') else None
+        if spec is None or len(log['topics']) < 2:
+            return None
+        name, arg_types, _ = spec
+        return EscrowEvent(
+            block_number=from_hex(log['blockNumber']),
+            block_hash=log['blockHash'],
+            log_index=from_hex(log['logIndex']),
+            tx_hash=log['transactionHash'],
+            order_id=log['topics'][1].lower(),
+            name=name,
+            args=decode_args(arg_types, log['data']),
+        )
+
+    def handle_reorg(self, checkpoint):
+        """Rewind the checkpoint to the newest block the node still agrees with."""
+        if not checkpoint.block_hash:
+            return
+        if self.client.block_hashes([checkpoint.block_number])[checkpoint.block_number] == checkpoint.block_hash:
+            return
+
+        remembered = {int(number): block_hash for number, block_hash in checkpoint.recent_hashes.items()}
+        canonical = self.client.block_hashes(sorted(remembered))
+        common = [number for number, block_hash in remembered.items() if canonical.get(number) == block_hash]
+        if not common:
+            raise ReorgTooDeep(
+                f"Chain diverged below block {min(remembered, default=checkpoint.block_number)}, "
+                f"more than ESCROW_REORG_DEPTH={self.reorg_depth} blocks back"
+            )
+        ancestor = max(common)
+        logger.warning("Reorg: rewinding escrow index from block %s to %s", checkpoint.block_number, ancestor)
+        self.rewind(checkpoint, ancestor, remembered)
+
+    def rewind(self, checkpoint, ancestor, remembered):
+        with transaction.atomic():
+            orphaned = EscrowEvent.objects.filter(block_number__gt=ancestor)
+            order_ids = set(orphaned.values_list('order_id', flat=True))
+            orphaned.delete()
+            if order_ids:
+                remaining = list(EscrowEvent.objects.filter(order_id__in=order_ids).order_by('block_number', 'log_index'))
+                self.apply(remaining, order_ids=order_ids, replay=True)
+
+            checkpoint.block_number = ancestor
+            checkpoint.block_hash = remembered[ancestor]
+            checkpoint.recent_hashes = {str(n): h for n, h in sorted(remembered.items()) if n <= ancestor}
+            checkpoint.save()
+
+    def apply(self, events, order_ids=None, replay=False):
+        """
+        Advance orders through ``events`` (in chain order) and write the ones that changed.
+
+        With ``replay`` the orders restart from ``created`` first, which is how
+        a rewind undoes the orphaned events.
+        """
+        order_ids = order_ids or {event.order_id for event in events}
+        if not order_ids:
+            return
+        orders = {
+            order.order_id: order
+            for order in Order.objects.select_for_update()
+            .filter(order_id__in=order_ids)
+            .only('id', 'order_id', 'seller_id', 'status', 'escrow_tx_hash', 'updated_at')
+        }
+        before = {order.id: (order.status, order.escrow_tx_hash) for order in orders.values()}
+        if replay:
+            for order in orders.values():
+                order.status, order.escrow_tx_hash = 'created', None
+
+        for event in events:
+            order = orders.get(event.order_id)
+            target = EVENT_STATUSES[event.name]
+            if order is None or order.status == target:
+                continue
+            if not order.can_transition(target):
+                logger.warning("Ignoring %s for order %s in status %s", event.name, order.order_id, order.status)
+                continue
+            order.status = target
+            if target == 'paid':
+                order.escrow_tx_hash = event.tx_hash
+
+        now = timezone.now()
+        changed = []
+        completed = Counter()
+        confirmed = []
+        for order in orders.values():
+            previous_status, previous_tx_hash = before[order.id]
+            if (order.status, order.escrow_tx_hash) == (previous_status, previous_tx_hash):
+                continue
+            order.updated_at = now
+            changed.append(order)
+            completed[order.seller_id] += (order.status == 'completed') - (previous_status == 'completed')
+            if order.status == 'confirmed' and previous_status != 'confirmed':
+                # Also after a rewind orphaned FundsReleased; the contract refuses a second release
+                confirmed.append(order.order_id)
+
+        Order.objects.bulk_update(changed, ['status', 'escrow_tx_hash', 'updated_at'], batch_size=self.update_batch_size)
+        for seller_id, delta in completed.items():
+            adjust_seller_stats(seller_id, orders=delta)
+        if confirmed:
+            enqueue_many('escrow.release_funds', [{'order_id': order_id} for order_id in confirmed])
@@ -0,0 +1,176 @@
+"""
+Postgres-backed job queue.
+
+``enqueue()`` inserts a ``Job`` row on the caller's connection, so inside
+``transaction.atomic()`` the job commits or rolls back together with the
+write that caused it (the outbox pattern): no job for an order that was
+never saved, and no saved order without its job.
+
+Workers (``manage.py run_jobs``) claim due jobs with one
+``UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED)``, so any number
+of processes share a queue without handing out the same job twice. Failed
+jobs are retried with exponential backoff and jitter until ``max_attempts``;
+a job whose worker died is reclaimed once its lease
+(``JOB_LEASE_SECONDS``) runs out, and failed by ``fail_abandoned()`` when
+that was its last attempt. Delivery is at-least-once, so tasks must be
+idempotent.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from .models import Job, update_returning
+
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+CLAIMED_FIELDS = ('id', 'queue', 'task', 'args', 'attempts', 'max_attempts')
+
+
+class PermanentFailure(Exception):
+    """Raised by a task to fail its job without further retries."""
+
+
+def task(name, queue='default', max_attempts=5):
+    """Register a function as task ``name``; it is called with the job's ``args`` as keyword arguments."""
+    def register(func):
+        TASKS[name] = (func, queue, max_attempts)
+        return func
+    return register
+
+
+def enqueue(name, queue=None, delay=None, **kwargs):
+    """Queue task ``name``; call inside the transaction whose commit should trigger it."""
+    _, default_queue, max_attempts = TASKS[name]
+    return Job.objects.create(
+        task=name,
+        queue=queue or default_queue,
+        args=kwargs,
+        max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay or 0),
+    )
+
+
+def enqueue_many(name, args_list, queue=None):
+    """Queue task ``name`` once per kwargs dict in ``args_list``, with one INSERT."""
+    _, default_queue, max_attempts = TASKS[name]
+    run_at = timezone.now()
+    return Job.objects.bulk_create([
+        Job(task=name, queue=queue or default_queue, args=kwargs, max_attempts=max_attempts, run_at=run_at)
+        for kwargs in args_list
+    ])
+
+
+def claim(queues, worker_id, limit=1):
+    """Mark up to ``limit`` due jobs from ``queues`` as running for ``worker_id``; returns their rows."""
+    lease_expired = timezone.now() - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    # A job whose worker died on its last attempt is left for fail_abandoned(), so
+    # one that kills its worker (an OOM, a segfault) is not retried forever
+    due = (
+        Job.objects.filter(queue__in=queues)
+        .filter(
+            Q(status='queued', run_at__lte=Now())
+            | Q(status='running', locked_at__lt=lease_expired, attempts__lt=F('max_attempts'))
+        )
+        .order_by('run_at')
+        .select_for_update(skip_locked=True)
+        .values('id')[:limit]
+    )
+    with transaction.atomic():
+        return update_returning(
+            Job.objects.filter(id__in=due),
+            {'status': 'running', 'locked_at': Now(), 'locked_by': worker_id, 'attempts': F('attempts') + 1},
+            returning=CLAIMED_FIELDS,
+        )
+
+
+def retry_delay(attempts):
+    """Seconds before attempt ``attempts + 1``: doubling from the base delay, capped, with jitter."""
+    delay = min(settings.JOB_RETRY_MAX_DELAY, settings.JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1)
+
+
+def run(job, worker_id):
+    """Run one claimed job and record the outcome; returns True when it succeeded."""
+    mine = Job.objects.filter(id=job['id'], status='running', locked_by=worker_id)
+    entry = TASKS.get(job['task'])
+    try:
+        if entry is None:
+            raise PermanentFailure(f"Unknown task {job['task']!r}")
+        entry[0](**job['args'])
+    except Exception as e:
+        error = traceback.format_exc(limit=5)
+        if isinstance(e, PermanentFailure) or job['attempts'] >= job['max_attempts']:
+            logger.error("Job %s (%s) failed after %s attempt(s): %s", job['id'], job['task'], job['attempts'], e)
+            mine.update(status='failed', last_error=error, finished_at=Now(), locked_by=None)
+        else:
+            delay = retry_delay(job['attempts'])
+            logger.warning("Job %s (%s) attempt %s failed, retrying in %.0fs: %s",
+                           job['id'], job['task'], job['attempts'], delay, e)
+            mine.update(status='queued', last_error=error, locked_by=None, locked_at=None,
+                        run_at=timezone.now() + timedelta(seconds=delay))
+        return False
+
+    mine.update(status='done', finished_at=Now(), locked_by=None)
+    return True
+
+
+def queue_metrics(window=60):
+    """
+    Per-queue depth, throughput and lag in one aggregate query.
+
+    ``throughput`` is jobs finished per second over the last ``window``
+    seconds; ``lag`` is how long the oldest due job has been waiting.
+    """
+    now = timezone.now()
+    since = now - timedelta(seconds=window)
+    due = Q(status='queued', run_at__lte=now)
+    rows = Job.objects.order_by().values('queue').annotate(
+        queued=Count('id', filter=Q(status='queued')),
+        due=Count('id', filter=due),
+        running=Count('id', filter=Q(status='running')),
+        failed=Count('id', filter=Q(status='failed')),
+        finished=Count('id', filter=Q(status='done', finished_at__gte=since)),
+        oldest_due=Min('run_at', filter=due),
+    )
+    metrics = {}
+    for row in rows:
+        metrics[row['queue']] = {
+            'queued': row['queued'],
+            'due': row['due'],
+            'running': row['running'],
+            'failed': row['failed'],
+            'throughput': row['finished'] / window,
+            'lag': (now - row['oldest_due']).total_seconds() if row['oldest_due'] else 0.0,
+        }
+    return metrics
+
+
+def fail_abandoned():
+    """Mark ``failed`` the jobs whose worker died during their last attempt; returns how many."""
+    lease_expired = timezone.now() - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    abandoned = Job.objects.filter(status='running', locked_at__lt=lease_expired, attempts__gte=F('max_attempts'))
+    failed = abandoned.update(
+        status='failed', finished_at=Now(), locked_by=None,
+        last_error=f"Worker stopped responding during the last attempt (lease of {settings.JOB_LEASE_SECONDS}s expired)",
+    )
+    if failed:
+        logger.error("Failed %s job(s) whose worker died on their last attempt", failed)
+    return failed
+
+
+def prune(batch_size=1000):
+    """Delete one batch of finished jobs past ``JOB_RETENTION_HOURS``; returns the number deleted."""
+    cutoff = timezone.now() - timedelta(hours=settings.JOB_RETENTION_HOURS)
+    expired = Job.objects.filter(status='done', finished_at__lt=cutoff).values('id')[:batch_size]
+    deleted, _ = Job.objects.filter(id__in=expired).delete()
+    return deleted
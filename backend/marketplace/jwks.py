@@ -0,0 +1,244 @@
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from jose import jwt
+
+from .http import async_client
+
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class JWKSUnavailable(Exception):
+    """No usable signing keys: the JWKS endpoint failed and nothing stale is cached."""
+
+
+class JWKSCache:
+    """
+    Kid-aware JWKS cache shared by every process through the Django cache.
+
+    Keys are kept for the ``Cache-Control: max-age`` the endpoint sends and
+    then refreshed. A token signed with an unknown ``kid`` forces a refresh
+    (at most once per ``min_refresh_interval``). Only one fetch runs at a
+    time: threads serialise on a lock and processes on a cache ``add()``
+    lock, and everyone else reuses its result. The ``add()`` is only atomic
+    on Redis or Memcached (required by the production settings); with the
+    file-based cache two processes can occasionally both fetch. If the
+    endpoint is down the last good key set is served for up to ``max_stale``
+    seconds.
+
+    ``aget_key`` is the same protocol for async views: the fetch goes
+    through the pooled async client and waiting never blocks the loop.
+    """
+
+    def __init__(self, url, cache_alias='default', default_max_age=300, min_refresh_interval=10,
+                 max_stale=86400, fetch_timeout=5):
+        self.url = url
+        self.cache_alias = cache_alias
+        self.default_max_age = default_max_age
+        self.min_refresh_interval = min_refresh_interval
+        self.max_stale = max_stale
+        self.fetch_timeout = fetch_timeout
+        self.cache_key = 'jwks:' + hashlib.sha256(url.encode()).hexdigest()[:16]
+        self.lock_key = self.cache_key + ':lock'
+        self._entry = None
+        self._lock = threading.Lock()
+        self._async_locks = weakref.WeakKeyDictionary()
+        self._session = requests.Session()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get_key(self, kid):
+        entry = self._load()
+        if entry and kid in entry['keys'] and time.time() < entry['expires_at']:
+            return entry['keys'][kid]
+
+        entry = self._refresh(entry, unknown_kid=entry is not None and kid not in entry['keys'])
+        if entry is None:
+            raise JWKSUnavailable(f'Could not load signing keys from {self.url}')
+        if kid not in entry['keys']:
+            raise jwt.JWTError(f'Unknown signing key: {kid}')
+        return entry['keys'][kid]
+
+    def _load(self):
+        entry = self._entry
+        if entry is None or time.time() >= entry['expires_at']:
+            shared = self.cache.get(self.cache_key)
+            if shared is not None and (entry is None or shared['fetched_at'] > entry['fetched_at']):
+                entry = self._entry = shared
+        return entry
+
+    def _refresh(self, entry, unknown_kid=False):
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            latest = self._load()
+            if latest is not entry and latest is not None:
+                return latest
+            if entry and unknown_kid and time.time() - entry['fetched_at'] < self.min_refresh_interval:
+                return entry
+
+            if not self.cache.add(self.lock_key, 1, timeout=self.fetch_timeout + 1):
+                return self._wait_for_other_fetcher(entry)
+            try:
+                return self._fetch()
+            except (requests.RequestException, ValueError, KeyError) as e:
+                return self._fall_back(entry, e)
+            finally:
+                self.cache.delete(self.lock_key)
+
+    def _fall_back(self, entry, error):
+        logger.warning('JWKS refresh from %s failed: %s', self.url, error)
+        if entry and time.time() - entry['fetched_at'] < self.max_stale:
+            # Serve the stale keys and back off before the next attempt
+            self._entry = dict(entry, expires_at=time.time() + self.min_refresh_interval)
+            return self._entry
+        return None
+
+    def _wait_for_other_fetcher(self, entry):
+        deadline = time.time() + self.fetch_timeout
+        while time.time() < deadline:
+            time.sleep(0.05)
+            shared = self.cache.get(self.cache_key)
+            if shared is not None and (entry is None or shared['fetched_at'] > entry['fetched_at']):
+                self._entry = shared
+                return shared
+            if self.cache.get(self.lock_key) is None:
+                break
+        return entry
+
+    def _fetch(self):
+        response = self._session.get(self.url, timeout=self.fetch_timeout)
+        return self._store(response)
+
+    def _store(self, response):
+        response.raise_for_status()
+        keys = {key['kid']: key for key in response.json()['keys'] if 'kid' in key}
+
+        match = MAX_AGE_RE.search(response.headers.get('Cache-Control', ''))
+        max_age = int(match.group(1)) if match else self.default_max_age
+        now = time.time()
+        entry = {'keys': keys, 'fetched_at': now, 'expires_at': now + max_age}
+        self.cache.set(self.cache_key, entry, timeout=max_age + self.max_stale)
+        self._entry = entry
+        return entry
+
+    async def aget_key(self, kid):
+        entry = self._entry
+        if entry is None or time.time() >= entry['expires_at']:
+            entry = await sync_to_async(self._load)()
+        if entry and kid in entry['keys'] and time.time() < entry['expires_at']:
+            return entry['keys'][kid]
+
+        entry = await self._arefresh(entry, unknown_kid=entry is not None and kid not in entry['keys'])
+        if entry is None:
+            raise JWKSUnavailable(f'Could not load signing keys from {self.url}')
+        if kid not in entry['keys']:
+            raise jwt.JWTError(f'Unknown signing key: {kid}')
+        return entry['keys'][kid]
+
+    async def _arefresh(self, entry, unknown_kid=False):
+        loop = asyncio.get_running_loop()
+        lock = self._async_locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            latest = await sync_to_async(self._load)()
+            if latest is not entry and latest is not None:
+                return latest
+            if entry and unknown_kid and time.time() - entry['fetched_at'] < self.min_refresh_interval:
+                return entry
+
+            if not await self.cache.aadd(self.lock_key, 1, timeout=self.fetch_timeout + 1):
+                return await self._await_other_fetcher(entry)
+            try:
+                response = await async_client().get(self.url, timeout=self.fetch_timeout)
+                return await sync_to_async(self._store)(response)
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                return self._fall_back(entry, e)
+            finally:
+                await self.cache.adelete(self.lock_key)
+
+    async def _await_other_fetcher(self, entry):
+        deadline = time.time() + self.fetch_timeout
+        while time.time() < deadline:
+            await asyncio.sleep(0.05)
+            shared = await self.cache.aget(self.cache_key)
+            if shared is not None and (entry is None or shared['fetched_at'] > entry['fetched_at']):
+                self._entry = shared
+                return shared
+            if await self.cache.aget(self.lock_key) is None:
+                break
+        return entry
+
+
+privy_jwks = JWKSCache(settings.PRIVY_JWKS_URL, cache_alias=settings.PRIVY_JWKS_CACHE_ALIAS)
+
+
+def privy_token_cache_key(id_token):
+    return 'privy:token:' + hashlib.sha256(id_token.encode()).hexdigest()
+
+
+def decode_privy_token(id_token, key):
+    return jwt.decode(
+        id_token,
+        key,
+        algorithms=['RS256', 'ES256'],
+        audience=settings.PRIVY_APP_ID,
+        issuer=settings.PRIVY_ISSUER,
+        options={'verify_aud': True, 'verify_iss': True}
+    )
+
+
+def privy_token_ttl(claims):
+    return min(int(claims.get('exp', 0) - time.time()), settings.PRIVY_TOKEN_CACHE_SECONDS)
+
+
+def verify_privy_token(id_token):
+    """
+    Verify a Privy ID token and return its claims.
+
+    Verified claims are cached by token hash until ``exp`` (capped by
+    ``PRIVY_TOKEN_CACHE_SECONDS``) so repeat logins skip signature checks.
+    """
+    cache = caches[settings.PRIVY_JWKS_CACHE_ALIAS]
+    cache_key = privy_token_cache_key(id_token)
+    claims = cache.get(cache_key)
+    if claims is not None:
+        return claims
+
+    kid = jwt.get_unverified_header(id_token).get('kid')
+    claims = decode_privy_token(id_token, privy_jwks.get_key(kid))
+
+    ttl = privy_token_ttl(claims)
+    if ttl > 0:
+        cache.set(cache_key, claims, timeout=ttl)
+    return claims
+
+
+async def averify_privy_token(id_token):
+    """``verify_privy_token`` for async views."""
+    cache = caches[settings.PRIVY_JWKS_CACHE_ALIAS]
+    cache_key = privy_token_cache_key(id_token)
+    claims = await cache.aget(cache_key)
+    if claims is not None:
+        return claims
+
+    kid = jwt.get_unverified_header(id_token).get('kid')
+    claims = decode_privy_token(id_token, await privy_jwks.aget_key(kid))
+
+    ttl = privy_token_ttl(claims)
+    if ttl > 0:
+        await cache.aset(cache_key, claims, timeout=ttl)
+    return claims
@@ -0,0 +1,114 @@
+import hashlib
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+
+# Scratch copies of the order id columns before (varchar hex with the unique
+# and varchar_pattern_ops indexes Django created) and after (bytea) 0023
+SCHEMAS = {
+    'varchar': {
+        'column': 'varchar(66)',
+        'value': "'0x' || md5(g::text) || md5((-g)::text)",
+        'indexes': [
+            'CREATE UNIQUE INDEX ON {table} (order_id)',
+            'CREATE INDEX ON {table} (order_id varchar_pattern_ops)',
+        ],
+        'param': lambda order_id: order_id,
+    },
+    'bytea': {
+        'column': 'bytea',
+        'value': "decode(md5(g::text) || md5((-g)::text), 'hex')",
+        'indexes': ['CREATE UNIQUE INDEX ON {table} (order_id)'],
+        'param': lambda order_id: bytes.fromhex(order_id[2:]),
+    },
+}
+
+
+def seeded_order_id(n):
+    """The id row ``n`` of a scratch table gets, as the API would render it."""
+    return '0x' + hashlib.md5(str(n).encode()).hexdigest() + hashlib.md5(str(-n).encode()).hexdigest()
+
+
+class Command(BaseCommand):
+    help = "Compare index size and lookup latency of order ids stored as varchar hex and as bytea"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000,
+                            help='Orders to seed into each scratch table (default: 1,000,000)')
+        parser.add_argument('--lookups', type=int, default=5_000,
+                            help='Timed point lookups per schema (default: 5,000)')
+        parser.add_argument('--batch', type=int, default=500,
+                            help='Ids per order_id IN (...) lookup, as the indexer issues (default: 500)')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        sample = [seeded_order_id(random.randint(1, rows)) for _ in range(options['lookups'])]
+
+        # Temporary tables vanish with the session; the transaction keeps them on one connection
+        with transaction.atomic():
+            self.stdout.write(
+                f"{'schema':<9}{'table MB':>10}{'index MB':>10}{'point median us':>17}{'point p95 us':>14}"
+                f"{'IN ms':>8}"
+            )
+            for name, schema in SCHEMAS.items():
+                table = f'bench_order_{name}'
+                self.seed(table, schema, rows)
+                table_size, index_size = self.sizes(table)
+                params = [schema['param'](order_id) for order_id in sample]
+                point = self.time_point_lookups(table, params)
+                batch = self.time_batch_lookups(table, params, options['batch'])
+                p95 = sorted(point)[max(0, int(len(point) * 0.95) - 1)]
+                self.stdout.write(
+                    f"{name:<9}{table_size:>10.1f}{index_size:>10.1f}{statistics.median(point):>17.1f}"
+                    f"{p95:>14.1f}{statistics.median(batch):>8.2f}"
+                )
+
+    def seed(self, table, schema, rows):
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {table} (id bigint PRIMARY KEY, order_id {schema['column']} NOT NULL) "
+                f"ON COMMIT DROP"
+            )
+            cursor.execute(
+                f"INSERT INTO {table} SELECT g, {schema['value']} FROM generate_series(1, %s) AS g", [rows]
+            )
+            for index in schema['indexes']:
+                cursor.execute(index.format(table=table))
+            cursor.execute(f'ANALYZE {table}')
+        self.stderr.write(f"Seeded {table} in {time.perf_counter() - started:.1f}s")
+
+    def sizes(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_relation_size(%s::regclass), pg_indexes_size(%s::regclass) - "
+                "pg_relation_size((SELECT indexrelid FROM pg_index WHERE indrelid = %s::regclass AND indisprimary))",
+                [table, table, table],
+            )
+            table_bytes, index_bytes = cursor.fetchone()
+        return table_bytes / 2 ** 20, index_bytes / 2 ** 20
+
+    def time_point_lookups(self, table, params):
+        timings = []
+        with connection.cursor() as cursor:
+            for param in params:
+                started = time.perf_counter()
+                cursor.execute(f"SELECT id FROM {table} WHERE order_id = %s", [param])
+                cursor.fetchone()
+                timings.append((time.perf_counter() - started) * 1_000_000)
+        return timings
+
+    def time_batch_lookups(self, table, params, batch):
+        timings = []
+        with connection.cursor() as cursor:
+            for start in range(0, len(params), batch):
+                chunk = params[start:start + batch]
+                started = time.perf_counter()
+                cursor.execute(f"SELECT id FROM {table} WHERE order_id = ANY(%s)", [chunk])
+                cursor.fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+        return timings
@@ -0,0 +1,120 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from marketplace.filters import ListingFilter, ListingOrderingFilter, ListingSearchFilter
+from marketplace.models import Listing
+
+
+BENCH_USERNAME = 'search_benchmark'
+
+VOCABULARY = [
+    'wireless', 'headphones', 'ebook', 'python', 'course', 'template', 'preset', 'lightroom',
+    'wallpaper', 'font', 'icon', 'pack', 'guide', 'crypto', 'trading', 'bot', 'script', 'theme',
+    'wordpress', 'figma', 'ui', 'kit', 'music', 'sample', 'loop', 'video', 'tutorial', 'photo',
+    'stock', 'vector', 'illustration', 'game', 'asset', 'unity', 'plugin', 'license', 'key',
+    'software', 'design', 'notion', 'planner', 'resume', 'recipe', 'fitness', 'program', 'audio',
+]
+
+SEED_SQL = """
+WITH vocab AS (SELECT %s::text[] AS words)
+INSERT INTO marketplace_listing (
+    seller_id, title, description, price, currency, token_address, image_url,
+    payment_method, listing_duration_days, status, is_deleted, created_at, updated_at, expires_at
+)
+SELECT
+    %s,
+    words[1 + floor(random() * n)::int] || ' ' || words[1 + floor(random() * n)::int] || ' ' ||
+        words[1 + floor(random() * n)::int],
+    array_to_string(ARRAY(
+        SELECT words[1 + floor(random() * n)::int] FROM generate_series(1, 12 + (g %% 3))
+    ), ' '),
+    round((random() * 500)::numeric, 2),
+    CASE WHEN random() < 0.5 THEN 'USDT' ELSE 'USDC' END,
+    decode(repeat('00', 20), 'hex'),
+    '',
+    'escrow',
+    30,
+    'active',
+    false,
+    now() - (g || ' seconds')::interval,
+    now(),
+    now() - (g || ' seconds')::interval + interval '30 days'
+FROM generate_series(1, %s) AS g, vocab, LATERAL (SELECT array_length(words, 1) AS n) AS size
+"""
+
+
+class BenchView:
+    search_fields = ['title', 'description']
+    ordering_fields = ['price', 'created_at', 'title']
+    ordering = ['-created_at']
+
+
+class Command(BaseCommand):
+    help = "Compare the ILIKE SearchFilter with the full-text listing search on a seeded table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000,
+                            help='Listings to seed before benchmarking (default: 1,000,000)')
+        parser.add_argument('--runs', type=int, default=5, help='Timed runs per query (default: 5)')
+        parser.add_argument('--terms', nargs='+', default=['wireless', 'pyth', 'figma kit', 'tutorail'],
+                            help='Search inputs to compare')
+        parser.add_argument('--max-price', default='250', help='ListingFilter max_price applied to every query')
+        parser.add_argument('--skip-seed', action='store_true', help='Reuse rows seeded by an earlier --keep run')
+        parser.add_argument('--keep', action='store_true', help='Leave the seeded rows in place')
+
+    def handle(self, *args, **options):
+        seller, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+        if not options['skip_seed']:
+            self.seed(seller, options['rows'])
+
+        try:
+            self.stdout.write(f"{'search':<14}{'backend':<10}{'rows':>6}{'median ms':>12}{'p95 ms':>10}")
+            for term in options['terms']:
+                params = {'search': term, 'max_price': options['max_price']}
+                for label, search_backend, ordering_backend in (
+                    ('ilike', SearchFilter, OrderingFilter),
+                    ('fts', ListingSearchFilter, ListingOrderingFilter),
+                ):
+                    queryset = self.build_queryset(params, search_backend, ordering_backend)
+                    rows, timings = self.time_queryset(queryset, options['runs'])
+                    p95 = sorted(timings)[max(0, int(len(timings) * 0.95) - 1)]
+                    self.stdout.write(
+                        f"{term:<14}{label:<10}{rows:>6}{statistics.median(timings):>12.1f}{p95:>10.1f}"
+                    )
+        finally:
+            if not options['keep']:
+                deleted, _ = Listing.objects.filter(seller=seller).delete()
+                self.stdout.write(f"Removed {deleted} seeded listing(s)")
+
+    def seed(self, seller, rows):
+        self.stdout.write(f"Seeding {rows} listing(s)...")
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(SEED_SQL, [VOCABULARY, seller.id, rows])
+            cursor.execute('ANALYZE marketplace_listing')
+        self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    def build_queryset(self, params, search_backend, ordering_backend):
+        request = Request(APIRequestFactory().get('/api/listings/', params))
+        view = BenchView()
+        queryset = Listing.objects.filter(status='active', is_deleted=False)
+        queryset = ListingFilter(request.query_params, queryset=queryset, request=request).qs
+        queryset = search_backend().filter_queryset(request, queryset, view)
+        return ordering_backend().filter_queryset(request, queryset, view)
+
+    def time_queryset(self, queryset, runs):
+        """Time the first feed page, which is what the Mini App requests."""
+        timings = []
+        rows = 0
+        for _ in range(runs):
+            started = time.perf_counter()
+            rows = len(list(queryset.values_list('id', flat=True)[:20]))
+            timings.append((time.perf_counter() - started) * 1000)
+        return rows, timings
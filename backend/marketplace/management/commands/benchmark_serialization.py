@@ -0,0 +1,65 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from marketplace.management.commands.benchmark_listing_search import BENCH_USERNAME, SEED_SQL, VOCABULARY
+from marketplace.models import Listing
+from marketplace.renderers import FastJSONRenderer
+from marketplace.serializers import ListingSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare instance + DRF serializer + stdlib JSON with .values() rows + orjson for the listing feed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000,
+                            help='Listings to seed before benchmarking (default: 10,000)')
+        parser.add_argument('--runs', type=int, default=5, help='Timed runs per variant (default: 5)')
+        parser.add_argument('--fields', nargs='+', default=['', 'card'],
+                            help="?fields= values to compare ('' renders every field)")
+
+    def handle(self, *args, **options):
+        seller, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+        with connection.cursor() as cursor:
+            cursor.execute(SEED_SQL, [VOCABULARY, seller.id, options['rows']])
+
+        try:
+            queryset = Listing.objects.filter(seller=seller).order_by('-created_at', '-id')
+            self.stdout.write(f"{'fields':<8}{'path':<10}{'median ms':>11}{'p95 ms':>9}{'KB':>8}")
+            for fields in options['fields']:
+                request = Request(APIRequestFactory().get('/', {'fields': fields} if fields else {}))
+                serializer = ListingSerializer(context={'request': request})
+                plan = serializer.get_row_plan()
+                projected = serializer.project_queryset(queryset)
+
+                variants = {
+                    'drf': lambda: JSONRenderer().render(
+                        ListingSerializer(projected, many=True, context={'request': request}).data
+                    ),
+                    'rows': lambda: FastJSONRenderer().render(plan.render_many(queryset.values(*plan.columns))),
+                }
+                outputs = {}
+                for label, render in variants.items():
+                    timings = []
+                    for _ in range(options['runs']):
+                        started = time.perf_counter()
+                        outputs[label] = render()
+                        timings.append((time.perf_counter() - started) * 1000)
+                    p95 = sorted(timings)[max(0, int(len(timings) * 0.95) - 1)]
+                    self.stdout.write(
+                        f"{fields or 'all':<8}{label:<10}{statistics.median(timings):>11.1f}{p95:>9.1f}"
+                        f"{len(outputs[label]) / 1024:>8.0f}"
+                    )
+                if outputs['drf'] != outputs['rows']:
+                    self.stdout.write(self.style.ERROR(f"Output differs for fields={fields!r}"))
+        finally:
+            # Raw like the seed: the ORM delete would fire a cache-bump signal per row
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM marketplace_listing WHERE seller_id = %s', [seller.id])
+                self.stdout.write(f"Removed {cursor.rowcount} seeded listing(s)")
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.functions import Now
+
+from marketplace.models import Listing
+from marketplace.resultcache import bump_listing_version
+
+
+class Command(BaseCommand):
+    help = "Flip expired active listings to inactive in bounded batches (run from cron or a scheduler)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Listings updated per UPDATE statement (default: 1000)')
+        parser.add_argument('--sleep', type=float, default=0.05,
+                            help='Seconds to pause between batches (default: 0.05)')
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop after this many batches (default: until none are left)')
+
+    def handle(self, *args, **options):
+        total = batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            # One UPDATE ... WHERE id IN (SELECT ... LIMIT n FOR UPDATE SKIP LOCKED) per
+            # batch, committed on its own, so row locks stay short-lived and rows a
+            # request is currently writing are left for the next run
+            batch = (
+                Listing.objects.expired()
+                .order_by('expires_at')
+                .select_for_update(skip_locked=True)
+                .values('id')[:options['batch_size']]
+            )
+            with transaction.atomic():
+                updated = Listing.objects.filter(id__in=batch).update(status='inactive', updated_at=Now())
+            if not updated:
+                break
+            total += updated
+            batches += 1
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        if total:
+            # Queryset.update() bypasses the post_save invalidation
+            bump_listing_version()
+        self.stdout.write(self.style.SUCCESS(f"Expired {total} listing(s) in {batches} batch(es)"))
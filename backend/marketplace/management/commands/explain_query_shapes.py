@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from marketplace.query_shapes import QUERY_SHAPES
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN (ANALYZE, BUFFERS) for every registered API query shape and flag sequential scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument('shapes', nargs='*', help='Only check these shapes (default: all)')
+        parser.add_argument('--min-rows', type=int, default=10_000,
+                            help='Ignore sequential scans on tables with fewer estimated rows (default: 10,000)')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print the full JSON plan for each shape')
+        parser.add_argument('--fail-on-seqscan', action='store_true',
+                            help='Exit with an error when any shape is flagged')
+
+    def handle(self, *args, **options):
+        unknown = set(options['shapes']) - set(QUERY_SHAPES)
+        if unknown:
+            raise CommandError(f"Unknown query shape(s): {', '.join(sorted(unknown))}")
+
+        table_rows = self.table_row_estimates()
+        flagged = []
+        for name in options['shapes'] or sorted(QUERY_SHAPES):
+            queryset = QUERY_SHAPES[name]()
+            plan = json.loads(queryset.explain(format='json', analyze=True, buffers=True))[0]
+            if options['verbose_plans']:
+                self.stdout.write(json.dumps(plan, indent=2))
+
+            seq_scans = [
+                node['Relation Name'] for node in self.walk(plan['Plan'])
+                if node['Node Type'] == 'Seq Scan'
+                and table_rows.get(node['Relation Name'], 0) >= options['min_rows']
+            ]
+            root = plan['Plan']
+            summary = (
+                f"{name:<34}{plan['Execution Time']:>10.2f} ms  "
+                f"buffers hit={root.get('Shared Hit Blocks', 0)} read={root.get('Shared Read Blocks', 0)}"
+            )
+            if seq_scans:
+                flagged.append(name)
+                self.stdout.write(self.style.WARNING(f"{summary}  SEQ SCAN on {', '.join(seq_scans)}"))
+            else:
+                self.stdout.write(summary)
+
+        if flagged and options['fail_on_seqscan']:
+            raise CommandError(f"Sequential scans in: {', '.join(flagged)}")
+
+    def walk(self, node):
+        yield node
+        for child in node.get('Plans', []):
+            yield from self.walk(child)
+
+    def table_row_estimates(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT relname, reltuples FROM pg_class WHERE relkind = 'r'")
+            return {name: rows for name, rows in cursor.fetchall()}
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from marketplace.jobs import enqueue
+from marketplace.models import UploadedFile
+
+
+class Command(BaseCommand):
+    help = "Queue variant generation for image uploads that have none (uploads made before variants, or a new width)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Regenerate every image upload, e.g. after changing IMAGE_VARIANT_WIDTHS')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Jobs queued per transaction (default: 500)')
+
+    def handle(self, *args, **options):
+        uploads = UploadedFile.objects.filter(sha256__isnull=False, content_type__startswith='image/')
+        if not options['all']:
+            uploads = uploads.filter(variants__isnull=True)
+        digests = list(uploads.order_by('id').values_list('sha256', flat=True))
+
+        for start in range(0, len(digests), options['batch_size']):
+            with transaction.atomic():
+                for digest in digests[start:start + options['batch_size']]:
+                    enqueue('media.generate_variants', sha256=digest)
+        self.stdout.write(self.style.SUCCESS(
+            f"Queued {len(digests)} upload(s); run_jobs workers on the media queue will generate the variants"
+        ))
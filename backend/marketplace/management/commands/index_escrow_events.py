@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from marketplace.chain import RPCError
+from marketplace.indexer import EscrowIndexer, ReorgTooDeep
+
+
+class Command(BaseCommand):
+    help = "Tail escrow contract events from the JSON-RPC node and apply them to orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Catch up to the current head and exit')
+        parser.add_argument('--poll-interval', type=float, default=2,
+                            help='Seconds between polls once caught up (default: 2)')
+        parser.add_argument('--block-range', type=int, default=None,
+                            help='Blocks per eth_getLogs call (default: ESCROW_LOG_BLOCK_RANGE)')
+
+    def handle(self, *args, **options):
+        if not settings.ESCROW_CONTRACT_ADDRESS:
+            raise CommandError('ESCROW_CONTRACT_ADDRESS is not set')
+        indexer = EscrowIndexer(block_range=options['block_range'])
+
+        while True:
+            started = time.perf_counter()
+            try:
+                blocks, events = indexer.run_once()
+            except ReorgTooDeep as e:
+                raise CommandError(str(e))
+            except RPCError as e:
+                if options['once']:
+                    raise CommandError(str(e))
+                self.stderr.write(f"{e}; retrying in {options['poll_interval']}s")
+                time.sleep(options['poll_interval'])
+                continue
+
+            if blocks:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"Indexed {blocks} block(s), {events} event(s) in {elapsed:.2f}s "
+                    f"(at block {indexer.checkpoint().block_number})"
+                )
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
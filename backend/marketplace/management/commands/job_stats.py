@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.jobs import queue_metrics
+
+
+class Command(BaseCommand):
+    help = "Show per-queue depth, throughput and lag of the background job queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, default=60,
+                            help='Seconds of finished jobs to measure throughput over (default: 60)')
+
+    def handle(self, *args, **options):
+        metrics = queue_metrics(options['window'])
+        if not metrics:
+            self.stdout.write('No jobs')
+            return
+
+        self.stdout.write(f"{'queue':<16} {'queued':>7} {'due':>7} {'running':>8} {'failed':>7} {'jobs/s':>8} {'lag s':>8}")
+        for queue, stats in sorted(metrics.items()):
+            self.stdout.write(
+                f"{queue:<16} {stats['queued']:>7} {stats['due']:>7} {stats['running']:>8} {stats['failed']:>7} "
+                f"{stats['throughput']:>8.2f} {stats['lag']:>8.1f}"
+            )
@@ -0,0 +1,75 @@
+import asyncio
+import statistics
+import time
+from collections import Counter
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Drive concurrent requests at a running server and report throughput and latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Request paths, cycled through (e.g. /api/listings/1/)')
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server origin (default: %(default)s)')
+        parser.add_argument('--concurrency', type=int, default=100,
+                            help='Requests kept in flight at once (default: 100)')
+        parser.add_argument('--requests', type=int, default=2000, help='Total requests to send (default: 2000)')
+        parser.add_argument('--method', default='GET', help='HTTP method (default: GET)')
+        parser.add_argument('--body', default=None, help='JSON request body for POST requests')
+        parser.add_argument('--header', action='append', default=[], metavar='NAME:VALUE',
+                            help='Extra request header; repeatable')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds (default: 30)')
+
+    def handle(self, *args, **options):
+        headers = {}
+        for header in options['header']:
+            name, sep, value = header.partition(':')
+            if not sep:
+                raise CommandError(f"Header must look like NAME:VALUE, got {header!r}")
+            headers[name.strip()] = value.strip()
+        if options['body'] is not None:
+            headers.setdefault('Content-Type', 'application/json')
+
+        latencies, statuses, elapsed = asyncio.run(self.run(options, headers))
+
+        ordered = sorted(latencies)
+
+        def percentile(p):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+        self.stdout.write(
+            f"{len(latencies)} requests, concurrency {options['concurrency']}, {elapsed:.2f}s: "
+            f"{len(latencies) / elapsed:.0f} req/s"
+        )
+        self.stdout.write(
+            f"latency ms  p50 {statistics.median(ordered) * 1000:.1f}  p95 {percentile(0.95):.1f}  "
+            f"p99 {percentile(0.99):.1f}  max {ordered[-1] * 1000:.1f}"
+        )
+        self.stdout.write('status ' + '  '.join(f"{code}: {count}" for code, count in sorted(statuses.items(), key=lambda item: str(item[0]))))
+
+    async def run(self, options, headers):
+        total = options['requests']
+        paths = options['paths']
+        latencies = []
+        statuses = Counter()
+        next_request = iter(range(total))
+        limits = httpx.Limits(max_connections=options['concurrency'], max_keepalive_connections=options['concurrency'])
+
+        async with httpx.AsyncClient(base_url=options['base_url'], headers=headers, limits=limits,
+                                     timeout=options['timeout']) as client:
+            async def worker():
+                for n in next_request:
+                    started = time.perf_counter()
+                    try:
+                        response = await client.request(options['method'], paths[n % len(paths)],
+                                                        content=options['body'])
+                        statuses[response.status_code] += 1
+                    except httpx.HTTPError as e:
+                        statuses[type(e).__name__] += 1
+                    latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(options['concurrency'])))
+            return latencies, statuses, time.perf_counter() - started
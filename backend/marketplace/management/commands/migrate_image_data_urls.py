@@ -0,0 +1,75 @@
+import base64
+import binascii
+import re
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from marketplace.blobstore import blob_store, blob_url
+from marketplace.models import Listing, UploadedFile
+from marketplace.resultcache import bump_listing_version
+
+
+DATA_URL_RE = re.compile(r'^data:(?P<content_type>[^;,]*)(?P<params>(;[^;,]*)*),(?P<data>.*)$', re.DOTALL)
+
+
+class Command(BaseCommand):
+    help = "Move base64 data URLs out of Listing.image_url into the blob store"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Rows fetched per round trip (default: 100)')
+        parser.add_argument('--base-url', default='',
+                            help='Public API origin for the new image URLs (default: BLOB_BASE_URL)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would be migrated without writing anything')
+
+    def handle(self, *args, **options):
+        rows = (
+            Listing.objects.filter(image_url__startswith='data:')
+            .only('id', 'seller_id', 'image_url')
+            .order_by('id')
+            .iterator(chunk_size=options['batch_size'])
+        )
+
+        migrated = skipped = saved_bytes = 0
+        for listing in rows:
+            match = DATA_URL_RE.match(listing.image_url)
+            if not match or ';base64' not in match.group('params'):
+                self.stderr.write(f"Listing {listing.id}: unsupported data URL, skipped")
+                skipped += 1
+                continue
+            try:
+                content = base64.b64decode(match.group('data'), validate=False)
+            except (binascii.Error, ValueError):
+                self.stderr.write(f"Listing {listing.id}: invalid base64 payload, skipped")
+                skipped += 1
+                continue
+
+            if options['dry_run']:
+                migrated += 1
+                saved_bytes += len(listing.image_url)
+                continue
+
+            digest, size = blob_store.put_bytes(content)
+            UploadedFile.objects.get_or_create(
+                sha256=digest,
+                defaults={'file_size': size, 'content_type': match.group('content_type'),
+                          'uploaded_by_id': listing.seller_id}
+            )
+            Listing.objects.filter(pk=listing.pk).update(
+                image_url=blob_url(digest, base_url=options['base_url']),
+                updated_at=timezone.now()
+            )
+            migrated += 1
+            saved_bytes += len(listing.image_url)
+
+        if migrated and not options['dry_run']:
+            # Queryset.update() bypasses the post_save invalidation
+            bump_listing_version()
+
+        prefix = '[dry run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Migrated {migrated} listing image(s), skipped {skipped}, "
+            f"{saved_bytes / (1024 * 1024):.1f} MB of data URLs moved out of the database"
+        ))
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from marketplace import uploads
+from marketplace.models import ChunkedUpload
+
+
+class Command(BaseCommand):
+    help = "Delete resumable uploads older than UPLOAD_EXPIRY_HOURS and the partial files of unfinished ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Uploads deleted per query (default: 1000)')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=settings.UPLOAD_EXPIRY_HOURS)
+        abandoned = deleted = 0
+        while True:
+            batch = list(ChunkedUpload.objects.filter(created_at__lt=cutoff).order_by('created_at')[:options['batch_size']])
+            if not batch:
+                break
+            for upload in batch:
+                if upload.completed_at is None:
+                    uploads.discard(upload)
+                    abandoned += 1
+            deleted += ChunkedUpload.objects.filter(id__in=[upload.id for upload in batch]).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} upload(s), {abandoned} of them unfinished"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from marketplace.reputation import repair_seller_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild seller order/dispute counters from the Order and Dispute tables in one pass"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report how many profiles have drifted without writing anything')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            corrected = repair_seller_stats()
+            if options['dry_run']:
+                transaction.set_rollback(True)
+
+        verb = 'would be corrected' if options['dry_run'] else 'corrected'
+        self.stdout.write(self.style.SUCCESS(f"{corrected} profile(s) {verb}"))
@@ -0,0 +1,110 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from marketplace import jobs
+
+
+logger = logging.getLogger('marketplace.jobs')
+
+
+def work(queues, batch_size, poll_interval, stop, once=False):
+    """Claim and run jobs until ``stop`` is set (or, with ``once``, until nothing is due)."""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    if not once:
+        # The supervisor owns shutdown: Ctrl-C reaches the whole process group
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    processed = 0
+    try:
+        while not stop.is_set():
+            claimed = jobs.claim(queues, worker_id, batch_size)
+            if not claimed:
+                if once:
+                    break
+                stop.wait(poll_interval)
+                continue
+            for job in claimed:
+                jobs.run(job, worker_id)
+                processed += 1
+    finally:
+        connections.close_all()
+    return processed
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the Postgres queue in one or more worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='append', dest='queues',
+                            help='Queue to work on; repeatable (default: default, escrow and media)')
+        parser.add_argument('--processes', type=int, default=1, help='Worker processes (default: 1)')
+        parser.add_argument('--batch-size', type=int, default=10,
+                            help='Jobs claimed per round trip (default: 10)')
+        parser.add_argument('--poll-interval', type=float, default=1,
+                            help='Seconds to wait when no job is due (default: 1)')
+        parser.add_argument('--metrics-interval', type=float, default=60,
+                            help='Seconds between queue metrics log lines (default: 60)')
+        parser.add_argument('--once', action='store_true',
+                            help='Run the due jobs in this process and exit')
+
+    def handle(self, *args, **options):
+        queues = options['queues'] or ['default', 'escrow', 'media']
+        if options['once']:
+            processed = work(queues, options['batch_size'], options['poll_interval'], multiprocessing.Event(), once=True)
+            self.stdout.write(self.style.SUCCESS(f"Ran {processed} job(s)"))
+            return
+
+        # Setting a multiprocessing.Event from a signal handler can deadlock on its
+        # lock, so the handler only flips a flag that the supervisor loop checks
+        stopping = []
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stopping.append(True))
+        stop = multiprocessing.Event()
+
+        # Children must open their own connections, never share the parent's socket
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        worker_args = (queues, options['batch_size'], options['poll_interval'], stop)
+        workers = [context.Process(target=work, args=worker_args) for _ in range(options['processes'])]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {len(workers)} worker(s) on {', '.join(queues)}")
+
+        next_report = time.monotonic() + options['metrics_interval']
+        while not stopping:
+            time.sleep(1)
+            for index, worker in enumerate(workers):
+                if not worker.is_alive() and not stopping:
+                    logger.warning("Worker %s exited with %s; restarting", worker.pid, worker.exitcode)
+                    workers[index] = context.Process(target=work, args=worker_args)
+                    workers[index].start()
+            if time.monotonic() >= next_report:
+                next_report = time.monotonic() + options['metrics_interval']
+                self.report(queues)
+                jobs.fail_abandoned()
+                jobs.prune()
+                connections.close_all()
+
+        # Workers finish the job in hand before exiting
+        stop.set()
+        for worker in workers:
+            worker.join()
+        self.stdout.write('Workers stopped')
+
+    def report(self, queues):
+        metrics = jobs.queue_metrics()
+        for queue in queues:
+            stats = metrics.get(queue)
+            if stats is None:
+                continue
+            logger.info(
+                "queue=%s due=%s running=%s failed=%s throughput=%.2f/s lag=%.1fs",
+                queue, stats['due'], stats['running'], stats['failed'], stats['throughput'], stats['lag'],
+            )
@@ -0,0 +1,110 @@
+import threading
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from marketplace.authentication import issue_session_token
+from marketplace.models import Listing, Order, UserProfile
+
+
+STRESS_USERNAMES = ('stress_seller', 'stress_buyer')
+
+
+class Command(BaseCommand):
+    help = "Fire parallel deposits and confirmations at the same orders and check each transition happens once"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=20, help='Orders to race over (default: 20)')
+        parser.add_argument('--threads', type=int, default=16,
+                            help='Concurrent requests per order, half deposits and half confirms (default: 16)')
+        parser.add_argument('--keep', action='store_true', help='Leave the stress orders in place')
+
+    def handle(self, *args, **options):
+        seller, buyer = self.users()
+        listing = Listing.objects.create(
+            seller=seller, title='Stress test listing', description='stress_order_transitions',
+            price=1, token_address='0x0000000000000000000000000000000000000000',
+        )
+        total_orders_before = UserProfile.objects.get(user=seller).total_orders
+
+        failures = []
+        try:
+            for _ in range(options['orders']):
+                order = Order.objects.create(
+                    order_id='0x' + uuid.uuid4().hex * 2, listing=listing, buyer=buyer, seller=seller,
+                    amount=1, token_address=listing.token_address, deadline=timezone.now() + timedelta(days=1),
+                )
+                results = self.race(order.order_id, buyer, options['threads'])
+                order.refresh_from_db()
+
+                deposits = results['deposit', 200]
+                confirms = results['confirm', 200]
+                if deposits != 1:
+                    failures.append(f"{order.order_id}: {deposits} deposits succeeded")
+                if confirms > 1:
+                    failures.append(f"{order.order_id}: {confirms} confirmations succeeded")
+                expected = 'completed' if confirms else 'paid'
+                if order.status != expected:
+                    failures.append(f"{order.order_id}: ended {order.status}, expected {expected}")
+                self.stdout.write(f"{order.order_id[-8:]} {order.status:<10} {dict(results)}")
+
+            completed = Order.objects.filter(listing=listing, status='completed').count()
+            credited = UserProfile.objects.get(user=seller).total_orders - total_orders_before
+            if credited != completed:
+                failures.append(f"seller credited {credited} sale(s) for {completed} completed order(s)")
+        finally:
+            if not options['keep']:
+                # Deleting bypasses the counters; put the seller back where it started
+                Order.objects.filter(listing=listing).delete()
+                listing.delete()
+                UserProfile.objects.filter(user=seller).update(total_orders=total_orders_before)
+
+        if failures:
+            raise CommandError('\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS(f"{options['orders']} order(s) transitioned exactly once"))
+
+    def users(self):
+        users = []
+        for offset, username in enumerate(STRESS_USERNAMES):
+            user, _ = User.objects.get_or_create(username=username)
+            UserProfile.objects.get_or_create(user=user, defaults={'telegram_id': -1 - offset})
+            users.append(user)
+        return users
+
+    def race(self, order_id, buyer, threads):
+        """Release interleaved deposit and confirm requests at the same instant; returns (kind, status) counts."""
+        barrier = threading.Barrier(threads)
+        results = Counter()
+        lock = threading.Lock()
+        token = issue_session_token(buyer)
+
+        def fire(kind):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+            try:
+                barrier.wait()
+                if kind == 'deposit':
+                    response = client.post(f'/api/orders/{order_id}/deposit/',
+                                           {'buyer_address': '0x' + '0' * 40}, format='json')
+                else:
+                    response = client.post(f'/api/orders/{order_id}/confirm/')
+                with lock:
+                    results[kind, response.status_code] += 1
+            finally:
+                connections.close_all()
+
+        workers = [
+            threading.Thread(target=fire, args=('deposit' if i % 2 == 0 else 'confirm',))
+            for i in range(threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return results
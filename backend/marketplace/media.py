@@ -0,0 +1,113 @@
+"""
+Resized, metadata-free variants of uploaded listing images.
+
+Each image upload queues ``media.generate_variants`` (``marketplace.tasks``)
+on the ``media`` queue, so resizing runs in ``run_jobs`` worker processes
+rather than on the request thread. A job decodes the original once (JPEGs
+at a reduced DCT scale when that still covers the largest width), applies
+the EXIF orientation and re-encodes it as WebP and JPEG at every
+``IMAGE_VARIANT_WIDTHS`` width, never upscaling and without EXIF or other
+metadata. Variants are stored beside the original in the blob store and
+served at ``/api/blobs/<digest>/w<width>.<webp|jpg>``; that URL returns the
+original until the variant exists, so representations can point at
+variants without knowing whether they are ready.
+"""
+import io
+import re
+
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .blobstore import blob_store
+
+
+VARIANT_FORMATS = {
+    'webp': {'format': 'WEBP', 'content_type': 'image/webp', 'options': {'quality': 80, 'method': 4}},
+    'jpg': {'format': 'JPEG', 'content_type': 'image/jpeg', 'options': {'quality': 82, 'progressive': True}},
+}
+
+VARIANT_RE = re.compile(r'^w(?P<width>[1-9][0-9]*)\.(?P<ext>webp|jpg)$')
+
+# Listing images uploaded through UploadFileView: the blob URL, relative or absolute
+BLOB_URL_RE = re.compile(r'/blobs/[0-9a-f]{64}/$')
+
+
+class NotAnImage(ValueError):
+    pass
+
+
+def variant_name(width, ext):
+    return f'w{width}.{ext}'
+
+
+def parse_variant(name):
+    """``(width, ext)`` for the file name of a configured variant; raises ValueError otherwise."""
+    match = VARIANT_RE.match(name)
+    if match is None or int(match['width']) not in settings.IMAGE_VARIANT_WIDTHS:
+        raise ValueError(f'Unknown image variant: {name}')
+    return int(match['width']), match['ext']
+
+
+def variant_urls(image_url):
+    """
+    ``(thumbnail_url, srcset)`` for a listing image: the smallest JPEG and a
+    WebP ``srcset`` over every width for blob-store images, otherwise the
+    image itself and no ``srcset``.
+    """
+    if not image_url or not BLOB_URL_RE.search(image_url):
+        return image_url, None
+    widths = sorted(settings.IMAGE_VARIANT_WIDTHS)
+    srcset = ', '.join(f"{image_url}{variant_name(width, 'webp')} {width}w" for width in widths)
+    return image_url + variant_name(widths[0], 'jpg'), srcset
+
+
+def render_variants(source, widths):
+    """Decode the image in file ``source`` once; yields ``(name, width, height, data)`` per width and format."""
+    try:
+        image = Image.open(source)
+        largest = max(widths)
+        # Both sides stay >= the largest width, so it holds whatever the EXIF rotation
+        image.draft('RGB', (largest, largest))
+        icc_profile = image.info.get('icc_profile')
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise NotAnImage(str(e)) from e
+
+    if image.mode not in ('RGB', 'RGBA'):
+        has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    # Largest first, each step resized from the previous one
+    for width in sorted(widths, reverse=True):
+        if width < image.width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        flattened = None
+        for ext, spec in VARIANT_FORMATS.items():
+            frame = image
+            if spec['format'] == 'JPEG' and image.mode == 'RGBA':
+                if flattened is None:
+                    flattened = Image.new('RGB', image.size, 'white')
+                    flattened.paste(image, mask=image.getchannel('A'))
+                frame = flattened
+            buffer = io.BytesIO()
+            # Only what is passed here is written: no EXIF, XMP or comments
+            frame.save(buffer, spec['format'], icc_profile=icc_profile, **spec['options'])
+            yield variant_name(width, ext), frame.width, frame.height, buffer.getvalue()
+
+
+def generate_variants(digest):
+    """Render and store every variant of blob ``digest``; returns their metadata for ``ImageVariant`` rows."""
+    variants = []
+    with blob_store.open(digest) as source:
+        for name, width, height, data in render_variants(source, settings.IMAGE_VARIANT_WIDTHS):
+            blob_store.put_variant(digest, name, data)
+            variants.append({
+                'name': name,
+                'width': width,
+                'height': height,
+                'content_type': VARIANT_FORMATS[name.rsplit('.', 1)[1]]['content_type'],
+                'file_size': len(data),
+            })
+    return variants
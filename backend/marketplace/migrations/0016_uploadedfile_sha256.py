@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0015_userprofile_privy_user_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='sha256',
+            field=models.CharField(blank=True, help_text='Content digest in the blob store', max_length=64, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='uploadedfile',
+            name='file',
+            field=models.FileField(blank=True, upload_to='uploads/%Y/%m/%d/'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:31
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+# ListingFilter.seller_username compiles to UPPER(username) LIKE UPPER('%...%')
+SELLER_USERNAME_INDEX_SQL = (
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS auth_user_username_upper_trgm '
+    'ON auth_user USING gin (UPPER(username) gin_trgm_ops)'
+)
+DROP_SELLER_USERNAME_INDEX_SQL = 'DROP INDEX CONCURRENTLY IF EXISTS auth_user_username_upper_trgm'
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built CONCURRENTLY so large tables stay writable
+    atomic = False
+
+    dependencies = [
+        ('marketplace', '0017_listing_search_vector'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_deleted', False), ('status', 'active')), fields=['-created_at', '-id'], name='listing_feed_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_deleted', False), ('status', 'active')), fields=['price', 'created_at', 'id'], name='listing_feed_price_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_deleted', False), ('status', 'active')), fields=['title', 'created_at', 'id'], name='listing_feed_title_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_deleted', False), ('status', 'active')), fields=['seller', '-created_at'], name='listing_seller_feed_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['buyer', 'status', '-created_at'], name='order_buyer_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['seller', 'status', '-created_at'], name='order_seller_status_idx'),
+        ),
+        migrations.RunSQL(SELLER_USERNAME_INDEX_SQL, DROP_SELLER_USERNAME_INDEX_SQL),
+    ]
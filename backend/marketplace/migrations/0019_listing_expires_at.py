@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:37
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+BACKFILL_BATCH_SIZE = 10_000
+
+
+def backfill_expires_at(apps, schema_editor):
+    """Fill expires_at in id-range batches so no single UPDATE locks the whole table."""
+    Listing = apps.get_model('marketplace', 'Listing')
+    bounds = Listing.objects.aggregate(low=models.Min('id'), high=models.Max('id'))
+    if bounds['low'] is None:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for start in range(bounds['low'], bounds['high'] + 1, BACKFILL_BATCH_SIZE):
+            cursor.execute(
+                "UPDATE marketplace_listing "
+                "SET expires_at = created_at + listing_duration_days * interval '1 day' "
+                "WHERE id >= %s AND id < %s AND listing_duration_days > 0",
+                [start, start + BACKFILL_BATCH_SIZE],
+            )
+
+
+class Migration(migrations.Migration):
+
+    # Each backfill batch commits on its own and the index is built CONCURRENTLY
+    atomic = False
+
+    dependencies = [
+        ('marketplace', '0018_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='created_at + listing_duration_days, maintained on save', null=True),
+        ),
+        migrations.RunPython(backfill_expires_at, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_deleted', False), ('status', 'active')), fields=['expires_at'], name='listing_active_expiry_idx'),
+        ),
+    ]
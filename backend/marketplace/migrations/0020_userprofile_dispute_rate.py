@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0019_listing_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='dispute_rate',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='dispute_count / total_orders in percent, maintained by marketplace.reputation', max_digits=7),
+        ),
+    ]
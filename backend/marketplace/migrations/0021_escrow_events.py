@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0020_userprofile_dispute_rate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EscrowEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('block_number', models.BigIntegerField()),
+                ('block_hash', models.CharField(max_length=66)),
+                ('log_index', models.IntegerField()),
+                ('tx_hash', models.CharField(max_length=66)),
+                ('order_id', models.CharField(db_index=True, max_length=66)),
+                ('name', models.CharField(max_length=50)),
+                ('args', models.JSONField(default=list, help_text='Non-indexed event arguments in ABI order')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IndexerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('block_number', models.BigIntegerField()),
+                ('block_hash', models.CharField(blank=True, max_length=66, null=True)),
+                ('recent_hashes', models.JSONField(default=dict, help_text='{block number: hash} for blocks still within reorg depth')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='escrowevent',
+            constraint=models.UniqueConstraint(fields=('block_number', 'log_index'), name='escrow_event_position_uniq'),
+        ),
+    ]
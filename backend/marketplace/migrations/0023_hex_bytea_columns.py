@@ -0,0 +1,179 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:40
+
+from django.db import migrations
+
+import marketplace.fields
+
+
+ZERO_ADDRESS_SQL = "'\\x" + '00' * 20 + "'::bytea"
+
+# Listing/order token addresses were free text and hold the placeholder '0x'
+# (or nothing), which the frontend uses for the zero address; an empty wallet
+# or transaction hash means none. Any other value must convert exactly, or
+# check_convertible stops the migration and lists the rows.
+PLACEHOLDER_VALUES = "('', '0x')"
+PLACEHOLDER_FALLBACK = {
+    ('userprofile', 'wallet_address'): 'NULL',
+    ('listing', 'token_address'): ZERO_ADDRESS_SQL,
+    ('order', 'token_address'): ZERO_ADDRESS_SQL,
+    ('order', 'escrow_tx_hash'): 'NULL',
+}
+
+# Every converted column, with its length in bytes
+COLUMNS = [
+    ('userprofile', 'wallet_address', 20),
+    ('listing', 'token_address', 20),
+    ('order', 'order_id', 32),
+    ('order', 'token_address', 20),
+    ('order', 'escrow_tx_hash', 32),
+    ('escrowevent', 'block_hash', 32),
+    ('escrowevent', 'tx_hash', 32),
+    ('escrowevent', 'order_id', 32),
+]
+
+# varchar_pattern_ops indexes Django added for the unique/db_index CharFields;
+# they cannot exist on bytea
+LIKE_INDEXES = {
+    ('order', 'order_id'): 'marketplace_order_order_id_4c0f05a8_like',
+    ('escrowevent', 'order_id'): 'marketplace_escrowevent_order_id_f924d943_like',
+}
+
+
+def valid_hex(column, num_bytes):
+    return f"{column} ~* '^\\s*(0x)?[0-9a-f]{{{num_bytes * 2}}}\\s*$'"
+
+
+def placeholder(column):
+    return f"lower(trim({column})) IN {PLACEHOLDER_VALUES}"
+
+
+def convert(model, name, num_bytes):
+    """Forward and reverse SQL for one column: varchar hex <-> bytea of ``num_bytes``."""
+    table, check = f'marketplace_{model}', f'marketplace_{model}_{name}_length'
+    decoded = f"decode(regexp_replace(lower(trim({name})), '^0x', ''), 'hex')"
+    fallback = PLACEHOLDER_FALLBACK.get((model, name))
+    if fallback:
+        decoded = f"CASE WHEN {placeholder(name)} THEN {fallback} ELSE {decoded} END"
+    like_index = LIKE_INDEXES.get((model, name))
+
+    forward = (f"DROP INDEX IF EXISTS {like_index}; " if like_index else '') + (
+        f"ALTER TABLE {table} ALTER COLUMN {name} TYPE bytea USING {decoded}, "
+        f"ADD CONSTRAINT {check} CHECK (octet_length({name}) = {num_bytes});"
+    )
+    reverse = (
+        f"ALTER TABLE {table} DROP CONSTRAINT {check}, "
+        f"ALTER COLUMN {name} TYPE varchar({2 + num_bytes * 2}) USING '0x' || encode({name}, 'hex');"
+    ) + (f" CREATE INDEX {like_index} ON {table} ({name} varchar_pattern_ops);" if like_index else '')
+    return forward, reverse
+
+
+def check_convertible(apps, schema_editor):
+    """Fail before touching the schema if a column holds something that is neither hex nor a placeholder."""
+    problems = []
+    with schema_editor.connection.cursor() as cursor:
+        for model, name, num_bytes in COLUMNS:
+            invalid = f"NOT ({valid_hex(name, num_bytes)})"
+            if (model, name) in PLACEHOLDER_FALLBACK:
+                invalid += f" AND NOT ({placeholder(name)})"
+            cursor.execute(
+                f"SELECT id, {name} FROM marketplace_{model} WHERE {invalid} ORDER BY id LIMIT 20"
+            )
+            bad = [f"id={row_id}: {value!r}" for row_id, value in cursor.fetchall()]
+            if bad:
+                problems.append(f"marketplace_{model}.{name} ({', '.join(bad)})")
+    if problems:
+        raise RuntimeError(
+            "These values are not valid hex and cannot be converted to bytea; fix or delete the rows first:\n  "
+            + '\n  '.join(problems)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0022_job_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_convertible, migrations.RunPython.noop),
+        migrations.RunSQL(
+            *convert('userprofile', 'wallet_address', 20),
+            state_operations=[
+                migrations.AlterField(
+                    model_name='userprofile',
+                    name='wallet_address',
+                    field=marketplace.fields.HexField(blank=True, null=True, num_bytes=20),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            *convert('listing', 'token_address', 20),
+            state_operations=[
+                migrations.AlterField(
+                    model_name='listing',
+                    name='token_address',
+                    field=marketplace.fields.HexField(num_bytes=20),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            *convert('order', 'order_id', 32),
+            state_operations=[
+                migrations.AlterField(
+                    model_name='order',
+                    name='order_id',
+                    field=marketplace.fields.HexField(num_bytes=32, unique=True),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            *convert('order', 'token_address', 20),
+            state_operations=[
+                migrations.AlterField(
+                    model_name='order',
+                    name='token_address',
+                    field=marketplace.fields.HexField(num_bytes=20),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            *convert('order', 'escrow_tx_hash', 32),
+            state_operations=[
+                migrations.AlterField(
+                    model_name='order',
+                    name='escrow_tx_hash',
+                    field=marketplace.fields.HexField(blank=True, null=True, num_bytes=32),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            *convert('escrowevent', 'block_hash', 32),
+            state_operations=[
+                migrations.AlterField(
+                    model_name='escrowevent',
+                    name='block_hash',
+                    field=marketplace.fields.HexField(num_bytes=32),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            *convert('escrowevent', 'tx_hash', 32),
+            state_operations=[
+                migrations.AlterField(
+                    model_name='escrowevent',
+                    name='tx_hash',
+                    field=marketplace.fields.HexField(num_bytes=32),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            *convert('escrowevent', 'order_id', 32),
+            state_operations=[
+                migrations.AlterField(
+                    model_name='escrowevent',
+                    name='order_id',
+                    field=marketplace.fields.HexField(db_index=True, num_bytes=32),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:05
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built CONCURRENTLY so large tables stay writable; the old
+    # (party, status, created_at) ones go only once their replacements exist
+    atomic = False
+
+    dependencies = [
+        ('marketplace', '0023_hex_bytea_columns'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['buyer', '-created_at', '-id'], name='order_buyer_history_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['seller', '-created_at', '-id'], name='order_seller_history_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['buyer', 'status', '-created_at', '-id'], name='order_buyer_status_seek_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['seller', 'status', '-created_at', '-id'], name='order_seller_status_seek_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='order',
+            name='order_buyer_status_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='order',
+            name='order_seller_status_idx',
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:10
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Built CONCURRENTLY so listings and orders stay writable
+    atomic = False
+
+    dependencies = [
+        ('marketplace', '0024_order_history_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='listing',
+            index=models.Index(fields=['updated_at', 'id'], name='listing_updated_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['updated_at', 'id'], name='order_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:54
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+BACKFILL_BATCH_SIZE = 10_000
+
+
+def backfill_goods_sha256(apps, schema_editor):
+    """Extract the goods digest from file_path (as Listing.goods_digest does) in id-range batches."""
+    Listing = apps.get_model('marketplace', 'Listing')
+    bounds = Listing.objects.aggregate(low=models.Min('id'), high=models.Max('id'))
+    if bounds['low'] is None:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for start in range(bounds['low'], bounds['high'] + 1, BACKFILL_BATCH_SIZE):
+            cursor.execute(
+                "UPDATE marketplace_listing "
+                "SET goods_sha256 = substring(lower(btrim(file_path)) from '(?:^|/blobs/)([0-9a-f]{64})/?$') "
+                "WHERE id >= %s AND id < %s AND file_path IS NOT NULL",
+                [start, start + BACKFILL_BATCH_SIZE],
+            )
+
+
+class Migration(migrations.Migration):
+
+    # Each backfill batch commits on its own and the index is built CONCURRENTLY
+    atomic = False
+
+    dependencies = [
+        ('marketplace', '0028_userprofile_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='goods_sha256',
+            field=models.CharField(blank=True, editable=False, help_text='Blob digest of the goods in file_path, maintained on save; never served publicly', max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_goods_sha256, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('goods_sha256__isnull', False)), fields=['goods_sha256'], name='listing_goods_sha256_idx'),
+        ),
+    ]
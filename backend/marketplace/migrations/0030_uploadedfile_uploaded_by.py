@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('marketplace', '0029_listing_goods_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='uploaded_by',
+            field=models.ForeignKey(blank=True, help_text='First uploader of the content; only their listings can make it private goods', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploaded_files', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+BACKFILL_BATCH_SIZE = 10_000
+
+RATE_SQL = "coalesce(round(100.0 * dispute_count / nullif(total_orders + dispute_count, 0), 2), 0)"
+
+
+def recompute_dispute_rate(apps, schema_editor):
+    """Re-derive dispute_rate from the stored counters (as marketplace.reputation does) in id-range batches."""
+    UserProfile = apps.get_model('marketplace', 'UserProfile')
+    bounds = UserProfile.objects.aggregate(low=models.Min('id'), high=models.Max('id'))
+    if bounds['low'] is None:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for start in range(bounds['low'], bounds['high'] + 1, BACKFILL_BATCH_SIZE):
+            # updated_at versions the listing and order ETags that embed the rate
+            cursor.execute(
+                f"UPDATE marketplace_userprofile SET dispute_rate = {RATE_SQL}, updated_at = now() "
+                f"WHERE id >= %s AND id < %s AND dispute_rate <> {RATE_SQL}",
+                [start, start + BACKFILL_BATCH_SIZE],
+            )
+
+
+class Migration(migrations.Migration):
+
+    # Each batch commits on its own
+    atomic = False
+
+    dependencies = [
+        ('marketplace', '0030_uploadedfile_uploaded_by'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userprofile',
+            name='dispute_rate',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='dispute_count / (total_orders + dispute_count) in percent, maintained by marketplace.reputation', max_digits=7),
+        ),
+        migrations.RunPython(recompute_dispute_rate, migrations.RunPython.noop),
+    ]
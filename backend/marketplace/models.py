@@ -1,10 +1,20 @@
-from django.db import models
+import re
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.db import connections, models
+from django.db.models.sql import UpdateQuery
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.translation import gettext_lazy as _
 from django.core.files.storage import default_storage
+from django.db.models.functions import Now
 from django.utils import timezone
 from datetime import timedelta
 
+from .fields import HexField
+
 
 
 
@@ -16,24 +26,69 @@ class CurrencyChoices(models.TextChoices):
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     telegram_id = models.BigIntegerField(unique=True)
-    wallet_address = models.CharField(max_length=42, blank=True, null=True)
+    wallet_address = HexField(num_bytes=20, blank=True, null=True)
     privy_user_id = models.CharField(max_length=128, blank=True, null=True, db_index=True)
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     total_ratings = models.IntegerField(default=0)
     dispute_count = models.IntegerField(default=0)
     total_orders = models.IntegerField(default=0)
+    dispute_rate = models.DecimalField(max_digits=7, decimal_places=2, default=0, editable=False,
+                                       help_text="dispute_count / (total_orders + dispute_count) in percent, maintained by marketplace.reputation")
     created_at = models.DateTimeField(auto_now_add=True)
-    
-    @property
-    def dispute_rate(self):
-        if self.total_orders == 0:
-            return 0
-        return (self.dispute_count / self.total_orders) * 100
+    updated_at = models.DateTimeField(auto_now=True, help_text="Also set by the counter updates in marketplace.reputation")
 
     def __str__(self):
         return f"{self.user.username} (TG: {self.telegram_id})"
 
 
+def update_returning(queryset, values, returning=('id',)):
+    """
+    ``queryset.update(**values)`` as a single ``UPDATE ... RETURNING``.
+
+    Returns one dict of the ``returning`` fields per updated row, so callers
+    learn which rows matched without a second query.
+    """
+    query = queryset.query.chain(UpdateQuery)
+    query.add_update_values(values)
+    compiler = query.get_compiler(queryset.db)
+    compiler.pre_sql_setup()
+    sql, params = compiler.as_sql()
+
+    fields = [queryset.model._meta.get_field(name) for name in returning]
+    columns = ', '.join(compiler.quote_name_unless_alias(field.column) for field in fields)
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        cursor.execute(f'{sql} RETURNING {columns}', params)
+        rows = cursor.fetchall()
+    # Raw rows skip field conversion (e.g. JSONField comes back as text)
+    converters = [
+        (position, field) for position, field in enumerate(fields) if hasattr(field, 'from_db_value')
+    ]
+    results = []
+    for row in rows:
+        row = list(row)
+        for position, field in converters:
+            row[position] = field.from_db_value(row[position], None, connection)
+        results.append(dict(zip(returning, row)))
+    return results
+
+
+class ListingQuerySet(models.QuerySet):
+    def active(self):
+        """Listings that should appear in the feed: active, not deleted and not yet expired."""
+        return self.filter(status='active', is_deleted=False).filter(
+            models.Q(expires_at__isnull=True) | models.Q(expires_at__gt=Now())
+        )
+
+    def expired(self):
+        """Active listings whose expiry has passed but that the sweeper has not flipped yet."""
+        return self.filter(status='active', is_deleted=False, expires_at__lte=Now())
+
+
+# Listing.file_path as set from an upload: the blob URL (relative or absolute) or the bare digest
+GOODS_DIGEST_RE = re.compile(r'(?:^|/blobs/)(?P<digest>[0-9a-f]{64})/?$')
+
+
 class Listing(models.Model):
     STATUS_CHOICES = [
         ('active', 'Active'),
@@ -52,8 +107,9 @@ class Listing(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=18, decimal_places=8, help_text="Price with up to 8 decimal places for precise crypto amounts")
     currency = models.CharField(max_length=10, choices=CurrencyChoices.choices, default=CurrencyChoices.USDT)
-    token_address = models.CharField(max_length=42)
+    token_address = HexField(num_bytes=20)
     file_path = models.CharField(max_length=500, blank=True, null=True)
+    goods_sha256 = models.CharField(max_length=64, null=True, blank=True, editable=False, help_text="Blob digest of the goods in file_path, maintained on save; never served publicly")
     metadata_cid = models.CharField(max_length=100, blank=True, null=True)
     image_url = models.TextField(default='')
     image_cid = models.CharField(max_length=100, blank=True, null=True)
@@ -61,31 +117,94 @@ class Listing(models.Model):
     listing_duration_days = models.IntegerField(default=30, help_text="Number of days the listing will be active")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     is_deleted = models.BooleanField(default=False, help_text="Soft delete flag")
+    expires_at = models.DateTimeField(null=True, blank=True, editable=False, help_text="created_at + listing_duration_days, maintained on save")
+    search_vector = SearchVectorField(null=True, editable=False, help_text="Maintained by a database trigger from title (A) and description (B)")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='listing_search_vector_gin'),
+            GinIndex(fields=['title'], name='listing_title_trgm', opclasses=['gin_trgm_ops']),
+            # Feed orderings (with the keyset tiebreakers) over visible listings only
+            models.Index(fields=['-created_at', '-id'], name='listing_feed_created_idx', condition=models.Q(status='active', is_deleted=False)),
+            models.Index(fields=['price', 'created_at', 'id'], name='listing_feed_price_idx', condition=models.Q(status='active', is_deleted=False)),
+            models.Index(fields=['title', 'created_at', 'id'], name='listing_feed_title_idx', condition=models.Q(status='active', is_deleted=False)),
+            models.Index(fields=['seller', '-created_at'], name='listing_seller_feed_idx', condition=models.Q(status='active', is_deleted=False)),
+            # Lets the expiry sweeper find the next batch without scanning
+            models.Index(fields=['expires_at'], name='listing_active_expiry_idx', condition=models.Q(status='active', is_deleted=False)),
+            # Exports read in (updated_at, id) order and resume from an updated_at
+            models.Index(fields=['updated_at', 'id'], name='listing_updated_idx'),
+            # The public blob views refuse any digest that is some listing's goods
+            models.Index(fields=['goods_sha256'], name='listing_goods_sha256_idx', condition=models.Q(goods_sha256__isnull=False)),
+        ]
+
+    objects = ListingQuerySet.as_manager()
+
+    @staticmethod
+    def compute_expires_at(created_at, listing_duration_days):
+        """Expiration date for a listing; None when it never expires"""
+        if not listing_duration_days:
+            return None
+        return created_at + timedelta(days=listing_duration_days)
+
+    @staticmethod
+    def goods_digest(file_path):
+        """Blob digest of the goods at ``file_path``; None when it is not a stored upload"""
+        match = GOODS_DIGEST_RE.search((file_path or '').strip().lower())
+        return match['digest'] if match else None
+
     @property
     def is_expired(self):
         """Check if the listing has expired based on listing_duration_days"""
-        if not self.listing_duration_days:
+        if self.expires_at is None:
             return False
-        expiration_date = self.created_at + timedelta(days=self.listing_duration_days)
-        return timezone.now() > expiration_date
-    
-    @property
-    def expires_at(self):
-        """Get the expiration date of the listing"""
-        if not self.listing_duration_days:
-            return None
-        return self.created_at + timedelta(days=self.listing_duration_days)
+        return timezone.now() > self.expires_at
     
     def save(self, *args, **kwargs):
+        # Partial saves (e.g. soft delete) leave expires_at alone unless the duration changed
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'listing_duration_days' in update_fields:
+            self.expires_at = self.compute_expires_at(self.created_at or timezone.now(), self.listing_duration_days)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'expires_at'}
+        if update_fields is None or 'file_path' in update_fields:
+            self.goods_sha256 = self.goods_digest(self.file_path)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'goods_sha256'}
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.title} - ${self.price}"
 
 
+class InvalidTransition(ValueError):
+    """Target status that no state in ``Order.TRANSITIONS`` may move to."""
+
+
+class OrderQuerySet(models.QuerySet):
+    def transition(self, to_status, returning=('id',), from_statuses=None, **changes):
+        """
+        Move the (single) matching order to ``to_status`` if its current status allows it.
+
+        Runs one ``UPDATE ... WHERE status IN (<allowed sources>) RETURNING``
+        that writes only ``status``, ``updated_at`` and ``changes``, so
+        concurrent callers cannot both transition the same order. The sources
+        are every status ``TRANSITIONS`` lets move to ``to_status``, narrowed
+        to ``from_statuses`` when the caller may only act on some of them.
+        Returns a dict of the ``returning`` fields, or None when no order
+        matched or its status did not allow the move.
+        """
+        sources = Order.sources_for(to_status, from_statuses)
+        rows = update_returning(
+            self.filter(status__in=sources), {'status': to_status, 'updated_at': Now(), **changes}, returning
+        )
+        return rows[0] if rows else None
+
+    async def atransition(self, to_status, returning=('id',), from_statuses=None, **changes):
+        return await sync_to_async(self.transition)(to_status, returning, from_statuses, **changes)
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('created', 'Created'),
@@ -96,20 +215,72 @@ class Order(models.Model):
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled'),
     ]
+
+    # status -> statuses it may move to; completed and cancelled are final
+    TRANSITIONS = {
+        'created': ('paid', 'cancelled'),
+        'paid': ('delivered', 'confirmed', 'completed', 'disputed'),
+        'delivered': ('confirmed', 'completed', 'disputed'),
+        'confirmed': ('completed', 'disputed'),
+        'disputed': ('completed', 'cancelled'),
+        'completed': (),
+        'cancelled': (),
+    }
     
-    order_id = models.CharField(max_length=66, unique=True)  # bytes32 as hex
+    order_id = HexField(num_bytes=32, unique=True)
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='orders')
     buyer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='purchases')
     seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sales')
     amount = models.DecimalField(max_digits=18, decimal_places=8, help_text="Order amount with up to 8 decimal places")
-    token_address = models.CharField(max_length=42)
+    token_address = HexField(num_bytes=20)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='created')
-    escrow_tx_hash = models.CharField(max_length=66, blank=True, null=True)
+    escrow_tx_hash = HexField(num_bytes=32, blank=True, null=True)
     delivery_cid = models.CharField(max_length=100, blank=True, null=True)
     deadline = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Order history pages seek on (created_at, id) per party, optionally within one status
+            models.Index(fields=['buyer', '-created_at', '-id'], name='order_buyer_history_idx'),
+            models.Index(fields=['seller', '-created_at', '-id'], name='order_seller_history_idx'),
+            models.Index(fields=['buyer', 'status', '-created_at', '-id'], name='order_buyer_status_seek_idx'),
+            models.Index(fields=['seller', 'status', '-created_at', '-id'], name='order_seller_status_seek_idx'),
+            # Exports read in (updated_at, id) order and resume from an updated_at
+            models.Index(fields=['updated_at', 'id'], name='order_updated_idx'),
+        ]
+
+    objects = OrderQuerySet.as_manager()
+
+    @classmethod
+    def sources_for(cls, to_status, from_statuses=None):
+        sources = [source for source, targets in cls.TRANSITIONS.items() if to_status in targets]
+        if not sources:
+            raise InvalidTransition(f"No order status may transition to {to_status!r}")
+        if from_statuses is not None:
+            not_allowed = set(from_statuses) - set(sources)
+            if not_allowed:
+                raise InvalidTransition(f"{', '.join(sorted(not_allowed))} may not transition to {to_status!r}")
+            sources = [source for source in sources if source in from_statuses]
+        return sources
+
+    def can_transition(self, to_status):
+        return to_status in self.TRANSITIONS.get(self.status, ())
+
+    def transition(self, to_status, from_statuses=None, **changes):
+        """Compare-and-set this order's status; updates the instance and returns True on success."""
+        row = Order.objects.filter(pk=self.pk).transition(
+            to_status, returning=('updated_at',), from_statuses=from_statuses, **changes
+        )
+        if row is None:
+            return False
+        self.status = to_status
+        self.updated_at = row['updated_at']
+        for name, value in changes.items():
+            setattr(self, name, value)
+        return True
+
     def __str__(self):
         return f"Order {self.order_id[:8]}... - {self.listing.title}"
 
@@ -143,19 +314,23 @@ class Dispute(models.Model):
         return f"Dispute for Order {self.order.order_id[:8]}..."
 
 
-# Mock Smart Contract Functions (placeholders)
 class UploadedFile(models.Model):
     """Model for storing uploaded files with metadata"""
-    file = models.FileField(upload_to='uploads/%Y/%m/%d/')
+    file = models.FileField(upload_to='uploads/%Y/%m/%d/', blank=True)
+    sha256 = models.CharField(max_length=64, unique=True, null=True, blank=True, help_text="Content digest in the blob store")
     uploaded_at = models.DateTimeField(auto_now_add=True)
-    file_size = models.PositiveIntegerField(null=True, blank=True)
+    file_size = models.PositiveBigIntegerField(null=True, blank=True)
     content_type = models.CharField(max_length=100, blank=True)
+    uploaded_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='uploaded_files',
+        help_text="First uploader of the content; only their listings can make it private goods",
+    )
     
     class Meta:
         ordering = ['-uploaded_at']
     
     def __str__(self):
-        return f"{self.file.name} ({self.uploaded_at})"
+        return f"{self.file.name or self.sha256} ({self.uploaded_at})"
     
     def save(self, *args, **kwargs):
         if self.file:
@@ -164,33 +339,113 @@ class UploadedFile(models.Model):
         super().save(*args, **kwargs)
 
 
-class MockSmartContract:
-    @staticmethod
-    def create_escrow(order_id, seller_address, token_address, amount, deadline):
-        """Mock function - returns True for MVP"""
-        return True
-    
-    @staticmethod
-    def deposit(order_id, buyer_address, amount):
-        """Mock function - returns True for MVP"""
-        return True
-    
-    @staticmethod
-    def confirm_delivery(order_id, buyer_address):
-        """Mock function - returns True for MVP"""
-        return True
-    
-    @staticmethod
-    def release_funds(order_id):
-        """Mock function - returns True for MVP"""
-        return True
-    
-    @staticmethod
-    def open_dispute(order_id, evidence_uri):
-        """Mock function - returns True for MVP"""
-        return True
-    
-    @staticmethod
-    def resolve_dispute(order_id, winner_address, seller_share):
-        """Mock function - returns True for MVP"""
-        return True
\ No newline at end of file
+class ImageVariant(models.Model):
+    """Resized, metadata-free copy of an uploaded image, stored beside it in the blob store (see ``marketplace.media``)."""
+    upload = models.ForeignKey(UploadedFile, on_delete=models.CASCADE, related_name='variants')
+    name = models.CharField(max_length=20, help_text="File name under the blob, e.g. w320.webp")
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    content_type = models.CharField(max_length=100)
+    file_size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['upload', 'name'], name='imagevariant_upload_name_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.upload.sha256}/{self.name}"
+
+
+class ChunkedUpload(models.Model):
+    """
+    Resumable upload (see ``marketplace.uploads``). The bytes received so far
+    are in the blob store's partial file, whose size is the upload offset.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    length = models.PositiveBigIntegerField(help_text="Total size announced at creation (Upload-Length)")
+    filename = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    sha256 = models.CharField(max_length=64, null=True, blank=True, help_text="Blob digest, once finalized")
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # prune_uploads sweeps by age
+            models.Index(fields=['created_at'], name='chunkedupload_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.filename or self.id} ({self.length} bytes)"
+
+
+class EscrowEvent(models.Model):
+    """Escrow contract log applied to an order by ``marketplace.indexer``."""
+    block_number = models.BigIntegerField()
+    block_hash = HexField(num_bytes=32)
+    log_index = models.IntegerField()
+    tx_hash = HexField(num_bytes=32)
+    order_id = HexField(num_bytes=32, db_index=True)  # matches Order.order_id
+    name = models.CharField(max_length=50)
+    args = models.JSONField(default=list, help_text="Non-indexed event arguments in ABI order")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # Also the index reorg rollbacks delete by
+            models.UniqueConstraint(fields=['block_number', 'log_index'], name='escrow_event_position_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} {self.order_id[:10]}... @ {self.block_number}"
+
+
+class IndexerCheckpoint(models.Model):
+    """Last block an indexer has applied, plus recent block hashes for reorg detection."""
+    name = models.CharField(max_length=50, unique=True)
+    block_number = models.BigIntegerField()
+    block_hash = models.CharField(max_length=66, blank=True, null=True)
+    recent_hashes = models.JSONField(default=dict, help_text="{block number: hash} for blocks still within reorg depth")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.block_number}"
+
+
+class Job(models.Model):
+    """Background job in the Postgres queue run by ``manage.py run_jobs`` (see ``marketplace.jobs``)."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    queue = models.CharField(max_length=50, default='default')
+    task = models.CharField(max_length=100)
+    args = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now, help_text="Not claimed before this time (retry backoff)")
+    locked_at = models.DateTimeField(blank=True, null=True)
+    locked_by = models.CharField(max_length=100, blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the next due job of a queue
+            models.Index(fields=['queue', 'run_at'], name='job_queued_idx', condition=models.Q(status='queued')),
+            # Jobs whose worker died mid-run, reclaimed after the lease expires
+            models.Index(fields=['locked_at'], name='job_running_idx', condition=models.Q(status='running')),
+            # Throughput metrics and pruning of finished jobs
+            models.Index(fields=['queue', 'finished_at'], name='job_finished_idx', condition=models.Q(status='done')),
+        ]
+
+    def __str__(self):
+        return f"{self.task} [{self.queue}] {self.status}"
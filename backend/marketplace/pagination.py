@@ -0,0 +1,158 @@
+import base64
+import json
+from types import SimpleNamespace
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination, opt-in by default.
+
+    Unless ``opt_in`` is False it only kicks in when the request carries a
+    ``cursor`` query parameter (``?cursor=`` for the first page). Whatever
+    ordering the queryset already has is extended with ``created_at`` and
+    ``id`` as tiebreakers, and the next page is selected with a
+    ``WHERE (key) > (last key)`` predicate instead of OFFSET, so every page
+    costs the same regardless of depth.
+    """
+    opt_in = True
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+    tiebreakers = ('created_at', 'id')
+    results_key = 'results'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None, values=None):
+        """The page's instances, or with ``values`` its ``.values(*values)`` rows (plus the sort keys)."""
+        if self.opt_in and self.cursor_query_param not in request.query_params:
+            return None
+
+        page = self.get_page_queryset(queryset, request)
+        if values is not None:
+            page = page.values(*{*values, *self.sort_names()})
+        results = list(page)
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_queryset(self, queryset, request):
+        """The page as an unevaluated queryset, one row longer than the page to detect a next one."""
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        self.ordering = self.get_ordering(queryset)
+        queryset = queryset.order_by(*self.ordering)
+        loaded, deferred = queryset.query.deferred_loading
+        if loaded and not deferred:
+            # The cursor is built from the sort keys, so .only() must include them
+            columns = [name for name in self.sort_names() if self.get_model_field(queryset.model, name)]
+            queryset = queryset.only(*loaded, *columns)
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            values = self.decode_cursor(encoded, queryset.model)
+            queryset = queryset.filter(self.build_seek_filter(values))
+        return queryset[:self.page_size + 1]
+
+    def get_paginated_response(self, data):
+        return Response({
+            self.results_key: data,
+            'next_cursor': self.get_next_cursor(),
+        })
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if size < 1:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        ordering = [field for field in queryset.query.order_by if isinstance(field, str)]
+        if not ordering:
+            ordering = list(queryset.model._meta.ordering or [])
+        names = {field.lstrip('-') for field in ordering}
+        for tiebreaker in self.tiebreakers:
+            if tiebreaker not in names:
+                descending = ordering[0].startswith('-') if ordering else True
+                ordering.append(f"-{tiebreaker}" if descending else tiebreaker)
+        return ordering
+
+    def sort_names(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def get_model_field(self, model, name):
+        """Concrete field behind a sort key, or None for annotations such as a search rank."""
+        try:
+            return model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+    def build_seek_filter(self, values):
+        """
+        (a > x) OR (a = x AND b > y) OR ... honouring each key's direction.
+
+        The redundant ``a >= x`` in front gives the planner an index bound to
+        start the scan at; the OR alone is only applied as a row filter, which
+        makes deep pages walk every row before them.
+        """
+        seek = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            seek |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        first = self.ordering[0]
+        bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": values[0]})
+        return bound & seek
+
+    def get_next_cursor(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def encode_cursor(self, last):
+        """Cursor for the page after ``last``, a model instance or a ``.values()`` row."""
+        values = []
+        for name in self.sort_names():
+            field = self.get_model_field(self.model, name)
+            if isinstance(last, dict):
+                value = last[name]
+                # value_to_string() only reads the field's attribute off the object
+                values.append(field.value_to_string(SimpleNamespace(**{field.attname: value})) if field else value)
+            else:
+                values.append(field.value_to_string(last) if field else getattr(last, name))
+        payload = json.dumps({'o': self.ordering, 'v': values}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, encoded, model):
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if payload['o'] != self.ordering or len(payload['v']) != len(self.ordering):
+                raise ValueError('cursor does not match ordering')
+            values = []
+            for name, value in zip(self.sort_names(), payload['v']):
+                field = self.get_model_field(model, name)
+                values.append(field.to_python(value) if field else value)
+            return values
+        except (KeyError, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class ListingCursorPagination(KeysetPagination):
+    results_key = 'listings'
+
+
+class OrderHistoryPagination(KeysetPagination):
+    opt_in = False
+    results_key = 'orders'
@@ -0,0 +1,141 @@
+"""Registry of the query shapes the API issues, checked by ``manage.py explain_query_shapes``."""
+from django.db.models import Count
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from .authentication import TokenUser
+from .models import Listing, Order
+from . import views
+
+
+QUERY_SHAPES = {}
+
+FEED_PAGE_SIZE = 20
+
+
+def query_shape(name):
+    def register(func):
+        QUERY_SHAPES[name] = func
+        return func
+    return register
+
+
+def view_queryset(view_class, params=None, user=None, initkwargs=None, **kwargs):
+    """Queryset a GET on ``view_class`` would evaluate, built through the view's own filters."""
+    view = view_class(**(initkwargs or {}))
+    view.request = Request(APIRequestFactory().get('/', params or {}))
+    if user is not None:
+        view.request.user = user
+    view.args = ()
+    view.kwargs = kwargs
+    view.format_kwarg = None
+    return view.filter_queryset(view.get_queryset())
+
+
+def sample(queryset, field, default=0):
+    value = queryset.values_list(field, flat=True).first()
+    return default if value is None else value
+
+
+def feed(params=None):
+    return view_queryset(views.ListingsView, params)[:FEED_PAGE_SIZE]
+
+
+@query_shape('listings.feed')
+def listings_feed():
+    return feed()
+
+
+@query_shape('listings.feed.price')
+def listings_feed_by_price():
+    return feed({'ordering': 'price'})
+
+
+@query_shape('listings.feed.-price')
+def listings_feed_by_price_desc():
+    return feed({'ordering': '-price'})
+
+
+@query_shape('listings.feed.title')
+def listings_feed_by_title():
+    return feed({'ordering': 'title'})
+
+
+@query_shape('listings.feed.filtered')
+def listings_feed_filtered():
+    return feed({'currency': 'USDT', 'min_price': '10', 'max_price': '100'})
+
+
+@query_shape('listings.feed.seller')
+def listings_feed_by_seller():
+    return feed({'seller': sample(Listing.objects.all(), 'seller_id')})
+
+
+@query_shape('listings.feed.seller_username')
+def listings_feed_by_seller_username():
+    return feed({'seller_username': sample(Listing.objects.all(), 'seller__username', 'seller')})
+
+
+@query_shape('listings.feed.search')
+def listings_feed_search():
+    return feed({'search': 'ebook'})
+
+
+@query_shape('listings.detail')
+def listing_detail():
+    pk = sample(Listing.objects.all(), 'id')
+    return view_queryset(views.ListingDetailView, pk=pk).filter(pk=pk)
+
+
+@query_shape('orders.detail')
+def order_detail():
+    order_id = sample(Order.objects.all(), 'order_id', '0x' + '00' * 32)
+    return view_queryset(views.OrderDetailView, order_id=order_id).filter(order_id=order_id)
+
+
+def busiest(party):
+    """User with the most orders as ``party``, where deep history pages hurt most."""
+    row = (
+        Order.objects.order_by().values(f'{party}_id').annotate(orders=Count('id')).order_by('-orders').first()
+    )
+    return TokenUser(row[f'{party}_id'] if row else 0)
+
+
+def order_history(party, params=None, depth=0):
+    """History page for the busiest ``party``, ``depth`` rows in via a cursor."""
+    user = busiest(party)
+    queryset = view_queryset(views.OrderHistoryView, params, user=user, initkwargs={'party': party})
+    paginator = views.OrderHistoryView.pagination_class()
+    params = dict(params or {})
+    if depth:
+        paginator.model = queryset.model
+        paginator.ordering = paginator.get_ordering(queryset)
+        last = queryset.order_by(*paginator.ordering)[depth - 1:depth].first()
+        if last is not None:
+            params['cursor'] = paginator.encode_cursor(last)
+    return paginator.get_page_queryset(queryset, Request(APIRequestFactory().get('/', params)))
+
+
+@query_shape('orders.purchases')
+def order_purchases():
+    return order_history('buyer')
+
+
+@query_shape('orders.purchases.status')
+def order_purchases_by_status():
+    return order_history('buyer', {'status': 'paid'})
+
+
+@query_shape('orders.sales')
+def order_sales():
+    return order_history('seller')
+
+
+@query_shape('orders.sales.status.deep')
+def order_sales_by_status_deep():
+    return order_history('seller', {'status': 'paid'}, depth=10_000)
+
+
+@query_shape('listings.expired')
+def expired_listings():
+    return Listing.objects.expired().order_by('expires_at').values('id')[:1000]
@@ -0,0 +1,162 @@
+import logging
+import threading
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+# Transaction control, not queries: with TestCase every atomic() is a savepoint
+SAVEPOINT_PREFIXES = ('SAVEPOINT ', 'RELEASE SAVEPOINT ', 'ROLLBACK TO SAVEPOINT ')
+# django.contrib.postgres looks up type oids when a connection is opened; not the view's cost
+CONNECTION_SETUP_PREFIXES = ('SELECT oid, typarray FROM pg_type ',)
+UNCOUNTED_PREFIXES = SAVEPOINT_PREFIXES + CONNECTION_SETUP_PREFIXES
+
+
+class QueryCounter:
+    """Count the SQL statements executed on every configured connection."""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.startswith(UNCOUNTED_PREFIXES):
+            self.count += 1
+            self.statements.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias_connection in connections.all():
+            self._stack.enter_context(alias_connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+
+@contextmanager
+def query_budget(limit, label='block'):
+    """
+    Test helper: fail when the wrapped block runs more than ``limit`` queries.
+
+        with query_budget(2, 'listings feed'):
+            client.get('/api/listings/')
+    """
+    with QueryCounter() as counter:
+        yield counter
+    if counter.count > limit:
+        raise QueryBudgetExceeded(
+            f"{label} ran {counter.count} queries (budget {limit}):\n" + '\n'.join(counter.statements)
+        )
+
+
+class QueryStats:
+    """Per-view query counters collected by ``QueryBudgetMiddleware``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = defaultdict(lambda: {'requests': 0, 'queries': 0, 'max': 0, 'over_budget': 0})
+
+    def record(self, view_name, count, over_budget):
+        with self._lock:
+            stats = self._views[view_name]
+            stats['requests'] += 1
+            stats['queries'] += count
+            stats['max'] = max(stats['max'], count)
+            stats['over_budget'] += int(over_budget)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._views.items()}
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+query_stats = QueryStats()
+
+
+def get_query_budget(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None, None
+    view_class = getattr(match.func, 'view_class', None)
+    return match.view_name, getattr(view_class, 'query_budget', None)
+
+
+class QueryBudgetMiddleware:
+    """
+    Count queries per request and compare them with the view's ``query_budget``.
+
+    Counts are aggregated in ``query_stats`` and exposed as ``X-Query-Count``.
+    Going over budget is logged, and raises ``QueryBudgetExceeded`` when
+    ``QUERY_BUDGET_STRICT`` is on so test suites fail on regressions.
+
+    Only installed under ``DEBUG``, ``manage.py test`` or ``QUERY_BUDGET_ENABLED``,
+    so production neither pays for the wrappers nor reveals its query counts.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not (settings.DEBUG or settings.TESTING or settings.QUERY_BUDGET_ENABLED):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = self.start()
+        # Queries a streaming body runs while being consumed are not counted
+        try:
+            response = self.get_response(request)
+        finally:
+            counter.__exit__(None, None, None)
+        return self.check(request, response, counter)
+
+    async def __acall__(self, request):
+        # Under ASGI every thread-sensitive ORM call of one request runs on the
+        # same thread, so the wrappers are installed on that thread's connections
+        counter = await sync_to_async(self.start)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(counter.__exit__)(None, None, None)
+        return self.check(request, response, counter)
+
+    def start(self):
+        # The wrappers wait on unopened connections, so views that never query never connect
+        return QueryCounter().__enter__()
+
+    def check(self, request, response, counter):
+        view_name, budget = get_query_budget(request)
+        if view_name is None:
+            return response
+
+        over_budget = budget is not None and counter.count > budget
+        query_stats.record(view_name, counter.count, over_budget)
+        response['X-Query-Count'] = str(counter.count)
+
+        if over_budget:
+            message = f"{view_name} ran {counter.count} queries (budget {budget})"
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message + ':\n' + '\n'.join(counter.statements))
+            logger.warning(message)
+        return response
@@ -0,0 +1,128 @@
+"""
+orjson-backed JSON renderer with the same output as DRF's ``JSONRenderer``,
+and the row-at-a-time NDJSON/CSV renderers used by the exports.
+
+orjson encodes ``datetime``/``date``/``UUID`` natively (UTC as ``Z``, like
+DRF's encoder) and hands everything else (``Decimal``, lazy strings,
+querysets) to DRF's encoder, so responses stay byte-identical. Pretty
+printing (``; indent=``), non-compact or ASCII-only settings, and anything
+orjson refuses (e.g. integers above 64 bits) go through the stdlib renderer.
+So do floats that Python writes in exponent form: orjson gives ``1e16`` and
+``0.00001`` where ``json`` gives ``1e+16`` and ``1e-05``.
+Without orjson installed this is the stock renderer.
+"""
+import csv
+import datetime
+import io
+import itertools
+import re
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    # DRF escapes these so the output is also valid JavaScript; orjson leaves them raw
+    line_separators = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+    # Exponent number tokens (``1e16``, ``1.5e-7``), which orjson writes without
+    # Python's sign and padding; with ``b'0.0000'`` (floats below 1e-4, which
+    # orjson spells out) these are all the floats the two encoders disagree on.
+    # A match inside a string only costs a stdlib re-render
+    float_exponent = re.compile(rb'e-?\d{1,3}(?:[,}\]]|\Z)')
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            rendered = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'0.0000' in rendered or self.float_exponent.search(rendered):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        for raw, escaped in self.line_separators:
+            if raw in rendered:
+                rendered = rendered.replace(raw, escaped)
+        return rendered
+
+
+class RowStreamRenderer(BaseRenderer):
+    """
+    Base for formats written one row (a flat dict) at a time.
+
+    ``stream(rows, columns)`` yields the encoded bytes lazily so exports can
+    be sent while the cursor is still being read; ``render`` joins it for the
+    ordinary responses DRF renders itself (errors, small payloads).
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = [data] if isinstance(data, dict) else data
+        return b''.join(self.stream(rows))
+
+    def stream(self, rows, columns=None):
+        raise NotImplementedError
+
+
+class NDJSONRenderer(RowStreamRenderer):
+    """One compact JSON object per line, encoded like the JSON API."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def stream(self, rows, columns=None):
+        encoder = FastJSONRenderer()
+        for row in rows:
+            yield encoder.render(row) + b'\n'
+
+
+class CSVRenderer(RowStreamRenderer):
+    """
+    RFC 4180 CSV with a header row. ``None`` is an empty cell, booleans are
+    ``true``/``false`` and UTC datetimes end in ``Z``, as in the JSON output.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows, columns=None):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        rows = iter(rows)
+        if columns is None:
+            first = next(rows, None)
+            if first is None:
+                return
+            columns = list(first)
+            rows = itertools.chain([first], rows)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([self.cell(row.get(column)) for column in columns])
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        # Header only, when there were no rows
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    @staticmethod
+    def cell(value):
+        if value is None:
+            return ''
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if isinstance(value, datetime.datetime):
+            value = value.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return value
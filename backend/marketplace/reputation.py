@@ -0,0 +1,125 @@
+"""
+Seller reputation counters on ``UserProfile``, kept current with ``F()`` updates.
+
+``total_orders`` counts a seller's completed orders and ``dispute_count`` the
+disputes on their orders that were not resolved in the seller's favour.
+``dispute_rate`` is derived from both in the same UPDATE, so readers (listing
+cards, admin) never compute it: the percentage of the seller's orders that
+ended, completed or disputed against them, which went against them. Both
+counts are in the denominator, so it stays within 0-100 however few orders
+completed. ``manage.py repair_seller_stats`` rebuilds all
+three from the order and dispute tables.
+"""
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Cast, Coalesce, Now, NullIf
+
+from .models import Order, UserProfile
+
+
+REPAIR_SQL = """
+WITH sales AS (
+    SELECT seller_id, count(*) AS n
+    FROM marketplace_order
+    WHERE status = 'completed'
+    GROUP BY seller_id
+), disputes AS (
+    SELECT o.seller_id, count(*) AS n
+    FROM marketplace_dispute d
+    JOIN marketplace_order o ON o.id = d.order_id
+    WHERE d.result <> 'seller_wins'
+    GROUP BY o.seller_id
+), stats AS (
+    SELECT p.id,
+           coalesce(sales.n, 0) AS total_orders,
+           coalesce(disputes.n, 0) AS dispute_count
+    FROM marketplace_userprofile p
+    LEFT JOIN sales ON sales.seller_id = p.user_id
+    LEFT JOIN disputes ON disputes.seller_id = p.user_id
+)
+UPDATE marketplace_userprofile p
+SET total_orders = stats.total_orders,
+    dispute_count = stats.dispute_count,
+    dispute_rate = coalesce(round(100.0 * stats.dispute_count / nullif(stats.total_orders + stats.dispute_count, 0), 2), 0),
+    updated_at = now()
+FROM stats
+WHERE p.id = stats.id
+  AND (p.total_orders, p.dispute_count, p.dispute_rate) IS DISTINCT FROM (
+      stats.total_orders,
+      stats.dispute_count,
+      coalesce(round(100.0 * stats.dispute_count / nullif(stats.total_orders + stats.dispute_count, 0), 2), 0)
+  )
+"""
+
+
+def counts_against_seller(result):
+    return result != 'seller_wins'
+
+
+def adjust_seller_stats(seller_id, orders=0, disputes=0):
+    """Apply counter deltas to a seller's profile in one atomic UPDATE."""
+    if not orders and not disputes:
+        return 0
+    # Every F() in the SET list reads the pre-update row, so the rate is
+    # computed from the new counts without a read-modify-write race
+    dispute_count = F('dispute_count') + disputes
+    total_orders = F('total_orders') + orders
+    # numeric before dividing: psycopg2 sends Decimal('100') as an integer literal
+    rate = Coalesce(
+        Cast(dispute_count * 100, DecimalField(max_digits=20, decimal_places=2)) / NullIf(total_orders + dispute_count, 0),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=7, decimal_places=2),
+    )
+    return UserProfile.objects.filter(user_id=seller_id).update(
+        total_orders=total_orders,
+        dispute_count=dispute_count,
+        dispute_rate=rate,
+        # Listing and order ETags are versioned by it (they embed the counters)
+        updated_at=Now(),
+    )
+
+
+def complete_order(from_statuses=None, **lookup):
+    """
+    Move the order matching ``lookup`` to ``completed`` and credit the seller, exactly once.
+
+    The status change is a compare-and-set (``OrderQuerySet.transition``), so
+    of several concurrent confirmations only the one that flips the row bumps
+    ``total_orders``. ``from_statuses`` limits the statuses it completes from
+    (e.g. a buyer's confirmation must not complete a disputed order).
+    Returns the transitioned row, or None.
+    """
+    # No savepoint when nested: callers extend the transaction (e.g. to queue the
+    # release of funds) and any error aborts it as a whole
+    with transaction.atomic(savepoint=False):
+        row = Order.objects.filter(**lookup).transition(
+            'completed', returning=('id', 'seller_id'), from_statuses=from_statuses
+        )
+        if row is not None:
+            adjust_seller_stats(row['seller_id'], orders=1)
+    return row
+
+
+def record_order_status_change(order, previous_status):
+    """Counter delta for an order whose status was edited directly (e.g. in the admin)."""
+    was_completed = previous_status == 'completed'
+    is_completed = order.status == 'completed'
+    if was_completed != is_completed:
+        adjust_seller_stats(order.seller_id, orders=1 if is_completed else -1)
+
+
+def record_dispute_result_change(dispute, previous_result):
+    """Counter delta for a dispute whose result changed (opened, resolved or reversed)."""
+    before = previous_result is not None and counts_against_seller(previous_result)
+    after = dispute.result is not None and counts_against_seller(dispute.result)
+    if before != after:
+        adjust_seller_stats(dispute.order.seller_id, disputes=1 if after else -1)
+
+
+def repair_seller_stats():
+    """Rebuild every profile's counters in one aggregate pass; returns the rows corrected."""
+    with connection.cursor() as cursor:
+        cursor.execute(REPAIR_SQL)
+        return cursor.rowcount
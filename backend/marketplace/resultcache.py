@@ -0,0 +1,168 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+MISSING = object()
+
+LISTING_VERSION_KEY = 'listings:version'
+
+
+class LRUCache:
+    """Small thread-safe per-process LRU with a per-entry TTL."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key, MISSING)
+            if item is MISSING:
+                return MISSING
+            value, expires_at = item
+            if time.monotonic() >= expires_at:
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TieredCache:
+    """
+    Per-process LRU in front of a shared Django cache backend.
+
+    ``get_or_compute`` coalesces concurrent misses: threads of one process
+    wait on a striped lock, and processes on a short ``add()`` lock in the
+    shared backend, so an expiring hot key is recomputed once rather than
+    by every request that sees the miss. Across processes that needs an
+    atomic ``add()`` (Redis or Memcached, as the production settings require).
+    """
+
+    def __init__(self, alias='default', local_size=256, local_timeout=30, lock_timeout=10, lock_stripes=64):
+        self.alias = alias
+        self.local = LRUCache(local_size)
+        self.local_timeout = local_timeout
+        self.lock_timeout = lock_timeout
+        self._locks = [threading.Lock() for _ in range(lock_stripes)]
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is MISSING:
+            value = self.shared.get(key, MISSING)
+            if value is not MISSING:
+                self.local.set(key, value, self.local_timeout)
+        return value
+
+    def set(self, key, value, timeout):
+        self.shared.set(key, value, timeout)
+        self.local.set(key, value, min(timeout, self.local_timeout))
+
+    def get_or_compute(self, key, compute, timeout):
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        with self._locks[hash(key) % len(self._locks)]:
+            value = self.get(key)
+            if value is not MISSING:
+                return value
+
+            lock_key = f'{key}:lock'
+            token = uuid.uuid4().hex
+            acquired = self.shared.add(lock_key, token, self.lock_timeout)
+            if not acquired:
+                value = self.wait_for(key, lock_key)
+                if value is not MISSING:
+                    return value
+                # The other process gave up or is too slow: compute anyway, taking
+                # the lock only if it has gone
+                acquired = self.shared.add(lock_key, token, self.lock_timeout)
+            try:
+                value = compute()
+                self.set(key, value, timeout)
+            finally:
+                if acquired:
+                    self.release(lock_key, token)
+            return value
+
+    def release(self, lock_key, token):
+        """Delete the lock only while it still holds this caller's token (it may have expired and been retaken)."""
+        if self.shared.get(lock_key) == token:
+            self.shared.delete(lock_key)
+
+    def wait_for(self, key, lock_key):
+        """Poll for a value another process is computing; give up when its lock goes."""
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            value = self.shared.get(key, MISSING)
+            if value is not MISSING:
+                self.local.set(key, value, self.local_timeout)
+                return value
+            if self.shared.get(lock_key) is None:
+                break
+        return MISSING
+
+
+def listing_version():
+    """Global listing version; every cached feed page is keyed by it."""
+    cache = caches[settings.LISTING_CACHE_ALIAS]
+    version = cache.get(LISTING_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old version
+        cache.add(LISTING_VERSION_KEY, time.time_ns() // 1000, timeout=None)
+        version = cache.get(LISTING_VERSION_KEY)
+    return version
+
+
+def bump_listing_version():
+    cache = caches[settings.LISTING_CACHE_ALIAS]
+    try:
+        return cache.incr(LISTING_VERSION_KEY)
+    except ValueError:
+        cache.add(LISTING_VERSION_KEY, time.time_ns() // 1000, timeout=None)
+        return cache.get(LISTING_VERSION_KEY)
+
+
+def query_signature(query_params):
+    """Normalized, order-independent digest of a request's query parameters."""
+    items = []
+    for name in sorted(query_params.keys()):
+        values = sorted(value.strip() for value in query_params.getlist(name))
+        values = [value for value in values if value]
+        # An empty ?cursor= still switches the feed into paginated mode
+        if values or name == 'cursor':
+            items.append(f"{name}={','.join(values)}")
+    return hashlib.sha256('&'.join(items).encode()).hexdigest()
+
+
+listing_cache = TieredCache(
+    alias=settings.LISTING_CACHE_ALIAS,
+    local_size=settings.LISTING_CACHE_LOCAL_SIZE,
+)
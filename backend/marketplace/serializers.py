@@ -1,9 +1,271 @@
+from operator import itemgetter
+
 from rest_framework import serializers
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework.settings import ISO_8601, api_settings
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from .authentication import verify_telegram_init_data
+from .fields import HexField
+from .media import variant_urls
 from .models import UserProfile, Listing, Order, Dispute, UploadedFile
 
 
-class UserSerializer(serializers.ModelSerializer):
+# Bump whenever the output of a read serializer changes so clients drop cached ETags
+REPRESENTATION_VERSION = 5
+
+
+def parse_fieldset(value):
+    """'id,listing.title' -> {'id': {}, 'listing': {'title': {}}}"""
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+class SparseFieldsetMixin:
+    """
+    ``?fields=`` / ``?expand=`` support for model serializers.
+
+    ``fields`` takes dotted paths (``listing.title``) or the name of one of
+    ``Meta.projections`` (``?fields=card``). Once either parameter is given,
+    nested serializers are rendered as their key unless listed in ``expand``
+    or addressed by a dotted path; an expanded relation without explicit
+    subfields uses its own ``card`` projection. ``Meta.field_sources`` names
+    the columns behind computed fields so ``project_queryset`` can restrict
+    the SELECT to what is rendered.
+    """
+    _fieldset = None
+
+    def get_fieldset(self):
+        if self._fieldset is not None:
+            return self._fieldset
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return None
+
+        request = self.context.get('request')
+        params = request.query_params if request is not None else {}
+        fields = params.get('fields') or self.context.get('default_fields')
+        expand = params.get('expand')
+        if not fields and not expand:
+            return None
+        return parse_fieldset(fields) or None, parse_fieldset(expand)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.get_fieldset()
+        if fieldset is None:
+            return fields
+
+        requested, expand = fieldset
+        projections = getattr(self.Meta, 'projections', {})
+        if requested and len(requested) == 1:
+            name, subtree = next(iter(requested.items()))
+            if name in projections and not subtree:
+                requested = parse_fieldset(','.join(projections[name]))
+
+        pruned = {}
+        for name, field in fields.items():
+            if requested is not None and name not in requested:
+                continue
+            if isinstance(field, SparseFieldsetMixin):
+                subfields = requested.get(name) if requested else None
+                if subfields or name in expand:
+                    has_card = 'card' in getattr(field.Meta, 'projections', {})
+                    field._fieldset = (subfields or ({'card': {}} if has_card else None), expand.get(name, {}))
+                else:
+                    field = self.collapse_relation(field)
+            pruned[name] = field
+        return pruned
+
+    def collapse_relation(self, nested):
+        lookup_field = getattr(nested.Meta, 'lookup_field', 'pk')
+        if lookup_field == 'pk':
+            return serializers.PrimaryKeyRelatedField(read_only=True, source=nested.source)
+        return serializers.SlugRelatedField(read_only=True, slug_field=lookup_field, source=nested.source)
+
+    def get_query_projection(self, prefix=''):
+        """Return ``(only, select_related)`` lookups covering the rendered fields."""
+        model = self.Meta.model
+        field_sources = getattr(self.Meta, 'field_sources', {})
+        only = {prefix + model._meta.pk.name}
+        related = set()
+
+        for name, field in self.fields.items():
+            if name in field_sources:
+                for path in field_sources[name]:
+                    only.add(prefix + path)
+                    if '__' in path:
+                        related.add(prefix + path.rsplit('__', 1)[0])
+                continue
+            if field.source == '*':
+                continue
+
+            attr = field.source_attrs[0]
+            try:
+                model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                continue
+
+            if isinstance(field, SparseFieldsetMixin):
+                related.add(prefix + attr)
+                nested_only, nested_related = field.get_query_projection(f'{prefix}{attr}__')
+                only |= nested_only
+                related |= nested_related
+            elif isinstance(field, serializers.SlugRelatedField):
+                related.add(prefix + attr)
+                only.add(f'{prefix}{attr}__{field.slug_field}')
+            else:
+                only.add(prefix + attr)
+        return only, related
+
+    def project_queryset(self, queryset):
+        only, related = self.get_query_projection()
+        if related:
+            queryset = queryset.select_related(*sorted(related))
+        return queryset.only(*sorted(only))
+
+
+class UnsupportedRowField(Exception):
+    """A rendered field has no ``.values()`` equivalent."""
+
+
+# DRF fields whose to_representation() returns column values from .values() unchanged
+PASSTHROUGH_FIELDS = (
+    serializers.CharField, serializers.ChoiceField, serializers.IntegerField,
+    serializers.BooleanField, serializers.ReadOnlyField,
+)
+
+
+class RowPlan:
+    """Compiled row renderer: ``columns`` to pass to ``.values()`` and one getter per output key."""
+
+    def __init__(self, getters, columns):
+        self.getters = getters
+        self.columns = sorted(columns)
+
+    def render(self, row):
+        return {key: get(row) for key, get in self.getters}
+
+    def render_many(self, rows):
+        getters = self.getters
+        return [{key: get(row) for key, get in getters} for row in rows]
+
+
+class RowRepresentationMixin:
+    """
+    Read-only fast path that renders ``.values()`` rows instead of model instances.
+
+    ``get_row_plan()`` compiles the fields this serializer would render
+    (after ``?fields=`` pruning) into column lookups plus converters that
+    return what each DRF field's ``to_representation`` would. Method fields
+    and model properties opt in with a ``row_<name>`` method taking the
+    columns listed for them in ``Meta.field_sources``. Datetimes are left
+    for the renderer to format, which DRF's encoder and orjson both do the
+    same way as ``DateTimeField`` in UTC. When any field has no row
+    equivalent ``get_row_plan()`` returns None and callers use ``.data``.
+    """
+
+    def get_row_plan(self):
+        try:
+            getters, columns = self.compile_row_plan()
+        except UnsupportedRowField:
+            return None
+        return RowPlan(getters, columns)
+
+    def compile_row_plan(self, prefix=''):
+        model = self.Meta.model
+        field_sources = getattr(self.Meta, 'field_sources', {})
+        getters = []
+        columns = set()
+
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            row_method = getattr(self, f'row_{name}', None)
+            if row_method is not None:
+                paths = [prefix + path for path in field_sources.get(name, [name])]
+                columns.update(paths)
+                getters.append((name, self.row_method_getter(row_method, paths)))
+                continue
+            if len(field.source_attrs) != 1:
+                raise UnsupportedRowField(name)
+
+            attr = field.source_attrs[0]
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                raise UnsupportedRowField(name)
+
+            if isinstance(field, RowRepresentationMixin):
+                nested_getters, nested_columns = field.compile_row_plan(f'{prefix}{attr}__')
+                key = f'{prefix}{attr}__{model_field.related_model._meta.pk.name}'
+                columns.update(nested_columns)
+                columns.add(key)
+                getters.append((name, self.nested_getter(key, nested_getters)))
+                continue
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                column = prefix + attr
+            elif isinstance(field, serializers.SlugRelatedField):
+                column = f'{prefix}{attr}__{field.slug_field}'
+            elif model_field.is_relation:
+                raise UnsupportedRowField(name)
+            else:
+                column = prefix + attr
+            columns.add(column)
+            getters.append((name, self.column_getter(column, self.row_converter(field, model_field))))
+        return getters, columns
+
+    def row_converter(self, field, model_field):
+        """Function from column value to ``field.to_representation(value)``, or None for identity."""
+        if isinstance(field, serializers.DecimalField):
+            coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+            if coerce_to_string and not field.localize and model_field.decimal_places == field.decimal_places:
+                # The column's scale already matches, so quantize() is a no-op
+                return '{:f}'.format
+            return field.to_representation
+        if isinstance(field, serializers.DateTimeField):
+            output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+            in_utc = not settings.USE_TZ or timezone.get_current_timezone_name() == 'UTC'
+            if output_format == ISO_8601 and in_utc and not hasattr(field, 'timezone'):
+                return None
+            return field.to_representation
+        if isinstance(field, serializers.ModelField):
+            if isinstance(field.model_field, HexField):
+                return None
+            raise UnsupportedRowField(field.field_name)
+        if isinstance(field, (serializers.RelatedField, serializers.ManyRelatedField, serializers.BaseSerializer)):
+            raise UnsupportedRowField(field.field_name)
+        if isinstance(field, PASSTHROUGH_FIELDS):
+            return None
+        return field.to_representation
+
+    @staticmethod
+    def column_getter(column, convert):
+        # Like Serializer.to_representation, None is rendered without the field's conversion
+        if convert is None:
+            return itemgetter(column)
+        return lambda row: None if row[column] is None else convert(row[column])
+
+    @staticmethod
+    def nested_getter(key, getters):
+        return lambda row: None if row[key] is None else {name: get(row) for name, get in getters}
+
+    @staticmethod
+    def row_method_getter(method, paths):
+        return lambda row: method(*(row[path] for path in paths))
+
+
+class UserSerializer(SparseFieldsetMixin, RowRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'first_name']
@@ -11,6 +273,7 @@ class UserSerializer(serializers.ModelSerializer):
 
 class UserProfileSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    dispute_rate = serializers.FloatField(read_only=True)
     
     class Meta:
         model = UserProfile
@@ -18,56 +281,122 @@ class UserProfileSerializer(serializers.ModelSerializer):
                  'dispute_count', 'total_orders', 'dispute_rate', 'created_at']
 
 
-class ListingSerializer(serializers.ModelSerializer):
+class ListingSerializer(SparseFieldsetMixin, RowRepresentationMixin, serializers.ModelSerializer):
     seller = UserSerializer(read_only=True)
     seller_rating = serializers.SerializerMethodField()
+    seller_total_orders = serializers.SerializerMethodField()
+    seller_dispute_rate = serializers.SerializerMethodField()
     is_expired = serializers.ReadOnlyField()
     expires_at = serializers.ReadOnlyField()
+    thumbnail_url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Listing
+        # file_path is not exposed: buyers get the goods through OrderDownloadView
         fields = ['id', 'seller', 'title', 'description', 'price', 'currency', 
-                 'token_address', 'file_path', 'metadata_cid', 'image_url', 
-                 'image_cid', 'payment_method',
+                 'token_address', 'metadata_cid', 'image_url', 
+                 'image_cid', 'thumbnail_url', 'srcset', 'payment_method',
                  'listing_duration_days',
-                 'status', 'seller_rating', 'is_expired', 'expires_at', 'created_at', 'updated_at']
+                 'status', 'seller_rating', 'seller_total_orders', 'seller_dispute_rate', 'is_expired', 'expires_at', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
+        projections = {
+            'card': ['id', 'title', 'price', 'currency', 'thumbnail_url', 'srcset'],
+        }
+        field_sources = {
+            'seller_rating': ['seller__userprofile__rating'],
+            'seller_total_orders': ['seller__userprofile__total_orders'],
+            'seller_dispute_rate': ['seller__userprofile__dispute_rate'],
+            'is_expired': ['expires_at'],
+            'thumbnail_url': ['image_url'],
+            'srcset': ['image_url'],
+        }
     
     def get_seller_rating(self, obj):
         try:
             return float(obj.seller.userprofile.rating)
-        except:
+        except UserProfile.DoesNotExist:
             return 0.0
+    
+    def get_seller_total_orders(self, obj):
+        try:
+            return obj.seller.userprofile.total_orders
+        except UserProfile.DoesNotExist:
+            return 0
+    
+    def get_seller_dispute_rate(self, obj):
+        try:
+            return float(obj.seller.userprofile.dispute_rate)
+        except UserProfile.DoesNotExist:
+            return 0.0
+    
+    def get_thumbnail_url(self, obj):
+        return self.row_thumbnail_url(obj.image_url)
+    
+    def get_srcset(self, obj):
+        return self.row_srcset(obj.image_url)
+    
+    # Row equivalents of the above for RowRepresentationMixin, fed Meta.field_sources
+    
+    def row_seller_rating(self, rating):
+        return 0.0 if rating is None else float(rating)
+    
+    def row_seller_total_orders(self, total_orders):
+        return 0 if total_orders is None else total_orders
+    
+    def row_seller_dispute_rate(self, dispute_rate):
+        return 0.0 if dispute_rate is None else float(dispute_rate)
+    
+    def row_is_expired(self, expires_at):
+        return expires_at is not None and timezone.now() > expires_at
+    
+    def row_thumbnail_url(self, image_url):
+        # Variant URLs serve the original until the worker has generated them
+        return variant_urls(image_url)[0]
+    
+    def row_srcset(self, image_url):
+        return variant_urls(image_url)[1]
+
+
+def get_authenticated_user_id(serializer):
+    """User id from the request's verified session token; identity never comes from the body."""
+    request = serializer.context.get('request')
+    if request is None or not request.user.is_authenticated:
+        raise NotAuthenticated()
+    return request.user.id
 
 
 class CreateListingSerializer(serializers.ModelSerializer):
-    seller_id = serializers.IntegerField(write_only=True)
     image_url = serializers.CharField(required=True, allow_blank=False)
     
     class Meta:
         model = Listing
-        fields = ['seller_id', 'title', 'description', 'price', 'currency', 
+        fields = ['title', 'description', 'price', 'currency', 
                  'token_address', 'file_path', 'metadata_cid', 'image_url', 
                  'image_cid', 'payment_method',
                  'listing_duration_days', 'status']
     
     def create(self, validated_data):
-        seller_id = validated_data.pop('seller_id')
-        try:
-            # Try to find user by telegram_id first, then by user id
-            try:
-                profile = UserProfile.objects.get(telegram_id=int(seller_id))
-                seller = profile.user
-            except UserProfile.DoesNotExist:
-                seller = User.objects.get(id=int(seller_id))
-        except (User.DoesNotExist, ValueError):
-            raise serializers.ValidationError(f'User not found: {seller_id}')
-        
-        validated_data['seller'] = seller
+        validated_data['seller_id'] = get_authenticated_user_id(self)
         return super().create(validated_data)
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class BulkListingItemSerializer(CreateListingSerializer):
+    """One listing of a bulk import; the seller is set once for the whole batch."""
+
+
+class BulkListingUpdateItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=['active', 'inactive'], required=False)
+    price = serializers.DecimalField(max_digits=18, decimal_places=8, min_value=0, required=False)
+
+    def validate(self, attrs):
+        if 'status' not in attrs and 'price' not in attrs:
+            raise serializers.ValidationError('Provide status and/or price.')
+        return attrs
+
+
+class OrderSerializer(SparseFieldsetMixin, RowRepresentationMixin, serializers.ModelSerializer):
     listing = ListingSerializer(read_only=True)
     buyer = UserSerializer(read_only=True)
     seller = UserSerializer(read_only=True)
@@ -77,40 +406,43 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ['order_id', 'listing', 'buyer', 'seller', 'amount', 'token_address', 
                  'status', 'escrow_tx_hash', 'delivery_cid', 'deadline', 'created_at', 'updated_at']
         read_only_fields = ['order_id', 'created_at', 'updated_at']
+        lookup_field = 'order_id'
+        projections = {
+            'card': ['order_id', 'listing', 'amount', 'status', 'created_at'],
+        }
 
 
 class CreateOrderSerializer(serializers.ModelSerializer):
     listing_id = serializers.IntegerField(write_only=True)
-    buyer_id = serializers.IntegerField(write_only=True)
     
     class Meta:
         model = Order
-        fields = ['listing_id', 'buyer_id', 'amount', 'token_address']
+        fields = ['listing_id', 'amount', 'token_address']
     
     def create(self, validated_data):
         listing_id = validated_data.pop('listing_id')
-        buyer_id = validated_data.pop('buyer_id')
+        # Identity comes from the verified session token; no lookup needed
+        buyer_id = get_authenticated_user_id(self)
         
         try:
-            listing = Listing.objects.get(id=listing_id)
-            buyer = User.objects.get(id=buyer_id)
-        except (Listing.DoesNotExist, User.DoesNotExist):
-            raise serializers.ValidationError('Listing or buyer not found')
+            listing = Listing.objects.select_related('seller__userprofile').get(id=listing_id)
+        except Listing.DoesNotExist:
+            raise serializers.ValidationError('Listing not found')
         
-        if buyer == listing.seller:
+        if buyer_id == listing.seller_id:
             raise serializers.ValidationError('Cannot buy your own listing')
         
         # Generate unique order ID
         import hashlib
         from datetime import datetime, timedelta
         
-        order_id = '0x' + hashlib.sha256(f"{listing.id}_{buyer.id}_{datetime.now()}".encode()).hexdigest()
+        order_id = '0x' + hashlib.sha256(f"{listing.id}_{buyer_id}_{datetime.now()}".encode()).hexdigest()
         deadline = datetime.now() + timedelta(days=7)
         
         validated_data.update({
             'order_id': order_id,
             'listing': listing,
-            'buyer': buyer,
+            'buyer_id': buyer_id,
             'seller': listing.seller,
             'deadline': deadline
         })
@@ -118,7 +450,7 @@ class CreateOrderSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class DisputeSerializer(serializers.ModelSerializer):
+class DisputeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     order = OrderSerializer(read_only=True)
     initiator = UserSerializer(read_only=True)
     
@@ -130,13 +462,29 @@ class DisputeSerializer(serializers.ModelSerializer):
 
 
 class TelegramAuthSerializer(serializers.Serializer):
-    telegram_id = serializers.IntegerField()
-    username = serializers.CharField(required=False)
-    first_name = serializers.CharField(required=False)
+    """Mini App ``initData``; validates to the Telegram user it was signed for."""
+    init_data = serializers.CharField()
+
+    def validate_init_data(self, value):
+        try:
+            return verify_telegram_init_data(value)
+        except signing.BadSignature as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate(self, attrs):
+        user = attrs.pop('init_data', None)
+        if user is not None:
+            attrs.update(
+                telegram_id=user['id'],
+                username=user.get('username') or f"user_{user['id']}",
+                first_name=user.get('first_name', ''),
+            )
+        return attrs
 
 
-class PrivyAuthLinkSerializer(serializers.Serializer):
-    telegram_id = serializers.IntegerField(required=False)
+class PrivyAuthLinkSerializer(TelegramAuthSerializer):
+    """Optional ``initData`` proving the Telegram account to link the Privy user to."""
+    init_data = serializers.CharField(required=False)
 
 
 class DepositSerializer(serializers.Serializer):
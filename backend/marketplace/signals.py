@@ -0,0 +1,27 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Dispute, Listing
+from .reputation import adjust_seller_stats, counts_against_seller
+from .resultcache import bump_listing_version
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+def invalidate_listing_pages(sender, **kwargs):
+    # Bump after commit so a page recomputed under the new version sees the write
+    transaction.on_commit(bump_listing_version)
+
+
+@receiver(post_save, sender=Dispute)
+def count_opened_dispute(sender, instance, created, **kwargs):
+    # Result changes on existing disputes go through reputation.record_dispute_result_change
+    if created and counts_against_seller(instance.result):
+        adjust_seller_stats(instance.order.seller_id, disputes=1)
+
+
+@receiver(post_delete, sender=Dispute)
+def uncount_deleted_dispute(sender, instance, **kwargs):
+    if counts_against_seller(instance.result):
+        adjust_seller_stats(instance.order.seller_id, disputes=-1)
@@ -0,0 +1,44 @@
+"""Background tasks run by ``manage.py run_jobs``; queued with ``jobs.enqueue`` in the triggering transaction."""
+from . import media
+from .escrow import escrow_backend
+from .jobs import PermanentFailure, task
+from .models import ImageVariant, Order, UploadedFile
+
+
+@task('escrow.create_escrow', queue='escrow', max_attempts=8)
+def create_escrow(order_id):
+    try:
+        order = Order.objects.select_related('seller__userprofile').get(order_id=order_id)
+    except Order.DoesNotExist:
+        raise PermanentFailure(f"Order {order_id} does not exist")
+
+    wallet_address = order.seller.userprofile.wallet_address if hasattr(order.seller, 'userprofile') else None
+    if not escrow_backend().create_escrow(order.order_id, wallet_address, order.token_address, order.amount,
+                                          order.deadline):
+        raise PermanentFailure(f"Escrow rejected order {order_id} (seller wallet: {wallet_address or 'none'})")
+
+
+@task('escrow.release_funds', queue='escrow', max_attempts=8)
+def release_funds(order_id):
+    # Retried on RPC errors; the contract refuses a second release of the same order
+    if not escrow_backend().release_funds(order_id):
+        raise RuntimeError(f"Escrow did not release funds for order {order_id}")
+
+
+@task('media.generate_variants', queue='media', max_attempts=3)
+def generate_variants(sha256):
+    try:
+        upload = UploadedFile.objects.get(sha256=sha256)
+    except UploadedFile.DoesNotExist:
+        raise PermanentFailure(f"Upload {sha256} does not exist")
+
+    try:
+        variants = media.generate_variants(sha256)
+    except (media.NotAnImage, FileNotFoundError) as e:
+        raise PermanentFailure(f"No variants for {sha256}: {e}")
+    # Re-runs overwrite the files and rows in place
+    ImageVariant.objects.bulk_create(
+        [ImageVariant(upload=upload, **variant) for variant in variants],
+        update_conflicts=True, unique_fields=['upload', 'name'],
+        update_fields=['width', 'height', 'content_type', 'file_size'],
+    )
@@ -1,3 +1,1346 @@
-from django.test import TestCase
+import asyncio
+import base64
+import hashlib
+import hmac
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.exceptions import MiddlewareNotUsed, SynchronousOnlyOperation, ValidationError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+from jose import jwk, jwt
+from PIL import Image
+import rsa
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import urls
+from . import exports, jobs, jwks, reputation, tasks, uploads
+from .authentication import issue_session_token
+from .chain import encode_args, encode_call, event_topic, signature_types
+from .escrow import RELEASE_FUNDS, escrow_backend
+from .indexer import EscrowIndexer
+from .models import Dispute, ImageVariant, InvalidTransition, Job, Listing, Order, UploadedFile, UserProfile
+from .querybudget import QueryBudgetExceeded, QueryBudgetMiddleware, query_budget
+from .renderers import FastJSONRenderer, NDJSONRenderer
+from .resultcache import TieredCache, listing_cache, listing_version
+from .serializers import ListingSerializer, RowPlan
+from .views import ListingDetailView, ListingsView, OrderDetailView
+
+
+TOKEN_ADDRESS = '0x' + 'ab' * 20
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+TELEGRAM_BOT_TOKEN = '123456:test-bot-token'
+
+
+def make_user(username, telegram_id, wallet_address=None):
+    user = User.objects.create(username=username, first_name=username.title())
+    profile = UserProfile.objects.create(user=user, telegram_id=telegram_id, wallet_address=wallet_address)
+    return user, profile
+
+
+def make_listing(seller, **fields):
+    return Listing.objects.create(**{
+        'seller': seller,
+        'title': 'Listing',
+        'description': 'Description',
+        'price': Decimal('10.5'),
+        'token_address': TOKEN_ADDRESS,
+        'image_url': 'https://example.com/image.png',
+        **fields,
+    })
+
+
+def make_order(listing, buyer, status='created', n=0):
+    return Order.objects.create(
+        order_id='0x' + f'{listing.id:08x}{buyer.id:08x}{n:08x}'.rjust(64, '0'),
+        listing=listing,
+        buyer=buyer,
+        seller=listing.seller,
+        amount=listing.price,
+        token_address=TOKEN_ADDRESS,
+        status=status,
+        deadline=timezone.now() + timedelta(days=7),
+    )
+
+
+def telegram_init_data(telegram_id, username=None, auth_date=None, bot_token=TELEGRAM_BOT_TOKEN):
+    """Mini App initData for a Telegram user, signed the way Telegram signs it."""
+    user = {'id': telegram_id, 'first_name': 'Telegram'}
+    if username:
+        user['username'] = username
+    fields = {'auth_date': str(int(auth_date or time.time())), 'query_id': 'AAHdF6IQAAAAAN0XohDhrOrc',
+              'user': json.dumps(user)}
+    check_string = '\n'.join(f'{key}={value}' for key, value in sorted(fields.items()))
+    secret = hmac.new(b'WebAppData', bot_token.encode(), hashlib.sha256).digest()
+    fields['hash'] = hmac.new(secret, check_string.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+def png_bytes(size=(8, 8)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(CACHES=LOCMEM_CACHES, QUERY_BUDGET_STRICT=True, TELEGRAM_BOT_TOKEN=TELEGRAM_BOT_TOKEN)
+class MarketplaceTestCase(TestCase):
+    """Sellers, a buyer and some listings; every request runs under the strict query budget."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller, cls.seller_profile = make_user('seller', 1001, '0x' + '11' * 20)
+        cls.buyer, cls.buyer_profile = make_user('buyer', 1002, '0x' + '22' * 20)
+        cls.other, cls.other_profile = make_user('other', 1003)
+        cls.listings = [make_listing(cls.seller, title=f'Listing {n}') for n in range(3)]
+
+    def setUp(self):
+        self.clear_listing_cache()
+        self.client = APIClient()
+
+    def clear_listing_cache(self):
+        listing_cache.local.clear()
+        listing_cache.shared.clear()
+
+    def token_client(self, user, profile):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {issue_session_token(user, profile)}')
+        return client
+
+    def assertWithinBudget(self, response):
+        """The middleware raises over budget; also check it counted the request."""
+        self.assertIn('X-Query-Count', response)
+        return response
+
+
+class QueryBudgetTests(MarketplaceTestCase):
+
+    def test_every_route_declares_a_budget(self):
+        for pattern in urls.urlpatterns:
+            self.assertIsInstance(pattern, URLPattern)
+            view_class = pattern.callback.view_class
+            self.assertIsInstance(getattr(view_class, 'query_budget', None), int, pattern.name)
+
+    def test_helper_fails_over_budget(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(1, 'two queries'):
+                list(User.objects.all())
+                list(Listing.objects.all())
+
+    def test_strict_middleware_fails_over_budget(self):
+        with mock.patch.object(ListingDetailView, 'query_budget', 0), self.assertLogs('django.request', 'ERROR'):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('listing_detail', args=[self.listings[0].id]))
+
+    def test_listing_feed_query_count_is_constant(self):
+        counts = []
+        for extra in (0, 20):
+            for n in range(extra):
+                seller, _ = make_user(f'feed_seller_{n}', 2000 + n)
+                make_listing(seller)
+            self.clear_listing_cache()
+            for params in ({}, {'cursor': ''}, {'ordering': 'price'}, {'fields': 'id,seller.username,seller_rating'}):
+                response = self.assertWithinBudget(self.client.get(reverse('listings'), params))
+                self.assertEqual(response.status_code, 200)
+                counts.append((extra, str(params), int(response['X-Query-Count'])))
+        small = [count for extra, _, count in counts if extra == 0]
+        large = [count for extra, _, count in counts if extra == 20]
+        self.assertEqual(small, large)
+
+    def test_read_endpoints(self):
+        order = make_order(self.listings[0], self.buyer, status='paid')
+        buyer = self.token_client(self.buyer, self.buyer_profile)
+        seller = self.token_client(self.seller, self.seller_profile)
+
+        for client, url in [
+            (self.client, reverse('listing_detail', args=[self.listings[0].id])),
+            (self.client, reverse('order_detail', args=[order.order_id])),
+            (buyer, reverse('order_purchases')),
+            (seller, reverse('order_sales')),
+            (buyer, reverse('order_download', args=[order.order_id])),
+        ]:
+            response = self.assertWithinBudget(client.get(url))
+            self.assertIn(response.status_code, (200, 404), url)
+
+    def test_write_endpoints(self):
+        seller = self.token_client(self.seller, self.seller_profile)
+        buyer = self.token_client(self.buyer, self.buyer_profile)
+
+        response = self.assertWithinBudget(seller.post(reverse('listings'), {
+            'title': 'New', 'description': 'New listing', 'price': '3.25',
+            'token_address': TOKEN_ADDRESS, 'image_url': 'https://example.com/new.png',
+        }, format='json'))
+        self.assertEqual(response.status_code, 201, response.content)
+
+        response = self.assertWithinBudget(buyer.post(reverse('create_order'), {
+            'listing_id': self.listings[0].id, 'amount': '10.5', 'token_address': TOKEN_ADDRESS,
+        }, format='json'))
+        self.assertEqual(response.status_code, 201, response.content)
+        order_id = response.json()['order_id']
+
+        response = self.assertWithinBudget(buyer.post(
+            reverse('mock_deposit', args=[order_id]), {'buyer_address': '0x' + '22' * 20}, format='json'
+        ))
+        self.assertEqual(response.status_code, 200, response.content)
+
+        response = self.assertWithinBudget(buyer.post(reverse('confirm_delivery', args=[order_id])))
+        self.assertEqual(response.status_code, 200, response.content)
+
+        response = self.assertWithinBudget(seller.delete(reverse('delete_listing', args=[self.listings[2].id])))
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_bulk_endpoints(self):
+        seller = self.token_client(self.seller, self.seller_profile)
+        items = [
+            {'title': f'Bulk {n}', 'description': 'Bulk', 'price': '1.00',
+             'token_address': TOKEN_ADDRESS, 'image_url': 'https://example.com/bulk.png'}
+            for n in range(25)
+        ]
+        response = self.assertWithinBudget(seller.post(reverse('bulk_listings'), {'listings': items}, format='json'))
+        self.assertEqual(len(response.json()['created']), 25, response.content)
+
+        ids = [listing.id for listing in self.listings]
+        response = self.assertWithinBudget(seller.patch(reverse('bulk_listings'), {
+            'listings': [{'id': listing_id, 'price': '2.00'} for listing_id in ids],
+        }, format='json'))
+        self.assertEqual(response.status_code, 200, response.content)
+
+        response = self.assertWithinBudget(seller.delete(reverse('bulk_listings'), {'ids': ids}, format='json'))
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_auth_endpoint(self):
+        response = self.assertWithinBudget(self.client.post(reverse('telegram_auth'), {
+            'init_data': telegram_init_data(5005, 'newcomer'),
+        }, format='json'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('token', response.json())
+
+    def test_upload_and_blob_endpoints(self):
+        with self.settings(BLOB_STORE_ROOT=self.blob_root()):
+            image = io.BytesIO(png_bytes())
+            image.name = 'image.png'
+            seller = self.token_client(self.seller, self.seller_profile)
+            response = self.assertWithinBudget(seller.post(reverse('upload_file'), {'file': image}))
+            self.assertEqual(response.status_code, 200, response.content)
+            digest = response.json()['sha256']
+
+            response = self.assertWithinBudget(self.client.get(reverse('blob', args=[digest])))
+            self.assertEqual(response.status_code, 200)
+            response = self.assertWithinBudget(self.client.get(reverse('blob_variant', args=[digest, 'w320.webp'])))
+            self.assertEqual(response.status_code, 200)
+
+    def blob_root(self):
+        root = tempfile.mkdtemp(prefix='blobs-')
+        self.addCleanup(shutil.rmtree, root, True)
+        return root
+
+
+class QueryBudgetMiddlewareTests(SimpleTestCase):
+    """No database here: any connection the middleware opened would fail the test."""
+
+    def test_requests_that_never_query_never_connect(self):
+        digest = 'ab' * 32
+        response = self.client.get(reverse('blob', args=[digest]), HTTP_IF_NONE_MATCH=f'"{digest}"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['X-Query-Count'], '0')
+
+    @override_settings(DEBUG=False, TESTING=False, QUERY_BUDGET_ENABLED=False)
+    def test_not_installed_in_production(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            QueryBudgetMiddleware(lambda request: None)
+
+
+class SessionIdentityTests(MarketplaceTestCase):
+    """Writes act as the session token's user; ids in the body are not identity."""
+
+    listing_data = {
+        'title': 'New', 'description': 'New listing', 'price': '3.25',
+        'token_address': TOKEN_ADDRESS, 'image_url': 'https://example.com/new.png',
+    }
+
+    def test_anonymous_writes_are_rejected(self):
+        listing = self.listings[0]
+        for method, url, data in [
+            ('post', reverse('listings'), {**self.listing_data, 'seller_id': self.seller.id}),
+            ('post', reverse('create_order'), {'listing_id': listing.id, 'amount': '1', 'token_address': TOKEN_ADDRESS,
+                                               'buyer_id': self.buyer.id}),
+            ('delete', reverse('delete_listing', args=[listing.id]), {'seller_id': self.seller.id}),
+            ('post', reverse('bulk_listings'), {'listings': [self.listing_data], 'seller_id': self.seller.id}),
+            ('patch', reverse('bulk_listings'), {'listings': [{'id': listing.id, 'price': '0.01'}],
+                                                 'seller_id': self.seller.id}),
+            ('delete', reverse('bulk_listings'), {'ids': [listing.id], 'seller_id': self.seller.id}),
+        ]:
+            response = getattr(self.client, method)(url, data, format='json')
+            self.assertEqual(response.status_code, 401, url)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Listing.objects.filter(is_deleted=True).exists())
+        self.assertFalse(Listing.objects.filter(title='New').exists())
+        listing.refresh_from_db()
+        self.assertNotEqual(listing.price, Decimal('0.01'))
+
+    def test_body_ids_are_ignored(self):
+        client = self.token_client(self.other, self.other_profile)
+        response = client.post(reverse('listings'), {**self.listing_data, 'seller_id': self.seller.id}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Listing.objects.get(title='New').seller_id, self.other.id)
+
+        response = client.post(reverse('create_order'), {
+            'listing_id': self.listings[0].id, 'amount': '10.5', 'token_address': TOKEN_ADDRESS, 'buyer_id': self.buyer.id,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Order.objects.get().buyer_id, self.other.id)
+
+        response = client.delete(reverse('delete_listing', args=[self.listings[0].id]), {'seller_id': self.seller.id},
+                                 format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_bulk_writes_only_touch_own_listings(self):
+        client = self.token_client(self.other, self.other_profile)
+        ids = [listing.id for listing in self.listings]
+        response = client.post(reverse('bulk_listings'), {'listings': [self.listing_data], 'seller_id': self.seller.id},
+                               format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Listing.objects.get(title='New').seller_id, self.other.id)
+
+        response = client.patch(reverse('bulk_listings'), {
+            'listings': [{'id': listing_id, 'price': '0.01'} for listing_id in ids], 'seller_id': self.seller.id,
+        }, format='json')
+        self.assertEqual(response.json()['updated'], [])
+        self.assertEqual(len(response.json()['errors']), len(ids))
+
+        response = client.delete(reverse('bulk_listings'), {'ids': ids, 'seller_id': self.seller.id}, format='json')
+        self.assertEqual(response.json()['deleted'], [])
+        self.assertFalse(Listing.objects.filter(id__in=ids, is_deleted=True).exists())
+        self.assertFalse(Listing.objects.filter(id__in=ids, price=Decimal('0.01')).exists())
+
+
+    def test_telegram_login_needs_signed_init_data(self):
+        for init_data in [
+            telegram_init_data(1001, 'seller', bot_token='654321:someone-else'),
+            telegram_init_data(1001, 'seller', auth_date=time.time() - settings.TELEGRAM_INIT_DATA_MAX_AGE - 60),
+            telegram_init_data(1001, 'seller').replace('1001', '1002'),
+        ]:
+            response = self.client.post(reverse('telegram_auth'), {'init_data': init_data}, format='json')
+            self.assertEqual(response.status_code, 400, init_data)
+        response = self.client.post(reverse('telegram_auth'), {'telegram_id': 1001, 'username': 'seller'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_telegram_login_finds_the_account_by_verified_id(self):
+        response = self.client.post(reverse('telegram_auth'), {'init_data': telegram_init_data(1001, 'renamed')},
+                                    format='json')
+        self.assertEqual(response.json()['user_id'], self.seller.id)
+
+        # A new Telegram user whose username matches an existing account gets its own account
+        response = self.client.post(reverse('telegram_auth'), {'init_data': telegram_init_data(7007, 'seller')},
+                                    format='json')
+        self.assertNotEqual(response.json()['user_id'], self.seller.id)
+        self.assertEqual(response.json()['username'], 'user_7007')
+        self.assertEqual(UserProfile.objects.get(user_id=response.json()['user_id']).telegram_id, 7007)
+
+    def test_privy_link_needs_signed_init_data(self):
+        claims = {'sub': 'did:privy:linked'}
+        headers = {'HTTP_AUTHORIZATION': 'Bearer privy-id-token'}
+        with mock.patch.object(jwks, 'averify_privy_token', mock.AsyncMock(return_value=claims)):
+            response = self.client.post(reverse('privy_auth'), {'telegram_id': 1001}, format='json', **headers)
+            # Without initData the Privy user is not linked to anyone's Telegram account
+            self.assertNotEqual(response.json().get('user_id'), self.seller.id)
+
+            response = self.client.post(reverse('privy_auth'), {
+                'init_data': telegram_init_data(1001, bot_token='654321:someone-else'),
+            }, format='json', **headers)
+            self.assertEqual(response.status_code, 400)
+
+            response = self.client.post(reverse('privy_auth'), {'init_data': telegram_init_data(1001)},
+                                        format='json', **headers)
+        self.assertEqual(response.json()['user_id'], self.seller.id)
+        self.seller_profile.refresh_from_db()
+        self.assertEqual(self.seller_profile.privy_user_id, 'did:privy:linked')
+
+
+class ConditionalGetTests(MarketplaceTestCase):
+
+    def assertRevalidates(self, url, change):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        validators = {'HTTP_IF_NONE_MATCH': first['ETag'], 'HTTP_IF_MODIFIED_SINCE': first['Last-Modified']}
+        self.assertEqual(self.client.get(url, **validators).status_code, 304)
+
+        time.sleep(1)  # Last-Modified has one-second resolution
+        change()
+        second = self.client.get(url, **validators)
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 200)
+        return first.json(), second.json()
+
+    def test_seller_counters_change_listing_and_order_validators(self):
+        order = make_order(self.listings[0], self.buyer, status='paid')
+        complete = lambda: reputation.adjust_seller_stats(self.seller.id, orders=1)  # noqa: E731
+
+        before, after = self.assertRevalidates(reverse('listing_detail', args=[self.listings[0].id]), complete)
+        self.assertEqual(after['seller_total_orders'], before['seller_total_orders'] + 1)
+
+        before, after = self.assertRevalidates(reverse('order_detail', args=[order.order_id]), complete)
+        self.assertEqual(after['listing']['seller_total_orders'], before['listing']['seller_total_orders'] + 1)
+
+    def test_expiry_changes_validators(self):
+        listing = self.listings[1]
+        Listing.objects.filter(id=listing.id).update(expires_at=timezone.now() + timedelta(seconds=1))
+        # Nothing is saved when the listing expires; only the clock moves
+        before, after = self.assertRevalidates(reverse('listing_detail', args=[listing.id]), lambda: None)
+        self.assertEqual((before['is_expired'], after['is_expired']), (False, True))
+
+
+class ListingExpiryTests(MarketplaceTestCase):
+
+    def test_save_maintains_expires_at(self):
+        listing = make_listing(self.seller, listing_duration_days=3)
+        # On insert created_at is set after expires_at is computed, so they differ by microseconds
+        self.assertAlmostEqual(listing.expires_at, listing.created_at + timedelta(days=3), delta=timedelta(seconds=1))
+        listing.listing_duration_days = 10
+        listing.save()
+        listing.refresh_from_db()
+        self.assertEqual(listing.expires_at, listing.created_at + timedelta(days=10))
+
+    def test_sweeper_deactivates_expired_listings_in_batches(self):
+        expired = [make_listing(self.seller, title=f'Expired {n}') for n in range(5)]
+        deleted = make_listing(self.seller, title='Deleted', is_deleted=True)
+        Listing.objects.filter(id__in=[listing.id for listing in expired] + [deleted.id]).update(
+            expires_at=timezone.now() - timedelta(minutes=1),
+        )
+        version = listing_version()
+
+        out = io.StringIO()
+        call_command('expire_listings', batch_size=2, sleep=0, max_batches=2, stdout=out)
+        self.assertIn('Expired 4 listing(s) in 2 batch(es)', out.getvalue())
+        self.assertEqual(Listing.objects.expired().count(), 1)
+
+        call_command('expire_listings', batch_size=2, sleep=0, stdout=out)
+        self.assertFalse(Listing.objects.expired().exists())
+        self.assertEqual(Listing.objects.filter(id__in=[listing.id for listing in expired], status='inactive').count(), 5)
+        # Deleted and unexpired listings are left alone
+        self.assertEqual(Listing.objects.get(id=deleted.id).status, 'active')
+        self.assertEqual(Listing.objects.filter(id__in=[listing.id for listing in self.listings], status='active').count(), 3)
+        # The cached feed pages are dropped
+        self.assertGreater(listing_version(), version)
+
+        call_command('expire_listings', sleep=0, stdout=out)
+        self.assertIn('Expired 0 listing(s) in 0 batch(es)', out.getvalue())
+
+
+class ListingSearchTests(MarketplaceTestCase):
+    """``?search=``: prefix terms on the tsvector, title above description, trigram fallback for typos."""
+
+    def setUp(self):
+        super().setUp()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            if cursor.fetchone() is None:
+                self.skipTest('pg_trgm is not installed in this database')
+        self.keyboard = make_listing(self.seller, title='Mechanical keyboard', description='Brown switches')
+        self.desk_mat = make_listing(self.seller, title='Desk mat', description='Fits a mechanical keyboard')
+        self.headphones = make_listing(self.seller, title='Wireless headphones', description='Noise cancelling')
+
+    def search(self, text):
+        response = self.assertWithinBudget(self.client.get(reverse('listings'), {'search': text}))
+        self.assertEqual(response.status_code, 200, response.content)
+        return [listing['id'] for listing in response.json()['listings']]
+
+    def test_terms_match_as_prefixes(self):
+        self.assertEqual(self.search('wirel'), [self.headphones.id])
+        self.assertEqual(self.search('headph WIRE'), [self.headphones.id])
+        self.assertEqual(self.search('noise'), [self.headphones.id])
+        # Every term has to match
+        self.assertEqual(self.search('wireless keyboard'), [])
+
+    def test_title_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search('keyboard'), [self.keyboard.id, self.desk_mat.id])
+        self.assertEqual(self.search('mechanical keyb'), [self.keyboard.id, self.desk_mat.id])
+
+    def test_typos_fall_back_to_title_similarity(self):
+        self.assertEqual(self.search('keyboad'), [self.keyboard.id])
+        self.assertEqual(self.search('zzzz'), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TieredCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        # Each instance stands for one worker process sharing the cache backend
+        self.cache = TieredCache(lock_timeout=0.2)
+
+    def test_computes_once_and_releases_its_lock(self):
+        calls = []
+        self.assertEqual(self.cache.get_or_compute('page', lambda: calls.append(1) or 'value', 60), 'value')
+        self.assertEqual(TieredCache().get_or_compute('page', lambda: calls.append(1) or 'other', 60), 'value')
+        self.assertEqual(len(calls), 1)
+        self.assertIsNone(caches['default'].get('page:lock'))
+
+    def test_waits_for_the_lock_holder(self):
+        caches['default'].add('page:lock', 'other-process', 5)
+        threading.Timer(0.05, lambda: caches['default'].set('page', 'theirs', 60)).start()
+        self.assertEqual(TieredCache(lock_timeout=2).get_or_compute('page', lambda: 'ours', 60), 'theirs')
+
+    def test_timed_out_waiter_keeps_the_holders_lock(self):
+        caches['default'].add('page:lock', 'other-process', 5)
+        self.assertEqual(self.cache.get_or_compute('page', lambda: 'ours', 60), 'ours')
+        self.assertEqual(caches['default'].get('page:lock'), 'other-process')
+
+
+class OrderTransitionTests(MarketplaceTestCase):
+
+    def confirm(self, order, user, profile):
+        return self.token_client(user, profile).post(reverse('confirm_delivery', args=[order.order_id]))
+
+    def test_buyer_cannot_complete_a_disputed_order(self):
+        order = make_order(self.listings[0], self.buyer, status='disputed')
+        response = self.confirm(order, self.buyer, self.buyer_profile)
+        self.assertEqual(response.status_code, 400)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'disputed')
+        self.assertFalse(Job.objects.filter(task='escrow.release_funds').exists())
+        self.seller_profile.refresh_from_db()
+        self.assertEqual(self.seller_profile.total_orders, 0)
+
+    def test_only_the_buyer_confirms(self):
+        order = make_order(self.listings[0], self.buyer, status='paid')
+        self.assertEqual(self.client.post(reverse('confirm_delivery', args=[order.order_id])).status_code, 401)
+        self.assertEqual(self.confirm(order, self.seller, self.seller_profile).status_code, 404)
+        self.assertEqual(self.confirm(order, self.other, self.other_profile).status_code, 404)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'paid')
+
+        self.assertEqual(self.confirm(order, self.buyer, self.buyer_profile).status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'completed')
+        self.assertTrue(Job.objects.filter(task='escrow.release_funds', args={'order_id': order.order_id}).exists())
+
+    def test_escrow_hears_only_confirmations_the_order_allows(self):
+        paid = make_order(self.listings[0], self.buyer, status='paid')
+        disputed = make_order(self.listings[1], self.buyer, status='disputed')
+        for indexed in (False, True):
+            with mock.patch.object(escrow_backend(), 'indexed', indexed), \
+                    mock.patch.object(escrow_backend(), 'confirm_delivery', return_value=True) as confirm_delivery:
+                self.assertEqual(self.confirm(paid, self.other, self.other_profile).status_code, 404)
+                self.assertEqual(self.confirm(disputed, self.buyer, self.buyer_profile).status_code, 400)
+            confirm_delivery.assert_not_called()
+
+    def test_refused_confirmation_leaves_the_order_paid(self):
+        order = make_order(self.listings[0], self.buyer, status='paid')
+        with mock.patch.object(escrow_backend(), 'confirm_delivery', return_value=False) as confirm_delivery:
+            self.assertEqual(self.confirm(order, self.buyer, self.buyer_profile).status_code, 400)
+        confirm_delivery.assert_called_once_with(order.order_id, self.buyer_profile.wallet_address)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'paid')
+        self.assertFalse(Job.objects.filter(task='escrow.release_funds').exists())
+        self.seller_profile.refresh_from_db()
+        self.assertEqual(self.seller_profile.total_orders, 0)
+
+    def test_only_the_buyer_deposits(self):
+        order = make_order(self.listings[0], self.buyer)
+        url = reverse('mock_deposit', args=[order.order_id])
+        data = {'buyer_address': '0x' + '33' * 20}
+        self.assertEqual(self.client.post(url, data, format='json').status_code, 401)
+        response = self.token_client(self.other, self.other_profile).post(url, data, format='json')
+        self.assertEqual(response.status_code, 404)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'created')
+
+    def test_dispute_resolution_still_completes(self):
+        order = make_order(self.listings[0], self.buyer, status='disputed')
+        self.assertIsNotNone(reputation.complete_order(order_id=order.order_id))
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'completed')
+
+    def test_from_statuses_must_be_allowed_sources(self):
+        with self.assertRaises(InvalidTransition):
+            Order.objects.filter(order_id='0x' + '00' * 32).transition('paid', from_statuses=('completed',))
+
+
+class HexFieldTests(MarketplaceTestCase):
+
+    def test_round_trip(self):
+        order = make_order(self.listings[0], self.buyer)
+        Order.objects.filter(pk=order.pk).update(escrow_tx_hash=' ' + 'AB' * 32)
+        order.refresh_from_db()
+        self.assertEqual(order.escrow_tx_hash, '0x' + 'ab' * 32)
+
+        self.other_profile.wallet_address = bytes.fromhex('33' * 20)
+        self.other_profile.save(update_fields=['wallet_address'])
+        self.other_profile.refresh_from_db()
+        self.assertEqual(self.other_profile.wallet_address, '0x' + '33' * 20)
+
+        # Stored as the raw bytes, not the hex text
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT octet_length(order_id) FROM marketplace_order WHERE id = %s", [order.pk])
+            self.assertEqual(cursor.fetchone()[0], 32)
+
+    def test_lookups(self):
+        order = make_order(self.listings[0], self.buyer)
+        self.assertEqual(Order.objects.get(order_id=order.order_id.upper()).pk, order.pk)
+        self.assertEqual(Order.objects.get(order_id=order.order_id[2:]).pk, order.pk)
+        self.assertTrue(Order.objects.filter(order_id__in=[order.order_id, '0x' + '00' * 32]).exists())
+        self.assertEqual(list(Order.objects.filter(order_id__icontains=order.order_id[-12:].upper())), [order])
+        self.assertEqual(list(Order.objects.values_list('order_id', flat=True)), [order.order_id])
+        self.assertEqual(UserProfile.objects.get(wallet_address='0X' + '11' * 20).pk, self.seller_profile.pk)
+
+    def test_invalid_input(self):
+        field = Order._meta.get_field('order_id')
+        for value in ['0x1234', '0x' + 'zz' * 32, '0x' + 'ab' * 33, 42]:
+            with self.assertRaises(ValueError):
+                Order.objects.filter(order_id=value).exists()
+            with self.assertRaises(ValidationError):
+                field.clean(value, None)
+
+        self.other_profile.wallet_address = '0x' + '33' * 19
+        with self.assertRaises(ValidationError) as raised:
+            self.other_profile.full_clean()
+        self.assertIn('wallet_address', raised.exception.message_dict)
+
+
+class SellerStatsTests(MarketplaceTestCase):
+
+    def dispute_rate(self):
+        return UserProfile.objects.get(pk=self.seller_profile.pk).dispute_rate
+
+    def test_dispute_rate_counts_disputes_in_the_denominator(self):
+        completed = make_order(self.listings[0], self.buyer, status='paid')
+        reputation.complete_order(order_id=completed.order_id)
+        for n in range(1, 4):
+            order = make_order(self.listings[1], self.buyer, status='disputed', n=n)
+            Dispute.objects.create(order=order, initiator=self.buyer, reason='Not as described')
+        self.assertEqual(self.dispute_rate(), Decimal('75.00'))
+        # The repair pass derives the same value from the order and dispute tables
+        self.assertEqual(reputation.repair_seller_stats(), 0)
+
+    def test_dispute_rate_cannot_overflow(self):
+        # Disputes before any completed order, then far more disputes than completions
+        reputation.adjust_seller_stats(self.seller.id, disputes=2)
+        self.assertEqual(self.dispute_rate(), Decimal('100.00'))
+        reputation.adjust_seller_stats(self.seller.id, orders=1, disputes=10 ** 6)
+        self.assertEqual(self.dispute_rate(), Decimal('100.00'))
+
+    def test_dispute_rate_keeps_its_decimals(self):
+        reputation.adjust_seller_stats(self.seller.id, orders=6, disputes=1)
+        self.assertEqual(self.dispute_rate(), Decimal('14.29'))
+
+
+class ListingSerializerTests(MarketplaceTestCase):
+
+    def test_missing_profile_rates_zero(self):
+        seller = User.objects.create(username='no_profile')
+        listing = make_listing(seller)
+        data = ListingSerializer(listing).data
+        self.assertEqual((data['seller_rating'], data['seller_total_orders'], data['seller_dispute_rate']), (0.0, 0, 0.0))
+
+    async def test_lazy_profile_load_in_event_loop_fails_loudly(self):
+        listing = await Listing.objects.aget(id=self.listings[0].id)
+        with self.assertRaises(SynchronousOnlyOperation):
+            ListingSerializer().get_seller_rating(listing)
+
+
+class ResumableUploadTests(MarketplaceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp(prefix='blobs-')
+        self.addCleanup(shutil.rmtree, root, True)
+        overrides = self.settings(BLOB_STORE_ROOT=root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.client = self.token_client(self.seller, self.seller_profile)
+
+    def upload(self, data, chunk_size):
+        response = self.client.post(reverse('create_upload'), HTTP_UPLOAD_LENGTH=str(len(data)))
+        self.assertEqual(response.status_code, 201, response.content)
+        upload_id = response.json()['id']
+        for offset in range(0, len(data), chunk_size):
+            response = self.client.generic(
+                'PATCH', reverse('resumable_upload', args=[upload_id]), data[offset:offset + chunk_size],
+                content_type=uploads.CHUNK_CONTENT_TYPE, HTTP_UPLOAD_OFFSET=str(offset),
+            )
+            self.assertEqual(response.status_code, 204, response.content)
+        return upload_id
+
+    def finalize(self, upload_id):
+        return self.client.post(reverse('finalize_upload', args=[upload_id]))
+
+    def test_finalize_hashes_missed_chunks_before_locking_the_row(self):
+        data = bytes(range(256)) * 4096
+        upload_id = self.upload(data, 256 * 1024)
+        # As if the chunks had gone to other worker processes
+        uploads.hashers.clear()
+
+        checksum = uploads.checksum
+        with CaptureQueriesContext(connection) as queries:
+            def checksum_unlocked(upload):
+                self.assertFalse(any('FOR UPDATE' in query['sql'] for query in queries.captured_queries))
+                return checksum(upload)
+
+            with mock.patch.object(uploads, 'checksum', side_effect=checksum_unlocked) as spy:
+                response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(response.json()['sha256'], hashlib.sha256(data).hexdigest())
+
+        # A retry answers the same without touching the file again
+        with mock.patch.object(uploads, 'checksum') as spy:
+            self.assertEqual(self.finalize(upload_id).json(), response.json())
+        spy.assert_not_called()
+
+    def test_incomplete_upload_is_not_finalized(self):
+        data = b'x' * 1000
+        response = self.client.post(reverse('create_upload'), HTTP_UPLOAD_LENGTH=str(len(data) * 2))
+        upload_id = response.json()['id']
+        self.client.generic('PATCH', reverse('resumable_upload', args=[upload_id]), data,
+                            content_type=uploads.CHUNK_CONTENT_TYPE, HTTP_UPLOAD_OFFSET='0')
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], str(len(data)))
+
+
+class GoodsPrivacyTests(MarketplaceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp(prefix='blobs-')
+        self.addCleanup(shutil.rmtree, root, True)
+        overrides = self.settings(BLOB_STORE_ROOT=root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.seller_client = self.token_client(self.seller, self.seller_profile)
+
+    def upload(self, content, name):
+        file = io.BytesIO(content)
+        file.name = name
+        response = self.seller_client.post(reverse('upload_file'), {'file': file})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def assertPrivate(self, digest):
+        self.assertEqual(self.client.get(reverse('blob', args=[digest])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('blob_variant', args=[digest, 'w320.webp'])).status_code, 404)
+
+    def test_goods_are_not_served_publicly(self):
+        image = self.upload(png_bytes(), 'cover.png')
+        self.assertEqual(self.client.get(reverse('blob', args=[image['sha256']])).status_code, 200)
+
+        # The same image sold as goods, and a non-image upload
+        make_listing(self.seller, file_path=image['url'])
+        self.assertPrivate(image['sha256'])
+        archive = self.upload(b'PK\x03\x04 archive', 'goods.zip')
+        self.assertPrivate(archive['sha256'])
+
+    def test_other_sellers_cannot_hide_an_image(self):
+        image = self.upload(png_bytes(), 'cover.png')
+        make_listing(self.other, file_path=image['url'])
+        self.assertEqual(self.client.get(reverse('blob', args=[image['sha256']])).status_code, 200)
+
+        response = self.client.post(reverse('upload_file'), {'file': io.BytesIO(png_bytes((4, 4)))})
+        self.assertEqual(response.status_code, 401)
+
+    def test_download_token_does_not_reveal_the_blob(self):
+        content = b'the goods' * 1000
+        goods = self.upload(content, 'goods.bin')
+        listing = make_listing(self.seller, title='Goods', file_path=goods['url'])
+        order = make_order(listing, self.buyer, status='paid')
+
+        response = self.token_client(self.buyer, self.buyer_profile).get(reverse('order_download', args=[order.order_id]))
+        self.assertEqual(response.status_code, 200, response.content)
+        url = response.json()['url']
+        token = url.rstrip('/').rsplit('/', 1)[-1]
+        for part in token.split(':'):
+            decoded = base64.urlsafe_b64decode(part + '=' * (-len(part) % 4))
+            self.assertNotIn(goods['sha256'].encode(), decoded)
+            self.assertNotIn(bytes.fromhex(goods['sha256']), decoded)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        async def body():
+            return b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(async_to_sync(body)(), content)
+
+        forged = token[:5] + ('A' if token[5] != 'A' else 'B') + token[6:]
+        self.assertEqual(self.client.get(reverse('download', args=[forged])).status_code, 404)
+
+
+@override_settings(IMAGE_VARIANT_WIDTHS=[320, 640, 1280])
+class ImageVariantTests(MarketplaceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp(prefix='blobs-')
+        self.addCleanup(shutil.rmtree, root, True)
+        overrides = self.settings(BLOB_STORE_ROOT=root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def upload_photo(self):
+        """A 1000x500 JPEG shot sideways (EXIF orientation 6) with a camera model in its metadata."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x0110] = 'Test Camera'
+        buffer = io.BytesIO()
+        Image.new('RGB', (1000, 500), 'blue').save(buffer, 'JPEG', exif=exif)
+        file = io.BytesIO(buffer.getvalue())
+        file.name = 'photo.jpg'
+        response = self.token_client(self.seller, self.seller_profile).post(reverse('upload_file'), {'file': file})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_upload_queues_variants_that_a_worker_generates(self):
+        photo = self.upload_photo()
+        digest = photo['sha256']
+        # Until the worker runs, the variant URL serves the original briefly
+        response = self.client.get(reverse('blob_variant', args=[digest, 'w320.webp']))
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'image/jpeg'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+
+        [job] = jobs.claim(['media'], 'test-worker')
+        self.assertEqual(job['task'], 'media.generate_variants')
+        jobs.run(job, 'test-worker')
+
+        variants = {variant.name: variant for variant in ImageVariant.objects.filter(upload__sha256=digest)}
+        self.assertEqual(sorted(variants), ['w1280.jpg', 'w1280.webp', 'w320.jpg', 'w320.webp', 'w640.jpg', 'w640.webp'])
+        # Upright after the EXIF rotation, and never upscaled past the 500px-wide original
+        self.assertEqual((variants['w320.webp'].width, variants['w320.webp'].height), (320, 640))
+        self.assertEqual((variants['w1280.jpg'].width, variants['w1280.jpg'].height), (500, 1000))
+
+        response = self.client.get(reverse('blob_variant', args=[digest, 'w320.webp']))
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'image/webp'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        image = Image.open(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual((image.format, image.size), ('WEBP', (320, 640)))
+        self.assertEqual(dict(image.getexif()), {})
+
+    def test_not_an_image_fails_permanently(self):
+        UploadedFile.objects.create(sha256='ab' * 32, content_type='image/png')
+        with self.assertRaises(jobs.PermanentFailure):
+            tasks.generate_variants(sha256='ab' * 32)
+
+    def test_representation_points_at_variants(self):
+        photo = self.upload_photo()
+        listing = make_listing(self.seller, image_url=photo['url'])
+        data = self.client.get(reverse('listing_detail', args=[listing.id])).json()
+        self.assertEqual(data['thumbnail_url'], photo['url'] + 'w320.jpg')
+        self.assertEqual(data['srcset'], ', '.join(
+            f"{photo['url']}w{width}.webp {width}w" for width in (320, 640, 1280)
+        ))
+
+        # Images hosted elsewhere have no variants
+        data = self.client.get(reverse('listing_detail', args=[self.listings[0].id])).json()
+        self.assertEqual(data['thumbnail_url'], 'https://example.com/image.png')
+        self.assertIsNone(data['srcset'])
+
+
+class FastJSONRendererTests(SimpleTestCase):
+
+    def assertSameAsDRF(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_floats_match_stdlib(self):
+        for value in [1e16, -2e20, 1.7976931348623157e308, 1e-5, 1.5e-7, 5e-324, 1e-4, 0.1, 123.0, -0.0, 1e15]:
+            self.assertSameAsDRF({'value': value})
+            self.assertSameAsDRF([value, {'nested': [value]}])
+            self.assertSameAsDRF(value)
+
+    def test_common_payload(self):
+        self.assertSameAsDRF({
+            'price': Decimal('10.50'), 'rating': 4.75, 'order_id': '0x' + '1e' * 32, 'title': 'x,1e5',
+            'created_at': timezone.now(), 'tags': ['a\u2028b'], 'count': 2 ** 40,
+        })
+
+
+class RowPlanParityTests(MarketplaceTestCase):
+    """The .values() row plans and the DRF serializers put the same bytes on the wire."""
+
+    def setUp(self):
+        super().setUp()
+        UserProfile.objects.filter(pk=self.seller_profile.pk).update(
+            rating=Decimal('4.85'), total_ratings=7, total_orders=7, dispute_count=1, dispute_rate=Decimal('14.29'),
+        )
+        self.listing = make_listing(
+            self.seller, title='Café ☕ \u2028 "quoted"', price=Decimal('0.00000001'), image_url='',
+            file_path='/api/blobs/' + 'cd' * 32 + '/',
+        )
+        self.order = make_order(self.listing, self.buyer, status='paid')
+        Order.objects.filter(pk=self.order.pk).update(escrow_tx_hash='0x' + 'ef' * 32)
+
+    def assertSameBytes(self, client, view_class, url, params=None):
+        """GET ``url`` with and without ``render_from_values``; the row plan must actually be used."""
+        bodies = []
+        for render_from_values in (True, False):
+            self.clear_listing_cache()
+            with mock.patch.object(view_class, 'render_from_values', render_from_values), \
+                    mock.patch.object(RowPlan, 'render', autospec=True, side_effect=RowPlan.render) as render, \
+                    mock.patch.object(RowPlan, 'render_many', autospec=True, side_effect=RowPlan.render_many) as render_many:
+                response = client.get(url, params or {})
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(render.called or render_many.called, render_from_values, (url, params))
+            bodies.append(response.content)
+        self.assertEqual(bodies[0], bodies[1], (url, params))
+
+    def test_listing_feed(self):
+        for params in [{}, {'fields': 'card'}, {'cursor': ''}, {'cursor': '', 'fields': 'id,title,price,created_at'}]:
+            self.assertSameBytes(self.client, ListingsView, reverse('listings'), params)
+
+    def test_listing_detail(self):
+        for params in [{}, {'fields': 'card'}]:
+            self.assertSameBytes(self.client, ListingDetailView, reverse('listing_detail', args=[self.listing.id]), params)
+
+    def test_order_detail(self):
+        client = self.token_client(self.buyer, self.buyer_profile)
+        self.assertSameBytes(client, OrderDetailView, reverse('order_detail', args=[self.order.order_id]))
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTests(MarketplaceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create(username='staff', is_staff=True)
+        self.client.force_authenticate(self.staff)
+
+    def export(self, name, params=None):
+        response = self.client.get(reverse(f'export_{name}'), params or {})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        async def chunks():
+            return [chunk async for chunk in response.streaming_content]
+        return async_to_sync(chunks)()
+
+    def test_ndjson_rows_stream_in_chunks_oldest_change_first(self):
+        Listing.objects.filter(id=self.listings[0].id).update(updated_at=timezone.now() + timedelta(minutes=1))
+        chunks = self.export('listings')
+        # Three listings, two rows per chunk
+        self.assertEqual(len(chunks), 2)
+        rows = [json.loads(line) for line in b''.join(chunks).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.listings[1].id, self.listings[2].id, self.listings[0].id])
+        self.assertEqual(rows[0]['price'], '10.50000000')
+        self.assertEqual(rows[0]['token_address'], TOKEN_ADDRESS)
+
+        since = Listing.objects.get(id=self.listings[0].id).updated_at
+        rows = b''.join(self.export('listings', {'since': since.isoformat()})).splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in rows], [self.listings[0].id])
+
+    def test_csv_has_a_header_and_one_line_per_row(self):
+        order = make_order(self.listings[0], self.buyer, status='paid')
+        lines = b''.join(self.export('orders', {'format': 'csv'})).decode().splitlines()
+        self.assertEqual(lines[0].split(','), exports.EXPORTS['orders']['columns'])
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f'{order.id},{order.order_id},'))
+
+    def test_staff_only(self):
+        response = self.token_client(self.seller, self.seller_profile).get(reverse('export_listings'))
+        self.assertEqual(response.status_code, 403)
+
+
+class ExportCursorTests(TransactionTestCase):
+    """Outside TestCase's wrapping transaction, to see the one export_chunks opens."""
+
+    def test_server_side_cursor_stays_inside_the_transaction(self):
+        seller, _ = make_user('seller', 1001)
+        for n in range(5):
+            make_listing(seller, title=f'Listing {n}')
+        self.assertTrue(connection.get_autocommit())
+
+        queryset = exports.export_queryset('listings')
+        chunks = exports.export_chunks('listings', queryset, NDJSONRenderer(), chunk_size=2)
+        self.assertEqual(len(next(chunks).splitlines()), 2)
+
+        # Mid-export: a transaction is open and its cursor is not WITH HOLD, so
+        # Postgres streams the scan instead of materializing the result first
+        self.assertTrue(connection.in_atomic_block)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT is_holdable FROM pg_cursors")
+            self.assertEqual(cursor.fetchall(), [(False,)])
+
+        self.assertEqual(sum(len(chunk.splitlines()) for chunk in chunks), 3)
+        self.assertFalse(connection.in_atomic_block)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM pg_cursors")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+
+class JobQueueTests(MarketplaceTestCase):
+
+    def abandon(self, attempts, max_attempts=3):
+        """A running job whose worker died long ago."""
+        return Job.objects.create(
+            task='media.generate_variants', queue='media', args={'sha256': '0' * 64}, status='running',
+            attempts=attempts, max_attempts=max_attempts, locked_by='dead-worker',
+            locked_at=timezone.now() - timedelta(seconds=settings.JOB_LEASE_SECONDS + 60),
+        )
+
+    def test_expired_lease_is_reclaimed_while_attempts_remain(self):
+        job = self.abandon(attempts=1)
+        claimed = jobs.claim(['media'], 'worker', limit=5)
+        self.assertEqual([row['id'] for row in claimed], [job.id])
+        self.assertEqual(claimed[0]['attempts'], 2)
+
+    def test_job_that_kills_its_worker_on_the_last_attempt_fails(self):
+        job = self.abandon(attempts=3)
+        self.assertEqual(jobs.claim(['media'], 'worker', limit=5), [])
+        with self.assertLogs('marketplace.jobs', 'ERROR'):
+            self.assertEqual(jobs.fail_abandoned(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('failed', 3, None))
+        self.assertIn('lease', job.last_error)
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Local HTTP server answering GETs with ``self.respond()``; counts the requests it served."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.hits = 0
+        self.delay = 0
+        self.status = 200
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/'
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def respond(self, handler, body):
+        """``(status, headers, body bytes)``"""
+        raise NotImplementedError
+
+    def count(self):
+        with self._lock:
+            self.hits += 1
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.handle_request(None)
+
+    def do_POST(self):
+        self.handle_request(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+
+    def handle_request(self, body):
+        self.server.count()
+        time.sleep(self.server.delay)
+        status, headers, payload = self.server.respond(self, body)
+        self.send_response(status)
+        for name, value in {'Content-Type': 'application/json', **headers}.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class JWKSStandIn(StandInServer):
+    """Serves the public halves of ``self.keys`` ({kid: private key}) as a JWKS."""
+
+    def __init__(self, max_age=300):
+        super().__init__()
+        self.max_age = max_age
+        self.keys = {}
+
+    def add_key(self, kid):
+        public, private = rsa.newkeys(1024)
+        self.keys[kid] = (public, private)
+        return private
+
+    def jwk(self, kid):
+        public, _ = self.keys[kid]
+        key = jwk.construct(public.save_pkcs1().decode(), 'RS256').to_dict()
+        return {**{name: value.decode() if isinstance(value, bytes) else value for name, value in key.items()}, 'kid': kid}
+
+    def respond(self, handler, body):
+        if self.status != 200:
+            return self.status, {}, b'{"error": "unavailable"}'
+        payload = json.dumps({'keys': [self.jwk(kid) for kid in self.keys]}).encode()
+        return 200, {'Cache-Control': f'public, max-age={self.max_age}'}, payload
+
+    def sign(self, kid, **claims):
+        _, private = self.keys[kid]
+        claims = {
+            'sub': 'did:privy:test', 'aud': settings.PRIVY_APP_ID, 'iss': settings.PRIVY_ISSUER,
+            'exp': int(time.time()) + 3600, **claims,
+        }
+        return jwt.encode(claims, private.save_pkcs1().decode(), algorithm='RS256', headers={'kid': kid})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class JWKSCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.server = JWKSStandIn()
+        self.addCleanup(self.server.stop)
+        self.server.add_key('k1')
+
+    def make_cache(self, **options):
+        return jwks.JWKSCache(self.server.url, **{'min_refresh_interval': 0, 'fetch_timeout': 2, **options})
+
+    def test_keys_are_cached_for_max_age(self):
+        cache = self.make_cache()
+        self.assertEqual(cache.get_key('k1')['kid'], 'k1')
+        cache.get_key('k1')
+        # A second process finds the keys in the shared cache
+        self.make_cache().get_key('k1')
+        self.assertEqual(self.server.hits, 1)
+
+    def test_single_flight_refresh(self):
+        self.server.delay = 0.3
+        # Separate instances stand for separate worker processes sharing the cache
+        instances = [self.make_cache() for _ in range(4)]
+        with ThreadPoolExecutor(16) as pool:
+            keys = list(pool.map(lambda n: instances[n % 4].get_key('k1'), range(16)))
+        self.assertTrue(all(key['kid'] == 'k1' for key in keys))
+        self.assertEqual(self.server.hits, 1)
+
+    async def test_single_flight_refresh_async(self):
+        self.server.delay = 0.3
+        cache = self.make_cache()
+        keys = await asyncio.gather(*(cache.aget_key('k1') for _ in range(16)))
+        self.assertTrue(all(key['kid'] == 'k1' for key in keys))
+        self.assertEqual(self.server.hits, 1)
+
+    def test_serves_stale_keys_when_endpoint_fails(self):
+        self.server.max_age = 0
+        cache = self.make_cache(min_refresh_interval=60)
+        cache.get_key('k1')
+
+        self.server.status = 503
+        with self.assertLogs('marketplace.jwks', 'WARNING'):
+            self.assertEqual(cache.get_key('k1')['kid'], 'k1')
+        # Backs off instead of hitting the failing endpoint on every request
+        cache.get_key('k1')
+        self.assertEqual(self.server.hits, 2)
+
+    async def test_serves_stale_keys_when_endpoint_fails_async(self):
+        self.server.max_age = 0
+        cache = self.make_cache()
+        await cache.aget_key('k1')
+
+        self.server.status = 503
+        with self.assertLogs('marketplace.jwks', 'WARNING'):
+            self.assertEqual((await cache.aget_key('k1'))['kid'], 'k1')
+
+    def test_unavailable_without_stale_keys(self):
+        self.server.status = 503
+        with self.assertLogs('marketplace.jwks', 'WARNING'), self.assertRaises(jwks.JWKSUnavailable):
+            self.make_cache().get_key('k1')
+
+    def test_stale_keys_expire_after_max_stale(self):
+        self.server.max_age = 0
+        cache = self.make_cache(max_stale=0)
+        cache.get_key('k1')
+        self.server.status = 503
+        with self.assertLogs('marketplace.jwks', 'WARNING'), self.assertRaises(jwks.JWKSUnavailable):
+            cache.get_key('k1')
+
+    def test_key_rotation(self):
+        cache = self.make_cache(min_refresh_interval=0.5)
+        cache.get_key('k1')
+
+        # The cached set is fresh, but a token signed with a new kid refreshes it once...
+        self.server.add_key('k2')
+        time.sleep(0.6)
+        self.assertEqual(cache.get_key('k2')['kid'], 'k2')
+        self.assertEqual(self.server.hits, 2)
+
+        # ...and unknown kids do not refetch again within min_refresh_interval
+        with self.assertRaises(jwt.JWTError):
+            cache.get_key('k3')
+        self.assertEqual(self.server.hits, 2)
+
+        # Retired keys are gone after the refresh that brings their successor
+        del self.server.keys['k1']
+        self.server.add_key('k3')
+        time.sleep(0.6)
+        self.assertEqual(cache.get_key('k3')['kid'], 'k3')
+        with self.assertRaises(jwt.JWTError):
+            cache.get_key('k1')
+        self.assertEqual(self.server.hits, 3)
+
+    def test_verify_privy_token(self):
+        token = self.server.sign('k1')
+        with mock.patch.object(jwks, 'privy_jwks', self.make_cache()):
+            self.assertEqual(jwks.verify_privy_token(token)['sub'], 'did:privy:test')
+            # Verified tokens are cached until exp: no second key lookup
+            self.server.status = 503
+            caches['default'].delete(jwks.privy_jwks.cache_key)
+            jwks.privy_jwks._entry = None
+            self.assertEqual(jwks.verify_privy_token(token)['sub'], 'did:privy:test')
+        self.assertEqual(self.server.hits, 1)
+
+    async def test_averify_privy_token_rejects_other_audience(self):
+        token = self.server.sign('k1', aud='someone-else')
+        with mock.patch.object(jwks, 'privy_jwks', self.make_cache()):
+            with self.assertRaises(jwt.JWTError):
+                await jwks.averify_privy_token(token)
+
+
+class JsonRpcNodeStandIn(StandInServer):
+    """
+    Local Ethereum JSON-RPC node with just what the escrow backend and indexer
+    call: blocks are appended with ``mine(logs)``, and operator transactions
+    are recorded in ``transactions`` instead of being executed.
+    """
+
+    def __init__(self, contract):
+        super().__init__()
+        self.contract = contract
+        self.blocks = [{'hash': '0x' + '00' * 32, 'logs': []}]
+        self.transactions = []
+
+    def mine(self, *events):
+        """Append a block holding ``(signature, order_id, *args)`` escrow events; returns its number."""
+        number = len(self.blocks)
+        block_hash = '0x' + f'{number:064x}'
+        logs = []
+        for log_index, (signature, order_id, *args) in enumerate(events):
+            logs.append({
+                'address': self.contract,
+                'topics': [event_topic(signature), order_id],
+                'data': '0x' + encode_args(signature_types(signature)[1:], args).hex(),
+                'blockNumber': hex(number),
+                'blockHash': block_hash,
+                'logIndex': hex(log_index),
+                'transactionHash': '0x' + f'{number:032x}{log_index:032x}',
+            })
+        self.blocks.append({'hash': block_hash, 'logs': logs})
+        return number
+
+    def respond(self, handler, body):
+        replies = [{'jsonrpc': '2.0', 'id': call['id'], 'result': self.result(call['method'], call['params'])}
+                   for call in json.loads(body)]
+        return 200, {}, json.dumps(replies).encode()
+
+    def result(self, method, params):
+        if method == 'eth_blockNumber':
+            return hex(len(self.blocks) - 1)
+        if method == 'eth_getBlockByNumber':
+            number = int(params[0], 16)
+            return {'hash': self.blocks[number]['hash']} if number < len(self.blocks) else None
+        if method == 'eth_getLogs':
+            query = params[0]
+            topics = set(query['topics'][0])
+            return [
+                log
+                for block in self.blocks[int(query['fromBlock'], 16):int(query['toBlock'], 16) + 1]
+                for log in block['logs']
+                if log['topics'][0] in topics
+            ]
+        if method == 'eth_sendTransaction':
+            self.transactions.append(params[0])
+            return '0x' + f'{len(self.transactions):064x}'
+        raise AssertionError(f'Unexpected RPC method {method}')
+
+
+class EscrowIndexerTests(MarketplaceTestCase):
+    contract = '0x' + '33' * 20
+    operator = '0x' + '44' * 20
+
+    def setUp(self):
+        super().setUp()
+        self.node = JsonRpcNodeStandIn(self.contract)
+        self.addCleanup(self.node.stop)
+        overrides = self.settings(
+            ESCROW_BACKEND='marketplace.escrow.JsonRpcEscrowBackend', ESCROW_RPC_URL=self.node.url,
+            ESCROW_CONTRACT_ADDRESS=self.contract, ESCROW_OPERATOR_ADDRESS=self.operator,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        escrow_backend.cache_clear()
+        self.addCleanup(escrow_backend.cache_clear)
+        self.order = make_order(self.listings[0], self.buyer)
+
+    def index(self):
+        return EscrowIndexer(start_block=1, reorg_depth=4).run_once()
+
+    def run_escrow_jobs(self):
+        claimed = jobs.claim(['escrow'], 'test-worker', limit=10)
+        for job in claimed:
+            self.assertTrue(jobs.run(job, 'test-worker'), job)
+        return claimed
+
+    def test_confirmed_order_releases_funds(self):
+        order_id = self.order.order_id
+        self.node.mine(('Deposited(bytes32,address,uint256)', order_id, self.buyer_profile.wallet_address, 10 ** 7))
+        self.index()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'paid')
+
+        # The buyer's wallet confirms on chain; the API only waits for the event
+        response = self.token_client(self.buyer, self.buyer_profile).post(reverse('confirm_delivery', args=[order_id]))
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertFalse(Job.objects.filter(task='escrow.release_funds').exists())
+
+        self.node.mine(('DeliveryConfirmed(bytes32,address)', order_id, self.buyer_profile.wallet_address))
+        self.index()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'confirmed')
+        self.assertEqual(list(Job.objects.values_list('task', 'args')),
+                         [('escrow.release_funds', {'order_id': order_id})])
+
+        self.run_escrow_jobs()
+        self.assertEqual(self.node.transactions, [{
+            'from': self.operator, 'to': self.contract, 'data': encode_call(RELEASE_FUNDS, order_id),
+        }])
+
+        self.node.mine(('FundsReleased(bytes32)', order_id))
+        self.index()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'completed')
+        self.seller_profile.refresh_from_db()
+        self.assertEqual(self.seller_profile.total_orders, 1)
+        # Nothing new to release, and re-indexing the same head queues nothing
+        self.assertEqual(self.run_escrow_jobs(), [])
+        self.index()
+        self.assertEqual(Job.objects.filter(task='escrow.release_funds').count(), 1)
+
+    def test_release_is_queued_with_the_confirmed_status(self):
+        order_id = self.order.order_id
+        self.node.mine(
+            ('Deposited(bytes32,address,uint256)', order_id, self.buyer_profile.wallet_address, 10 ** 7),
+            ('DeliveryConfirmed(bytes32,address)', order_id, self.buyer_profile.wallet_address),
+        )
+        with mock.patch.object(Order.objects, 'bulk_update', side_effect=RuntimeError('database went away')):
+            with self.assertRaises(RuntimeError):
+                self.index()
+        self.assertFalse(Job.objects.exists())
+
+        self.index()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'confirmed')
+        self.assertEqual(Job.objects.filter(task='escrow.release_funds').count(), 1)
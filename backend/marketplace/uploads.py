@@ -0,0 +1,209 @@
+"""
+Resumable chunked uploads for large files (digital goods), after the tus 1.0 core protocol.
+
+    POST   /api/uploads/                Upload-Length, Upload-Metadata  -> 201, Location
+    HEAD   /api/uploads/<id>/           -> Upload-Offset, Upload-Length
+    PATCH  /api/uploads/<id>/           Upload-Offset, application/offset+octet-stream body
+    POST   /api/uploads/<id>/finalize/  -> the same response as /api/upload/
+    DELETE /api/uploads/<id>/           abandon
+
+Chunks are copied from the request stream to the upload's partial file in
+``COPY_BUFFER_SIZE`` pieces. The partial file's size is the upload offset: a
+client whose connection dropped asks HEAD where to continue. An exclusive
+``flock`` on the file serialises writers across threads and worker processes.
+
+Under ASGI, Django reads the whole request body before the view runs
+(into memory up to ``FILE_UPLOAD_MAX_MEMORY_SIZE``, then a temporary file),
+and a request whose client disconnects mid-body never reaches the view. A
+chunk is therefore stored whole or not at all, and after a drop the client
+resends it from the offset HEAD reports; ``UPLOAD_CHUNK_MAX_SIZE`` bounds
+both the spooled body and what a drop costs.
+
+The SHA-256 is computed while chunks are written. ``hashlib`` state cannot
+be persisted, so each process keeps the hashers of the uploads it is
+receiving; since bytes before the offset never change, finalize hashes only
+what this process missed, from disk and before it locks the upload's row.
+"""
+import base64
+import binascii
+import fcntl
+import hashlib
+import os
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+
+from .blobstore import blob_store
+from .resultcache import MISSING, LRUCache
+
+
+TUS_VERSION = '1.0.0'
+TUS_EXTENSIONS = 'creation,termination'
+CHUNK_CONTENT_TYPE = 'application/offset+octet-stream'
+COPY_BUFFER_SIZE = 256 * 1024
+
+# upload id -> (bytes hashed, hasher), for uploads this process has been receiving
+hashers = LRUCache(maxsize=1024)
+
+
+class UploadConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Upload-Offset does not match the bytes received so far.'
+    default_code = 'offset_mismatch'
+
+    def __init__(self, offset, detail=None):
+        super().__init__(detail)
+        self.offset = offset
+
+
+class UploadLocked(APIException):
+    status_code = status.HTTP_423_LOCKED
+    default_detail = 'Another request is writing to this upload.'
+    default_code = 'upload_locked'
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Upload is larger than allowed.'
+    default_code = 'too_large'
+
+
+def parse_metadata(header):
+    """``Upload-Metadata`` (``key base64value,key2 ...``) as a dict of strings."""
+    metadata = {}
+    for pair in filter(None, (item.strip() for item in (header or '').split(','))):
+        key, _, value = pair.partition(' ')
+        try:
+            metadata[key] = base64.b64decode(value, validate=True).decode() if value else ''
+        except (binascii.Error, UnicodeDecodeError):
+            raise ValidationError({'Upload-Metadata': f'Value of {key!r} is not base64-encoded UTF-8.'})
+    return metadata
+
+
+def parse_size_header(name, value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        size = -1
+    if size < 0:
+        raise ValidationError({name: 'A non-negative integer is required.'})
+    return size
+
+
+def start(upload):
+    """Create the empty partial file for a new ``ChunkedUpload``."""
+    path = blob_store.partial_path(upload.id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+
+
+def received(upload):
+    """Bytes of ``upload`` on disk: the offset the next chunk must start at."""
+    if upload.completed_at is not None:
+        return upload.length
+    try:
+        return blob_store.partial_path(upload.id).stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+@contextmanager
+def locked(upload):
+    """The partial file, opened exclusively; raises ``UploadLocked`` while another request has it."""
+    try:
+        part = open(blob_store.partial_path(upload.id), 'r+b')
+    except FileNotFoundError:
+        raise NotFound('The data of this upload is gone; start a new upload.')
+    with part:
+        try:
+            fcntl.flock(part.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadLocked()
+        yield part
+
+
+def append_chunk(upload, offset, stream, content_length):
+    """
+    Copy ``content_length`` bytes from ``stream`` to the end of the upload,
+    which must currently hold exactly ``offset`` bytes. Returns the new offset;
+    when the stream ends early, what arrived is kept.
+    """
+    if content_length > settings.UPLOAD_CHUNK_MAX_SIZE:
+        raise UploadTooLarge(f'Chunks are limited to {settings.UPLOAD_CHUNK_MAX_SIZE} bytes.')
+    if offset + content_length > upload.length:
+        raise UploadTooLarge('Chunk goes past Upload-Length.')
+
+    with locked(upload) as part:
+        current = part.seek(0, os.SEEK_END)
+        if current != offset:
+            raise UploadConflict(current)
+
+        hashed, hasher = cached_hasher(upload.id)
+        if hashed != offset:
+            # Earlier chunks went to another process; finalize hashes them from disk
+            hasher = None
+        remaining = content_length
+        try:
+            while remaining:
+                data = stream.read(min(COPY_BUFFER_SIZE, remaining))
+                if not data:
+                    break
+                part.write(data)
+                if hasher is not None:
+                    hasher.update(data)
+                    hashed += len(data)
+                remaining -= len(data)
+        finally:
+            part.flush()
+            current = part.tell()
+            if hasher is not None and hashed == current:
+                hashers.set(upload.id, (hashed, hasher), settings.UPLOAD_EXPIRY_HOURS * 3600)
+            else:
+                hashers.delete(upload.id)
+    return current
+
+
+def cached_hasher(upload_id):
+    """``(bytes hashed, hasher)`` this process holds for the upload, or a fresh hasher."""
+    cached = hashers.get(upload_id)
+    return (0, hashlib.sha256()) if cached is MISSING else cached
+
+
+def checksum(upload):
+    """
+    SHA-256 of a complete upload, hashing from disk whatever this process has
+    not seen; None when the partial file is gone because another request
+    finalized it. Raises ``UploadConflict`` while bytes are missing.
+    """
+    try:
+        with locked(upload) as part:
+            size = part.seek(0, os.SEEK_END)
+            if size != upload.length:
+                raise UploadConflict(size, f'Upload is incomplete: {size} of {upload.length} bytes received.')
+
+            hashed, hasher = cached_hasher(upload.id)
+            hasher = hasher.copy()
+            part.seek(hashed)
+            while data := part.read(COPY_BUFFER_SIZE):
+                hasher.update(data)
+    except NotFound:
+        return None
+    return hasher.hexdigest()
+
+
+def finish(upload, digest):
+    """Move the complete file, whose ``checksum`` is ``digest``, into the blob store."""
+    with locked(upload):
+        blob_store.adopt(blob_store.partial_path(upload.id), digest)
+    hashers.delete(upload.id)
+
+
+def discard(upload):
+    """Remove the partial file of an abandoned upload."""
+    hashers.delete(upload.id)
+    try:
+        os.unlink(blob_store.partial_path(upload.id))
+    except FileNotFoundError:
+        pass
@@ -1,5 +1,20 @@
-from django.urls import path
+from django.urls import path, register_converter
 from . import views
+from .fields import normalize_hex
+
+
+class Bytes32Converter:
+    """bytes32 hex in any case, with or without 0x; anything else 404s before reaching a view."""
+    regex = '(?:0[xX])?[0-9a-fA-F]{64}'
+
+    def to_python(self, value):
+        return normalize_hex(value, 32)
+
+    def to_url(self, value):
+        return value
+
+
+register_converter(Bytes32Converter, 'bytes32')
 
 urlpatterns = [
     # Auth
@@ -8,15 +23,29 @@ urlpatterns = [
     
     # Listings
     path('listings/', views.ListingsView.as_view(), name='listings'),
+    path('listings/bulk/', views.BulkListingsView.as_view(), name='bulk_listings'),
     path('listings/<int:pk>/', views.ListingDetailView.as_view(), name='listing_detail'),
     path('listings/<int:listing_id>/delete/', views.DeleteListingView.as_view(), name='delete_listing'),
     
     # Orders
     path('orders/', views.CreateOrderView.as_view(), name='create_order'),
-    path('orders/<str:order_id>/', views.OrderDetailView.as_view(), name='order_detail'),
-    path('orders/<str:order_id>/deposit/', views.MockDepositView.as_view(), name='mock_deposit'),
-    path('orders/<str:order_id>/confirm/', views.ConfirmDeliveryView.as_view(), name='confirm_delivery'),
+    path('orders/purchases/', views.OrderHistoryView.as_view(party='buyer'), name='order_purchases'),
+    path('orders/sales/', views.OrderHistoryView.as_view(party='seller'), name='order_sales'),
+    path('orders/<bytes32:order_id>/', views.OrderDetailView.as_view(), name='order_detail'),
+    path('orders/<bytes32:order_id>/deposit/', views.MockDepositView.as_view(), name='mock_deposit'),
+    path('orders/<bytes32:order_id>/confirm/', views.ConfirmDeliveryView.as_view(), name='confirm_delivery'),
+    path('orders/<bytes32:order_id>/download/', views.OrderDownloadView.as_view(), name='order_download'),
+    path('downloads/<str:token>/', views.DownloadView.as_view(), name='download'),
+    
+    # Exports (staff only)
+    path('exports/listings/', views.ExportView.as_view(export='listings'), name='export_listings'),
+    path('exports/orders/', views.ExportView.as_view(export='orders'), name='export_orders'),
     
     # File upload
     path('upload/', views.UploadFileView.as_view(), name='upload_file'),
+    path('uploads/', views.CreateUploadView.as_view(), name='create_upload'),
+    path('uploads/<uuid:upload_id>/', views.ResumableUploadView.as_view(), name='resumable_upload'),
+    path('uploads/<uuid:upload_id>/finalize/', views.FinalizeUploadView.as_view(), name='finalize_upload'),
+    path('blobs/<str:digest>/', views.BlobView.as_view(), name='blob'),
+    path('blobs/<str:digest>/<str:variant>', views.BlobVariantView.as_view(), name='blob_variant'),
 ]
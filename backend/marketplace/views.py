@@ -1,82 +1,114 @@
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.http import content_disposition_header, http_date
+from django.utils.text import slugify
 from django.contrib.auth.models import User
-from rest_framework import generics, status, mixins
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from rest_framework import status, mixins, serializers
+from rest_framework.exceptions import NotFound, UnsupportedMediaType
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.views import APIView
-from rest_framework.generics import CreateAPIView
+from adrf.generics import GenericAPIView as AsyncGenericAPIView
+from adrf.views import APIView as AsyncAPIView
+from asgiref.sync import sync_to_async
+from django_filters.rest_framework import DjangoFilterBackend
 import hashlib
-import base64
-from .models import UserProfile, Listing, Order, Dispute, MockSmartContract, UploadedFile
+import json
+from datetime import timedelta
+from .models import UserProfile, Listing, Order, Dispute, UploadedFile, ChunkedUpload
 from .serializers import (
     UserProfileSerializer, ListingSerializer, CreateListingSerializer,
     OrderSerializer, CreateOrderSerializer, DisputeSerializer,
     TelegramAuthSerializer, DepositSerializer, UploadFileSerializer,
-    PrivyAuthLinkSerializer
+    PrivyAuthLinkSerializer, REPRESENTATION_VERSION
 )
-from .filters import ListingFilter
+from .filters import ListingFilter, ListingSearchFilter, ListingOrderingFilter, OrderHistoryFilter
+from .blobstore import blob_store, blob_url
+from .exports import aiter_chunks, export_chunks, export_queryset
+from .media import VARIANT_FORMATS, parse_variant
+from .renderers import CSVRenderer, NDJSONRenderer
+from .pagination import ListingCursorPagination, OrderHistoryPagination
+from .authentication import issue_session_token
+from .resultcache import listing_cache, listing_version, query_signature
+from .reputation import complete_order
+from .jobs import enqueue
+from .escrow import escrow_backend
+from .chain import RPCError
+from . import catalog, downloads, uploads
 
 
-class TelegramAuthView(APIView):
-    """Exchange Telegram login for JWT"""
+def telegram_account(telegram_id, username, first_name=''):
+    """
+    Return the user and profile for a verified Telegram id, creating both on first login.
+
+    The account is found by ``telegram_id`` only; the Telegram username just
+    names a new account, falling back to ``user_<id>`` when another user has it.
+    """
+    profile = UserProfile.objects.select_related('user').filter(telegram_id=telegram_id).first()
+    if profile is not None:
+        return profile.user, profile
+    if User.objects.filter(username=username).exists():
+        username = f'user_{telegram_id}'
+    try:
+        with transaction.atomic():
+            user = User.objects.create(username=username, first_name=first_name)
+            profile = UserProfile.objects.create(user=user, telegram_id=telegram_id)
+    except IntegrityError:
+        # A concurrent first login for the same Telegram id won
+        profile = UserProfile.objects.select_related('user').get(telegram_id=telegram_id)
+    return profile.user, profile
+
+
+class TelegramAuthView(AsyncAPIView):
+    """Exchange signed Telegram Mini App initData for a session token"""
+    query_budget = 8
     
-    def post(self, request):
+    async def post(self, request):
         serializer = TelegramAuthSerializer(data=request.data)
         if serializer.is_valid():
-            telegram_id = serializer.validated_data['telegram_id']
-            username = serializer.validated_data.get('username', f'user_{telegram_id}')
-            
-            # Get or create user
-            user, created = User.objects.get_or_create(
-                username=username,
-                defaults={'first_name': serializer.validated_data.get('first_name', '')}
-            )
-            
-            # Get or create profile
-            profile, _ = UserProfile.objects.get_or_create(
-                user=user,
-                defaults={'telegram_id': telegram_id}
-            )
+            user, profile = await sync_to_async(telegram_account)(**serializer.validated_data)
             
             return Response({
                 'success': True,
                 'user_id': user.id,
                 'username': user.username,
-                'telegram_id': profile.telegram_id
+                'telegram_id': profile.telegram_id,
+                'token': issue_session_token(user, profile)
             }, status=status.HTTP_200_OK)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class PrivyAuthView(APIView):
+class PrivyAuthView(AsyncAPIView):
     """Verify Privy ID token, upsert user, and link privy_user_id to telegram_id."""
+    query_budget = 9
 
-    def post(self, request):
+    async def post(self, request):
         # Expect Authorization: Bearer <idToken> and optional telegram_id in body
         auth_header = request.headers.get('Authorization', '')
         if not auth_header.startswith('Bearer '):
             return Response({'detail': 'Missing Bearer token'}, status=status.HTTP_401_UNAUTHORIZED)
         id_token = auth_header.split(' ', 1)[1].strip()
 
-        # Verify JWT via Privy JWKS
+        # Verify JWT via the cached Privy JWKS
         try:
-            import requests
-            from jose import jwt
+            from .jwks import JWKSUnavailable, averify_privy_token
         except Exception:
             return Response({'detail': 'Server missing JWT dependencies'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        PRIVY_ISS = "https://auth.privy.io"
-        PRIVY_AUD = 'cmg42qhmu00voju0dwcn90l35'
         try:
-            jwks = requests.get(f"{PRIVY_ISS}/.well-known/jwks.json", timeout=5).json()
-            claims = jwt.decode(
-                id_token,
-                jwks,
-                algorithms=['RS256', 'ES256'],
-                audience=PRIVY_AUD,
-                issuer=PRIVY_ISS,
-                options={'verify_aud': True, 'verify_iss': True}
-            )
+            # A JWKS refresh awaits the pooled async client instead of holding a worker thread
+            claims = await averify_privy_token(id_token)
+        except JWKSUnavailable as e:
+            return Response({'detail': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
             return Response({'detail': f'Invalid token: {str(e)}'}, status=status.HTTP_401_UNAUTHORIZED)
 
@@ -84,83 +116,204 @@ class PrivyAuthView(APIView):
         email = claims.get('email')
         phone = claims.get('phone_number')
 
+        # Linking to a Telegram account takes the same signed initData as /auth/telegram/
         serializer = PrivyAuthLinkSerializer(data=request.data)
-        serializer.is_valid(raise_exception=False)
-        telegram_id = serializer.validated_data.get('telegram_id') if serializer.validated_data else None
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        if telegram_id:
-            user, _ = User.objects.get_or_create(
-                username=f'user_{telegram_id}'
-            )
-            profile, _ = UserProfile.objects.get_or_create(
-                user=user,
-                defaults={'telegram_id': telegram_id}
-            )
-            if profile.telegram_id != telegram_id:
-                profile.telegram_id = telegram_id
+        if 'telegram_id' in serializer.validated_data:
+            user, profile = await sync_to_async(telegram_account)(**serializer.validated_data)
         else:
             base_username = email or phone or privy_user_id
-            user, _ = User.objects.get_or_create(
+            user, _ = await User.objects.aget_or_create(
                 username=str(base_username)
             )
-            profile, _ = UserProfile.objects.get_or_create(
+            profile, _ = await UserProfile.objects.aget_or_create(
                 user=user,
                 defaults={'telegram_id': 0}
             )
 
         profile.privy_user_id = privy_user_id
-        profile.save()
+        await profile.asave()
 
         return Response({
             'success': True,
             'user_id': user.id,
             'privy_user_id': privy_user_id,
             'telegram_id': profile.telegram_id,
+            'token': issue_session_token(user, profile),
         }, status=status.HTTP_200_OK)
 
 
-class ListingsView(generics.ListCreateAPIView):
+class ProjectedQuerysetMixin:
+    """Load only the columns and relations the (sparse) read serializer renders."""
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method != 'GET':
+            return queryset
+        return self.get_serializer().project_queryset(queryset)
+
+
+class ConditionalRetrieveMixin:
+    """
+    Strong ETag / Last-Modified for detail views.
+
+    The validators come from a single indexed lookup of ``version_fields``
+    (timestamps of the object and anything it embeds, including the seller
+    profile behind the rating fields), the serializer version and the
+    requested fieldset, so ``If-None-Match`` and ``If-Modified-Since`` are
+    answered with a 304 before the object is loaded or serialized. Once the
+    ``expiry_field`` timestamp has passed (``is_expired`` flips without a
+    save) it counts as a version too.
+    """
+    version_fields = ['updated_at']
+    expiry_field = None
+    # Render from one .values() row when the serializer supports it
+    render_from_values = False
+    
+    async def get(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        fields = self.version_fields + ([self.expiry_field] if self.expiry_field else [])
+        row = await (
+            self.queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            .values_list(*fields)
+            .afirst()
+        )
+        if row is None:
+            raise Http404
+        
+        versions = list(row[:len(self.version_fields)])
+        if self.expiry_field:
+            expires_at = row[-1]
+            if expires_at is not None and timezone.now() > expires_at:
+                versions.append(expires_at)
+        last_modified = max(timestamp for timestamp in versions if timestamp is not None)
+        signature = json.dumps([
+            REPRESENTATION_VERSION,
+            [timestamp.isoformat() if timestamp else None for timestamp in versions],
+            request.query_params.get('fields'),
+            request.query_params.get('expand'),
+        ])
+        etag = '"%s"' % hashlib.sha256(signature.encode()).hexdigest()[:32]
+        
+        response = get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+        if response is None:
+            response = Response(await self.aget_representation())
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+        response['Cache-Control'] = 'no-cache'
+        return response
+    
+    async def aget_representation(self):
+        plan = self.get_serializer().get_row_plan() if self.render_from_values else None
+        if plan is None:
+            # The projected queryset joins everything the serializer reads,
+            # so rendering does not touch the database again
+            instance = await self.aget_object()
+            return self.get_serializer(instance).data
+        
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = await (
+            self.filter_queryset(self.get_queryset())
+            .filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            .values(*plan.columns)
+            .afirst()
+        )
+        if row is None:
+            raise Http404
+        return plan.render(row)
+
+
+class ListingsView(ProjectedQuerysetMixin, mixins.ListModelMixin, mixins.CreateModelMixin, AsyncGenericAPIView):
     """List all listings or create new listing"""
-    queryset = Listing.objects.filter(status='active', is_deleted=False)
+    queryset = Listing.objects.active()
     serializer_class = ListingSerializer
+    # The seller of a new listing is the session user
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    filter_backends = [DjangoFilterBackend, ListingSearchFilter, ListingOrderingFilter]
     filterset_class = ListingFilter
-    search_fields = ['title', 'description']
     ordering_fields = ['price', 'created_at', 'title']
     ordering = ['-created_at']
+    pagination_class = ListingCursorPagination
+    query_budget = 3
+    render_from_values = True
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return CreateListingSerializer
         return ListingSerializer
     
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # The paginated feed renders compact cards unless ?fields= asks otherwise
+        if self.paginator.cursor_query_param in self.request.query_params:
+            context['default_fields'] = 'card'
+        return context
+    
+    async def get(self, request, *args, **kwargs):
+        # Cache lookup, query and serialization are one synchronous unit; a
+        # single hop to the request's thread beats one per ORM call
+        return await sync_to_async(self.list)(request, *args, **kwargs)
+    
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(self.create)(request, *args, **kwargs)
+    
     def list(self, request, *args, **kwargs):
+        # Identical feed queries share one serialized result until any listing changes
+        key = f"listings:v{REPRESENTATION_VERSION}:{listing_version()}:{query_signature(request.query_params)}"
+        data = listing_cache.get_or_compute(key, self.get_list_data, settings.LISTING_CACHE_TTL)
+        return Response(data)
+    
+    def get_list_data(self):
         queryset = self.filter_queryset(self.get_queryset())
+        
+        # Feed rows skip model instances and per-field serializer calls when possible
+        plan = self.get_serializer().get_row_plan() if self.render_from_values else None
+        if plan is not None:
+            page = self.paginator.paginate_queryset(queryset, self.request, view=self, values=plan.columns)
+            if page is not None:
+                return self.get_paginated_response(plan.render_many(page)).data
+            return {'listings': plan.render_many(queryset.values(*plan.columns))}
+        
+        # Cursor mode is opt-in (?cursor=); plain requests keep the full array
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data).data
+        
         serializer = self.get_serializer(queryset, many=True)
-        return Response({'listings': serializer.data})
+        return {'listings': serializer.data}
 
 
-class ListingDetailView(generics.RetrieveAPIView):
+class ListingDetailView(ConditionalRetrieveMixin, ProjectedQuerysetMixin, AsyncGenericAPIView):
     """Get single listing details"""
     queryset = Listing.objects.filter(is_deleted=False)
     serializer_class = ListingSerializer
+    version_fields = ['updated_at', 'seller__userprofile__updated_at']
+    expiry_field = 'expires_at'
+    query_budget = 2
+    render_from_values = True
 
 
 class DeleteListingView(APIView):
     """Soft delete a listing (set is_deleted=True)"""
+    permission_classes = [IsAuthenticated]
+    query_budget = 2
     
     def delete(self, request, listing_id):
         try:
-            listing = get_object_or_404(Listing, id=listing_id, is_deleted=False)
+            listing = get_object_or_404(Listing.objects.only('id', 'seller_id'), id=listing_id, is_deleted=False)
             
             # Check if the user is the owner of the listing
-            if request.data.get('seller_id') != listing.seller.id:
+            if request.user.id != listing.seller_id:
                 return Response({
                     'error': 'You can only delete your own listings'
                 }, status=status.HTTP_403_FORBIDDEN)
             
             # Soft delete the listing
             listing.is_deleted = True
-            listing.save()
+            listing.save(update_fields=['is_deleted', 'updated_at'])
             
             return Response({
                 'success': True,
@@ -173,112 +326,292 @@ class DeleteListingView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CreateOrderView(generics.CreateAPIView):
+class BulkListingsView(APIView):
+    """
+    Catalog management for sellers, many listings per request.
+
+    POST ``{"listings": [...]}`` imports, PATCH ``{"listings": [{"id", "status"?, "price"?}]}``
+    updates and DELETE ``{"ids": [...]}`` soft-deletes. Valid items are applied
+    and the rest come back in ``errors`` with their index in the request.
+    Every item belongs to the session user; only their own listings are touched.
+    """
+    permission_classes = [IsAuthenticated]
+    query_budget = 3
+    
+    def post(self, request):
+        items = self.get_items(request, 'listings')
+        seller_id = request.user.id
+        
+        created, errors = catalog.create_listings(seller_id, items)
+        return Response({'created': created, 'errors': errors},
+                        status=status.HTTP_201_CREATED if created or not errors else status.HTTP_400_BAD_REQUEST)
+    
+    def patch(self, request):
+        items = self.get_items(request, 'listings')
+        seller_id = request.user.id
+        
+        updated, errors = catalog.update_listings(seller_id, items)
+        return Response({'updated': updated, 'errors': errors},
+                        status=status.HTTP_200_OK if updated or not errors else status.HTTP_400_BAD_REQUEST)
+    
+    def delete(self, request):
+        ids = self.get_items(request, 'ids')
+        seller_id = request.user.id
+        
+        deleted, errors = catalog.delete_listings(seller_id, ids)
+        return Response({'deleted': deleted, 'errors': errors},
+                        status=status.HTTP_200_OK if deleted or not errors else status.HTTP_400_BAD_REQUEST)
+    
+    def get_items(self, request, key):
+        items = request.data.get(key) if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            raise serializers.ValidationError({key: 'Expected a non-empty list.'})
+        if len(items) > settings.BULK_LISTING_MAX_ITEMS:
+            raise serializers.ValidationError({key: f'At most {settings.BULK_LISTING_MAX_ITEMS} items per request.'})
+        return items
+
+
+class CreateOrderView(AsyncGenericAPIView):
     """Create new order"""
     serializer_class = CreateOrderSerializer
+    # The buyer is the session user
+    permission_classes = [IsAuthenticated]
+    query_budget = 3
     
-    def create(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
-        if serializer.is_valid():
-            order = serializer.save()
-            
-            # Mock escrow creation
-            try:
-                wallet_address = order.seller.userprofile.wallet_address if hasattr(order.seller, 'userprofile') else None
-                escrow_success = MockSmartContract.create_escrow(
-                    order.order_id, wallet_address, order.token_address, order.amount, order.deadline
-                )
-            except:
-                escrow_success = True  # Mock always succeeds
+        if await sync_to_async(serializer.is_valid)():
+            order = await sync_to_async(self.create)(serializer)
             
             return Response({
                 'order_id': order.order_id,
                 'status': order.status,
                 'amount': float(order.amount),
                 'deadline': order.deadline.isoformat(),
-                'escrow_created': escrow_success
+                'escrow': 'queued'
             }, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    def create(self, serializer):
+        with transaction.atomic():
+            order = serializer.save()
+            # Outbox: the escrow job commits with the order and a worker makes the
+            # contract call, so the response does not wait on the chain
+            enqueue('escrow.create_escrow', order_id=order.order_id)
+        return order
 
 
-class OrderDetailView(generics.RetrieveAPIView):
+class OrderDetailView(ConditionalRetrieveMixin, ProjectedQuerysetMixin, AsyncGenericAPIView):
     """Get order details"""
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     lookup_field = 'order_id'
+    version_fields = ['updated_at', 'listing__updated_at', 'listing__seller__userprofile__updated_at']
+    expiry_field = 'listing__expires_at'
+    query_budget = 2
+    render_from_values = True
+
+
+class OrderHistoryView(ProjectedQuerysetMixin, mixins.ListModelMixin, AsyncGenericAPIView):
+    """
+    The session user's orders as buyer (``orders/purchases/``) or seller
+    (``orders/sales/``), newest first.
+
+    Always keyset-paginated on ``(created_at, id)`` with ``?cursor=``, so
+    page N costs the same as page 1 on the per-party indexes. ``?status=``
+    narrows to one status; rows render the ``card`` projection unless
+    ``?fields=`` asks for more.
+    """
+    queryset = Order.objects.order_by('-created_at', '-id')
+    serializer_class = OrderSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = OrderHistoryFilter
+    pagination_class = OrderHistoryPagination
+    party = 'buyer'
+    query_budget = 1
+    
+    def get_queryset(self):
+        return super().get_queryset().filter(**{f'{self.party}_id': self.request.user.id})
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['default_fields'] = 'card'
+        return context
+    
+    async def get(self, request, *args, **kwargs):
+        return await sync_to_async(self.list)(request, *args, **kwargs)
 
 
-class MockDepositView(APIView):
+def buyer_orders(request, order_id):
+    """Order ``order_id`` if the session user bought it; anyone else's order is treated as unknown."""
+    return Order.objects.filter(order_id=order_id, buyer_id=request.user.id)
+
+
+async def transition_failed(orders, message):
+    """404 for an unknown order, 400 when its status did not allow the transition."""
+    if not await orders.aexists():
+        raise Http404('No Order matches the given query.')
+    return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
+
+
+async def awaiting_indexer(orders):
+    """202 with the order's current status; an indexed escrow backend moves it once the event lands."""
+    current = await orders.values_list('status', flat=True).afirst()
+    if current is None:
+        raise Http404('No Order matches the given query.')
+    return Response({'success': True, 'status': current, 'pending': True}, status=status.HTTP_202_ACCEPTED)
+
+
+class MockDepositView(AsyncAPIView):
     """Mock deposit function"""
+    permission_classes = [IsAuthenticated]
+    query_budget = 2
     
-    def post(self, request, order_id):
-        order = get_object_or_404(Order, order_id=order_id)
+    async def post(self, request, order_id):
         serializer = DepositSerializer(data=request.data)
+        orders = buyer_orders(request, order_id)
         
         if serializer.is_valid():
-            # Check if order is in correct state
-            if order.status not in ['created']:
-                return Response({'error': 'Order cannot be paid in current status'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Mock deposit
-            deposit_success = MockSmartContract.deposit(
-                order_id, serializer.validated_data['buyer_address'], order.amount
+            if escrow_backend().indexed:
+                # The buyer's wallet sends the deposit; the Deposited event marks the order paid
+                return await awaiting_indexer(orders)
+            escrow_tx_hash = '0x' + hashlib.sha256(f"deposit_{order_id}".encode()).hexdigest()
+            result = await sync_to_async(self.deposit)(
+                orders, serializer.validated_data['buyer_address'], escrow_tx_hash
             )
-            
-            if deposit_success:
-                order.status = 'paid'
-                order.escrow_tx_hash = '0x' + hashlib.sha256(f"deposit_{order_id}".encode()).hexdigest()
-                order.save()
-                
-                return Response({
-                    'success': True,
-                    'status': order.status,
-                    'tx_hash': order.escrow_tx_hash
-                }, status=status.HTTP_200_OK)
-            else:
+            if result is None:
+                return await transition_failed(orders, 'Order cannot be paid in current status')
+            if not result:
                 return Response({'error': 'Deposit failed'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            return Response({
+                'success': True,
+                'status': 'paid',
+                'tx_hash': escrow_tx_hash
+            }, status=status.HTTP_200_OK)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    def deposit(self, orders, buyer_address, escrow_tx_hash):
+        """None if the order could not be paid, else whether the deposit went through."""
+        with transaction.atomic():
+            # created -> paid as one conditional UPDATE; a retried deposit finds the order already paid
+            order = orders.transition('paid', returning=('order_id', 'amount'), escrow_tx_hash=escrow_tx_hash)
+            if order is None:
+                return None
+            
+            deposit_success = escrow_backend().deposit(order['order_id'], buyer_address, order['amount'])
+            if not deposit_success:
+                transaction.set_rollback(True)
+            return deposit_success
 
 
-class ConfirmDeliveryView(APIView):
+class ConfirmDeliveryView(AsyncAPIView):
     """Buyer confirms delivery"""
+    permission_classes = [IsAuthenticated]
+    # A disputed order is completed (or cancelled) only by resolving the dispute
+    from_statuses = ('paid', 'delivered')
+    query_budget = 3
     
-    def post(self, request, order_id):
-        order = get_object_or_404(Order, order_id=order_id)
+    async def post(self, request, order_id):
+        orders = buyer_orders(request, order_id)
+        buyer_wallet = getattr(request.user, 'wallet_address', None)
+        escrow = escrow_backend()
         
-        # Check if order is in correct state
-        if order.status not in ['paid', 'delivered']:
-            return Response({'error': 'Order cannot be confirmed in current status'}, status=status.HTTP_400_BAD_REQUEST)
+        if escrow.indexed:
+            # Nothing changes here: the indexer applies DeliveryConfirmed and queues the
+            # release of funds, then FundsReleased completes the order. Still only the
+            # buyer of an order that can be confirmed gets to tell the escrow
+            if not await orders.filter(status__in=self.from_statuses).aexists():
+                return await transition_failed(orders, 'Order cannot be confirmed in current status')
+            try:
+                confirm_success = await sync_to_async(escrow.confirm_delivery, thread_sensitive=False)(
+                    order_id, buyer_wallet
+                )
+            except RPCError:
+                confirm_success = False
+            if not confirm_success:
+                return Response({'error': 'Confirmation failed'}, status=status.HTTP_400_BAD_REQUEST)
+            return await awaiting_indexer(orders)
         
-        # Mock confirmation
-        try:
-            buyer_wallet = order.buyer.userprofile.wallet_address if hasattr(order.buyer, 'userprofile') else None
-            confirm_success = MockSmartContract.confirm_delivery(order_id, buyer_wallet)
-        except:
-            confirm_success = True  # Mock always succeeds
+        result = await sync_to_async(self.complete)(order_id, request.user.id, buyer_wallet)
+        if result is None:
+            return await transition_failed(orders, 'Order cannot be confirmed in current status')
+        if not result:
+            return Response({'error': 'Confirmation failed'}, status=status.HTTP_400_BAD_REQUEST)
         
-        if confirm_success:
-            order.status = 'confirmed'
-            order.save()
-            
-            # Mock release funds
-            MockSmartContract.release_funds(order_id)
-            order.status = 'completed'
-            order.save()
+        return Response({
+            'success': True,
+            'status': 'completed'
+        }, status=status.HTTP_200_OK)
+    
+    def complete(self, order_id, buyer_id, buyer_wallet):
+        """None if the order could not be confirmed, else whether the escrow accepted the confirmation."""
+        with transaction.atomic():
+            # paid/delivered -> completed in one conditional UPDATE, before the escrow
+            # hears of it; only the request that flips the row credits the seller and
+            # queues the release of funds, and a refused confirmation undoes both
+            row = complete_order(from_statuses=self.from_statuses, order_id=order_id, buyer_id=buyer_id)
+            if row is None:
+                return None
             
-            return Response({
-                'success': True,
-                'status': order.status
-            }, status=status.HTTP_200_OK)
-        else:
-            return Response({'error': 'Confirmation failed'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                confirm_success = escrow_backend().confirm_delivery(order_id, buyer_wallet)
+            except RPCError:
+                confirm_success = False
+            if not confirm_success:
+                transaction.set_rollback(True)
+                return False
+            enqueue('escrow.release_funds', order_id=order_id)
+            return True
+
+
+class OrderDownloadView(AsyncAPIView):
+    """
+    Signed, short-lived link to the goods of an order the session user paid
+    for; the link itself needs no session and no database (see ``marketplace.downloads``)
+    """
+    permission_classes = [IsAuthenticated]
+    query_budget = 1
+    
+    async def get(self, request, order_id):
+        order = await Order.objects.filter(order_id=order_id, buyer_id=request.user.id).values(
+            'status', 'listing__title', 'listing__goods_sha256'
+        ).afirst()
+        if order is None:
+            raise Http404('No Order matches the given query.')
+        if order['status'] not in downloads.DOWNLOADABLE_STATUSES:
+            return Response({'error': f"Files are available once the order is paid (it is {order['status']})"},
+                            status=status.HTTP_403_FORBIDDEN)
+        digest = order['listing__goods_sha256']
+        if digest is None:
+            raise Http404('This listing has no downloadable file.')
+        
+        token = downloads.sign_download(digest, slugify(order['listing__title']) or 'download')
+        return Response({
+            'url': request.build_absolute_uri(reverse('download', args=[token])),
+            'expires_in': settings.DOWNLOAD_URL_MAX_AGE,
+        })
+
+
+def record_upload(digest, size, content_type, uploaded_by_id):
+    """``UploadedFile`` row for a stored blob; call inside the transaction, new images also queue their variants."""
+    _, created = UploadedFile.objects.get_or_create(
+        sha256=digest,
+        defaults={'file_size': size, 'content_type': content_type, 'uploaded_by_id': uploaded_by_id}
+    )
+    # Resized variants are made by a worker; their URLs serve this original meanwhile
+    if created and content_type.startswith('image/'):
+        enqueue('media.generate_variants', sha256=digest)
 
 
 class UploadFileView(APIView):
-    """Store image as base64 in database"""
+    """Store uploaded image in the content-addressed blob store"""
     parser_classes = [MultiPartParser, FormParser]
+    permission_classes = [IsAuthenticated]
+    query_budget = 5
     
     def post(self, request):
         serializer = UploadFileSerializer(data=request.data)
@@ -286,18 +619,295 @@ class UploadFileView(APIView):
         if serializer.is_valid():
             file = serializer.validated_data['file']
             
-            # Read and encode file content as base64
-            file_content = file.read()
-            base64_content = base64.b64encode(file_content).decode('utf-8')
-            
-            # Create data URL
-            data_url = f"data:{file.content_type};base64,{base64_content}"
+            # Stream chunks to disk while hashing; identical content is stored once
+            digest, size = blob_store.put_chunks(file.chunks())
+            with transaction.atomic():
+                record_upload(digest, size, file.content_type or '', request.user.id)
+            url = blob_url(digest, request)
             
             return Response({
-                'data_url': data_url,
-                'url': data_url,  # For compatibility
+                'url': url,
+                'sha256': digest,
                 'filename': file.name,
-                'size': len(file_content)
+                'size': size
             }, status=status.HTTP_200_OK)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ResumableUploadMixin:
+    """Shared by the tus-style resumable upload views (see ``marketplace.uploads``)"""
+    permission_classes = [IsAuthenticated]
+    
+    def get_upload(self, upload_id, for_update=False):
+        queryset = ChunkedUpload.objects.select_for_update() if for_update else ChunkedUpload.objects
+        return get_object_or_404(queryset, pk=upload_id, owner_id=self.request.user.id)
+    
+    def upload_headers(self, response, upload, offset):
+        response['Upload-Offset'] = str(offset)
+        response['Upload-Length'] = str(upload.length)
+        expires_at = upload.created_at + timedelta(hours=settings.UPLOAD_EXPIRY_HOURS)
+        response['Upload-Expires'] = http_date(expires_at.timestamp())
+        response['Cache-Control'] = 'no-store'
+        return response
+    
+    def handle_exception(self, exc):
+        response = super().handle_exception(exc)
+        # Tells the client where to resume
+        if isinstance(exc, uploads.UploadConflict):
+            response['Upload-Offset'] = str(exc.offset)
+        return response
+    
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        response['Tus-Resumable'] = uploads.TUS_VERSION
+        return response
+
+
+class CreateUploadView(ResumableUploadMixin, APIView):
+    """Start a resumable upload: ``Upload-Length`` and optional tus ``Upload-Metadata`` (filename, filetype)"""
+    query_budget = 1
+    
+    def post(self, request):
+        length = uploads.parse_size_header('Upload-Length', request.headers.get('Upload-Length'))
+        if length > settings.UPLOAD_MAX_SIZE:
+            raise uploads.UploadTooLarge(f'Uploads are limited to {settings.UPLOAD_MAX_SIZE} bytes.')
+        metadata = uploads.parse_metadata(request.headers.get('Upload-Metadata'))
+        
+        upload = ChunkedUpload.objects.create(
+            owner_id=request.user.id,
+            length=length,
+            filename=metadata.get('filename', '')[:255],
+            content_type=metadata.get('filetype', '')[:100],
+        )
+        uploads.start(upload)
+        response = Response({'id': str(upload.id), 'offset': 0, 'length': length}, status=status.HTTP_201_CREATED)
+        response['Location'] = request.build_absolute_uri(reverse('resumable_upload', args=[upload.id]))
+        return self.upload_headers(response, upload, 0)
+    
+    def options(self, request, *args, **kwargs):
+        response = super().options(request, *args, **kwargs)
+        response['Tus-Version'] = uploads.TUS_VERSION
+        response['Tus-Extension'] = uploads.TUS_EXTENSIONS
+        response['Tus-Max-Size'] = str(settings.UPLOAD_MAX_SIZE)
+        return response
+
+
+class ResumableUploadView(ResumableUploadMixin, APIView):
+    """HEAD for the offset to resume from, PATCH to append a chunk at it, DELETE to abandon"""
+    query_budget = 1
+    
+    def head(self, request, upload_id):
+        upload = self.get_upload(upload_id)
+        return self.upload_headers(Response(), upload, uploads.received(upload))
+    
+    def patch(self, request, upload_id):
+        if request.content_type.split(';')[0].strip() != uploads.CHUNK_CONTENT_TYPE:
+            raise UnsupportedMediaType(request.content_type)
+        offset = uploads.parse_size_header('Upload-Offset', request.headers.get('Upload-Offset'))
+        content_length = uploads.parse_size_header('Content-Length', request.META.get('CONTENT_LENGTH'))
+        upload = self.get_upload(upload_id)
+        if upload.completed_at is not None:
+            raise uploads.UploadConflict(upload.length, 'Upload is already finalized.')
+        
+        # Copied from the stream in pieces, never as request.body/request.data; under
+        # ASGI Django has already spooled the body, so an interrupted chunk never gets here
+        offset = uploads.append_chunk(upload, offset, request.stream, content_length)
+        return self.upload_headers(Response(status=status.HTTP_204_NO_CONTENT), upload, offset)
+    
+    def delete(self, request, upload_id):
+        upload = self.get_upload(upload_id)
+        if upload.completed_at is None:
+            uploads.discard(upload)
+        upload.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class FinalizeUploadView(ResumableUploadMixin, APIView):
+    """Turn a complete resumable upload into a blob; answers like ``UploadFileView`` and is safe to retry"""
+    query_budget = 8
+    
+    def post(self, request, upload_id):
+        upload = self.get_upload(upload_id)
+        # Hashing what this process did not receive reads the file; do it before taking the row lock
+        digest = uploads.checksum(upload) if upload.completed_at is None else None
+        with transaction.atomic():
+            # The row lock makes a concurrent retry wait for this finalize and then see it done
+            upload = self.get_upload(upload_id, for_update=True)
+            if upload.completed_at is None:
+                if digest is None:
+                    raise NotFound('The data of this upload is gone; start a new upload.')
+                uploads.finish(upload, digest)
+                upload.sha256 = digest
+                upload.completed_at = timezone.now()
+                upload.save(update_fields=['sha256', 'completed_at'])
+                record_upload(upload.sha256, upload.length, upload.content_type, upload.owner_id)
+        
+        return Response({
+            'url': blob_url(upload.sha256, request),
+            'sha256': upload.sha256,
+            'filename': upload.filename,
+            'size': upload.length
+        }, status=status.HTTP_200_OK)
+
+
+def public_blob_type(digest):
+    """
+    Content type of a blob anyone may fetch: an uploaded image that is not a
+    listing's goods. Goods and other uploads are private (see ``DownloadView``),
+    so the public views answer 404 for them as for unknown or malformed digests.
+
+    Only the uploader's own listings turn an image into goods, so nobody can
+    hide another seller's image by pointing a listing's file_path at it. Rows
+    from before uploads were attributed are hidden by any listing.
+    """
+    try:
+        blob_store.path(digest)
+    except ValueError:
+        raise Http404
+    goods = Listing.objects.filter(goods_sha256=digest)
+    content_type = (
+        UploadedFile.objects.filter(sha256=digest, content_type__startswith='image/')
+        .exclude(Exists(goods.filter(seller_id=OuterRef('uploaded_by_id'))))
+        .exclude(Exists(goods), uploaded_by__isnull=True)
+        .values_list('content_type', flat=True)
+        .first()
+    )
+    if content_type is None:
+        raise Http404
+    return content_type
+
+
+def blob_response(digest, content_type):
+    try:
+        return FileResponse(blob_store.open(digest), content_type=content_type)
+    except FileNotFoundError:
+        raise Http404
+
+
+class BlobView(APIView):
+    """Serve a public (image, not goods) blob by digest with immutable cache headers"""
+    query_budget = 1
+    
+    def get(self, request, digest):
+        etag = f'"{digest}"'
+        # Content never changes for a digest, so a matching ETag needs no lookup
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        else:
+            response = blob_response(digest, public_blob_type(digest))
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+
+
+class BlobVariantView(APIView):
+    """Serve a resized variant of a public blob image, or the original until the variant has been generated"""
+    query_budget = 1
+    
+    def get(self, request, digest, variant):
+        try:
+            _, ext = parse_variant(variant)
+            path = blob_store.variant_path(digest, variant)
+        except ValueError:
+            raise Http404
+        
+        etag = f'"{digest}/{variant}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        else:
+            # Goods that are images have variants too; they are no more public than the original
+            content_type = public_blob_type(digest)
+            if not path.exists():
+                # Not generated yet: a briefly cacheable original, so clients retry soon
+                response = blob_response(digest, content_type)
+                response['Cache-Control'] = 'public, max-age=60'
+                return response
+            response = FileResponse(open(path, 'rb'), content_type=VARIANT_FORMATS[ext]['content_type'])
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+
+
+class DownloadView(AsyncAPIView):
+    """Serve purchased goods for a signed link from ``OrderDownloadView``, handing the bytes to Caddy when configured"""
+    authentication_classes = []
+    permission_classes = []
+    # The signature is the authorization
+    query_budget = 0
+    
+    async def get(self, request, token):
+        try:
+            digest, filename = downloads.unsign_download(token)
+        except signing.SignatureExpired:
+            return Response({'error': 'Download link expired; request a new one'}, status=status.HTTP_410_GONE)
+        except signing.BadSignature:
+            raise Http404
+        
+        if settings.DOWNLOAD_ACCEL_REDIRECT:
+            response = HttpResponse(content_type='application/octet-stream')
+            response[settings.DOWNLOAD_ACCEL_REDIRECT] = downloads.accel_path(digest)
+        else:
+            response = await self.stream(request, digest)
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+        response['Cache-Control'] = 'private, no-transform'
+        return response
+    
+    async def stream(self, request, digest):
+        path = blob_store.path(digest)
+        try:
+            size = (await sync_to_async(path.stat, thread_sensitive=False)()).st_size
+        except FileNotFoundError:
+            raise Http404
+        etag = f'"{digest}"'
+        
+        byte_range = None
+        # A stale validator means the client's partial copy is of something else: send it all
+        if request.headers.get('If-Range', etag) == etag:
+            try:
+                byte_range = downloads.parse_range(request.headers.get('Range'), size)
+            except downloads.RangeNotSatisfiable:
+                response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+        
+        start, end = byte_range or (0, size - 1)
+        response = StreamingHttpResponse(
+            downloads.aread_range(path, start, end - start + 1),
+            status=status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK,
+            content_type='application/octet-stream',
+        )
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = etag
+        return response
+
+
+class ExportView(AsyncAPIView):
+    """
+    Stream every listing (``exports/listings/``) or order (``exports/orders/``)
+    to staff users as NDJSON, or CSV with ``?format=csv`` / ``Accept: text/csv``.
+
+    Takes the listing (or order ``status``/``buyer``/``seller``) filters and
+    ``?since=`` (inclusive ``updated_at``) for incremental pulls; rows come
+    oldest change first. See ``marketplace.exports``.
+    """
+    permission_classes = [IsAdminUser]
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    export = 'listings'
+    # Only authentication is counted; the rows are read while the body streams
+    query_budget = 2
+    
+    async def get(self, request):
+        queryset = export_queryset(self.export, request.query_params)
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            aiter_chunks(export_chunks(self.export, queryset, renderer)),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        filename = f"{self.export}-{timezone.now():%Y%m%dT%H%M%SZ}.{renderer.format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['Cache-Control'] = 'no-store'
+        return response
@@ -39,8 +39,8 @@ function App() {
                         const user = JSON.parse(userString);
                         setTelegramUser(user);
 
-                        // Authenticate with your backend
-                        authenticateWithTelegram(user);
+                        // The backend verifies the signed initData, not the parsed user
+                        authenticateWithTelegram(tg.initData);
                     }
                 } catch (error) {
                     console.error('Error parsing user data:', error);
@@ -64,24 +64,20 @@ function App() {
         };
     }, [searchTimeout]);
 
-    const authenticateWithTelegram = async (user) => {
+    const authenticateWithTelegram = async (initData) => {
         try {
             const apiUrl = process.env.REACT_APP_API_URL || 'https://api.debazaar.click/api';
             const response = await fetch(`${apiUrl}/auth/telegram/`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    telegram_id: user.id,
-                    username: user.username,
-                    first_name: user.first_name
-                })
+                body: JSON.stringify({ init_data: initData })
             });
 
             if (response.ok) {
                 const authData = await response.json();
                 console.log('Authenticated:', authData);
                 console.log('Django User ID:', authData.user_id);
-                console.log('Telegram ID:', user.id);
+                console.log('Telegram ID:', authData.telegram_id);
                 // Store user session data
                 setAuthUser(authData);
 
@@ -116,17 +112,12 @@ function App() {
 
     const handleAddProduct = async (productData) => {
         try {
-            // Add user ID to the product data
-            const sellerId = authUser?.user_id || telegramUser?.id || 1;
-            console.log('Creating product with seller_id:', sellerId);
-            console.log('authUser:', authUser);
-            console.log('telegramUser:', telegramUser);
-
-            const listingData = {
-                ...productData,
-                seller_id: sellerId
-            };
-            await api.createListing(listingData);
+            // The seller is whoever the session token belongs to
+            if (!authUser?.token) {
+                alert('Please log in with Telegram before adding a product.');
+                return;
+            }
+            await api.createListing(productData, authUser.token);
 
 
             setShowAddForm(false);
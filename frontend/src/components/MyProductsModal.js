@@ -57,8 +57,10 @@ const MyProductsModal = ({ onClose, telegramUser, authUser, onProductClick }) =>
 
     const handleDeleteProduct = async (productId) => {
         try {
-            const sellerId = authUser?.user_id || telegramUser?.id;
-            await api.deleteListing(productId, sellerId);
+            if (!authUser?.token) {
+                throw new Error('Please log in with Telegram to delete your products');
+            }
+            await api.deleteListing(productId, authUser.token);
 
             // Remove the deleted product from the local state
             setUserProducts(prev => prev.filter(product => product.id !== productId));
@@ -1,6 +1,12 @@
 
 const API_BASE = 'https://api.debazaar.click/api';
 
+// Session token from /auth/telegram/ or /auth/privy/; the API takes identity only from it
+const authHeaders = (token) => ({
+    'Content-Type': 'application/json',
+    'Authorization': `Token ${token}`
+});
+
 export const api = {
     // Get all listings with optional search and filter parameters
     getListings: async (params = {}) => {
@@ -30,10 +36,10 @@ export const api = {
         return response.json();
     },
 
-    createListing: async (listingData) => {
+    createListing: async (listingData, token) => {
         const response = await fetch(`${API_BASE}/listings/`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: authHeaders(token),
             body: JSON.stringify(listingData)
         });
         if (!response.ok) throw new Error('Failed to create listing');
@@ -41,11 +47,10 @@ export const api = {
     },
 
     // Delete a listing (soft delete)
-    deleteListing: async (listingId, sellerId) => {
+    deleteListing: async (listingId, token) => {
         const response = await fetch(`${API_BASE}/listings/${listingId}/delete/`, {
             method: 'DELETE',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ seller_id: sellerId })
+            headers: authHeaders(token)
         });
         if (!response.ok) {
             const errorData = await response.json();